@@ -55,6 +55,7 @@ def annotation_main(args):
     logger = message.MessageLogger.get(namespace='')
 
     ss = create_source_scanner(options, args)
+    ss.flush_cache()
 
     if options.extract:
         ap = AnnotationParser()
@@ -23,7 +23,10 @@ import copy
 
 from .message import Position
 from .odict import odict
-from .utils import to_underscores
+from .utils import to_underscores, get_slot_state, set_slot_state
+
+# (target_fundamental, target_giname, ctype, is_const) -> InternedType
+_interned_types = {}
 
 class Type(object):
     """A Type can be either:
@@ -35,6 +38,12 @@ unresolved type can have two data sources; a "ctype" which comes
 from a C type string, or a gtype_name (from g_type_name()).
 """ # '''
 
+    __slots__ = ('ctype', 'gtype_name', 'origin_symbol', 'target_fundamental',
+                 'target_giname', 'target_foreign', 'is_const')
+
+    __getstate__ = get_slot_state
+    __setstate__ = set_slot_state
+
     def __init__(self,
                  ctype=None,
                  gtype_name=None,
@@ -90,15 +99,15 @@ in contrast to the other create_type() functions."""
         # First, is it a fundamental?
         fundamental = type_names.get(gtype_name)
         if fundamental is not None:
-            return cls(target_fundamental=fundamental.target_fundamental)
+            return Type.interned(
+                target_fundamental=fundamental.target_fundamental)
         if gtype_name == 'GHashTable':
             return Map(TYPE_ANY, TYPE_ANY, gtype_name=gtype_name)
         elif gtype_name in ('GArray', 'GPtrArray', 'GByteArray'):
             return Array('GLib.' + gtype_name[1:], TYPE_ANY,
                          gtype_name=gtype_name)
         elif gtype_name == 'GStrv':
-            bare_utf8 = TYPE_STRING.clone()
-            bare_utf8.ctype = None
+            bare_utf8 = TYPE_STRING.replace(ctype=None)
             return Array(None, bare_utf8, ctype=None, gtype_name=gtype_name,
                          is_const=False)
 
@@ -110,6 +119,34 @@ in contrast to the other create_type() functions."""
 
         return cls(gtype_name=gtype_name)
 
+    @classmethod
+    def interned(cls, target_fundamental=None, target_giname=None,
+                 ctype=None, is_const=False):
+        """Return the Type referring to a fundamental or to a GIName with
+these attributes which is shared by all the nodes using it, creating it
+on first use.  It can't be changed, see replace()."""
+        key = (target_fundamental, target_giname, ctype, is_const)
+        typeval = _interned_types.get(key)
+        if typeval is None:
+            assert (target_fundamental is None) != (target_giname is None)
+            template = Type(target_fundamental=target_fundamental,
+                            target_giname=target_giname,
+                            ctype=ctype,
+                            is_const=is_const)
+            typeval = object.__new__(InternedType)
+            for name in Type.__slots__:
+                object.__setattr__(typeval, name, getattr(template, name))
+            _interned_types[key] = typeval
+        return typeval
+
+    def replace(self, **changes):
+        """Set the attributes in changes and return the changed type.
+Interned types are shared, they are left alone and a copy is returned
+instead, so always use the return value."""
+        for name, value in changes.iteritems():
+            setattr(self, name, value)
+        return self
+
     def get_giname(self):
         assert self.target_giname is not None
         return self.target_giname.split('.')[1]
@@ -131,10 +168,10 @@ in contrast to the other create_type() functions."""
         any."""
         if isinstance(typeval, (list, tuple)):
             for val in typeval:
-                if self.is_equiv(val):
+                if self is val or self == val:
                     return True
             return False
-        return self == typeval
+        return self is typeval or self == typeval
 
     def clone(self):
         return Type(target_fundamental=self.target_fundamental,
@@ -163,53 +200,95 @@ in contrast to the other create_type() functions."""
         return '%s(%sctype=%s)' % (self.__class__.__name__, data, self.ctype)
 
 class TypeUnknown(Type):
+    __slots__ = ()
+
     def __init__(self):
         Type.__init__(self, _target_unknown=True)
 
+class InternedType(Type):
+    """A Type shared by all the nodes referring to the same fundamental
+or GIName with the same C type, created by Type.interned().  Most types
+of a parsed GIR are one of these."""
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%r is shared and can't be changed, "
+                             "use replace()" % (self, ))
+
+    def __delattr__(self, name):
+        raise AttributeError("%r is shared and can't be changed" % (self, ))
+
+    def __hash__(self):
+        # Consistent with Type.__cmp__(), which ignores the C type
+        return hash(self.target_fundamental or self.target_giname)
+
+    def __repr__(self):
+        # Shown like any other Type, warnings include it
+        return 'Type' + Type.__repr__(self)[len('InternedType'):]
+
+    def __reduce__(self):
+        # Loading interns the type again
+        return (_load_interned_type, (self.target_fundamental,
+                                      self.target_giname,
+                                      self.ctype,
+                                      self.is_const))
+
+    def replace(self, **changes):
+        values = dict(target_fundamental=self.target_fundamental,
+                      target_giname=self.target_giname,
+                      ctype=self.ctype,
+                      is_const=self.is_const)
+        values.update(changes)
+        return Type.interned(**values)
+
+def _load_interned_type(target_fundamental, target_giname, ctype, is_const):
+    return Type.interned(target_fundamental, target_giname, ctype, is_const)
+
 ######
 ## Fundamental types
 ######
 # Two special ones
-TYPE_NONE = Type(target_fundamental='none', ctype='void')
-TYPE_ANY = Type(target_fundamental='gpointer', ctype='gpointer')
+TYPE_NONE = Type.interned(target_fundamental='none', ctype='void')
+TYPE_ANY = Type.interned(target_fundamental='gpointer', ctype='gpointer')
 # "Basic" types
-TYPE_BOOLEAN = Type(target_fundamental='gboolean', ctype='gboolean')
-TYPE_INT8 = Type(target_fundamental='gint8', ctype='gint8')
-TYPE_UINT8 = Type(target_fundamental='guint8', ctype='guint8')
-TYPE_INT16 = Type(target_fundamental='gint16', ctype='gint16')
-TYPE_UINT16 = Type(target_fundamental='guint16', ctype='guint16')
-TYPE_INT32 = Type(target_fundamental='gint32', ctype='gint32')
-TYPE_UINT32 = Type(target_fundamental='guint32', ctype='guint32')
-TYPE_INT64 = Type(target_fundamental='gint64', ctype='gint64')
-TYPE_UINT64 = Type(target_fundamental='guint64', ctype='guint64')
-TYPE_CHAR = Type(target_fundamental='gchar', ctype='gchar')
-TYPE_SHORT = Type(target_fundamental='gshort', ctype='gshort')
-TYPE_USHORT = Type(target_fundamental='gushort', ctype='gushort')
-TYPE_INT = Type(target_fundamental='gint', ctype='gint')
-TYPE_UINT = Type(target_fundamental='guint', ctype='guint')
-TYPE_LONG = Type(target_fundamental='glong', ctype='glong')
-TYPE_ULONG = Type(target_fundamental='gulong', ctype='gulong')
-TYPE_SIZE = Type(target_fundamental='gsize', ctype='gsize')
-TYPE_SSIZE = Type(target_fundamental='gssize', ctype='gssize')
-TYPE_INTPTR = Type(target_fundamental='gintptr', ctype='gintptr')
-TYPE_UINTPTR = Type(target_fundamental='guintptr', ctype='guintptr')
+TYPE_BOOLEAN = Type.interned(target_fundamental='gboolean', ctype='gboolean')
+TYPE_INT8 = Type.interned(target_fundamental='gint8', ctype='gint8')
+TYPE_UINT8 = Type.interned(target_fundamental='guint8', ctype='guint8')
+TYPE_INT16 = Type.interned(target_fundamental='gint16', ctype='gint16')
+TYPE_UINT16 = Type.interned(target_fundamental='guint16', ctype='guint16')
+TYPE_INT32 = Type.interned(target_fundamental='gint32', ctype='gint32')
+TYPE_UINT32 = Type.interned(target_fundamental='guint32', ctype='guint32')
+TYPE_INT64 = Type.interned(target_fundamental='gint64', ctype='gint64')
+TYPE_UINT64 = Type.interned(target_fundamental='guint64', ctype='guint64')
+TYPE_CHAR = Type.interned(target_fundamental='gchar', ctype='gchar')
+TYPE_SHORT = Type.interned(target_fundamental='gshort', ctype='gshort')
+TYPE_USHORT = Type.interned(target_fundamental='gushort', ctype='gushort')
+TYPE_INT = Type.interned(target_fundamental='gint', ctype='gint')
+TYPE_UINT = Type.interned(target_fundamental='guint', ctype='guint')
+TYPE_LONG = Type.interned(target_fundamental='glong', ctype='glong')
+TYPE_ULONG = Type.interned(target_fundamental='gulong', ctype='gulong')
+TYPE_SIZE = Type.interned(target_fundamental='gsize', ctype='gsize')
+TYPE_SSIZE = Type.interned(target_fundamental='gssize', ctype='gssize')
+TYPE_INTPTR = Type.interned(target_fundamental='gintptr', ctype='gintptr')
+TYPE_UINTPTR = Type.interned(target_fundamental='guintptr', ctype='guintptr')
 # C99 types
-TYPE_LONG_LONG = Type(target_fundamental='long long', ctype='long long')
-TYPE_LONG_ULONG = Type(target_fundamental='unsigned long long',
-                       ctype='unsigned long long')
-TYPE_FLOAT = Type(target_fundamental='gfloat', ctype='gfloat')
-TYPE_DOUBLE = Type(target_fundamental='gdouble', ctype='gdouble')
+TYPE_LONG_LONG = Type.interned(target_fundamental='long long',
+                               ctype='long long')
+TYPE_LONG_ULONG = Type.interned(target_fundamental='unsigned long long',
+                                ctype='unsigned long long')
+TYPE_FLOAT = Type.interned(target_fundamental='gfloat', ctype='gfloat')
+TYPE_DOUBLE = Type.interned(target_fundamental='gdouble', ctype='gdouble')
 # ?
-TYPE_LONG_DOUBLE = Type(target_fundamental='long double',
-                        ctype='long double')
-TYPE_UNICHAR = Type(target_fundamental='gunichar', ctype='gunichar')
+TYPE_LONG_DOUBLE = Type.interned(target_fundamental='long double',
+                                 ctype='long double')
+TYPE_UNICHAR = Type.interned(target_fundamental='gunichar', ctype='gunichar')
 
 # C types with semantics overlaid
-TYPE_GTYPE = Type(target_fundamental='GType', ctype='GType')
-TYPE_STRING = Type(target_fundamental='utf8', ctype='gchar*')
-TYPE_FILENAME = Type(target_fundamental='filename', ctype='gchar*')
+TYPE_GTYPE = Type.interned(target_fundamental='GType', ctype='GType')
+TYPE_STRING = Type.interned(target_fundamental='utf8', ctype='gchar*')
+TYPE_FILENAME = Type.interned(target_fundamental='filename', ctype='gchar*')
 
-TYPE_VALIST = Type(target_fundamental='va_list', ctype='va_list')
+TYPE_VALIST = Type.interned(target_fundamental='va_list', ctype='va_list')
 
 BASIC_GIR_TYPES = [TYPE_BOOLEAN, TYPE_INT8, TYPE_UINT8, TYPE_INT16,
                    TYPE_UINT16, TYPE_INT32, TYPE_UINT32, TYPE_INT64,
@@ -352,9 +431,11 @@ class Namespace(object):
         self._ucase_symbol_prefixes = [p.upper() for p in self.symbol_prefixes]
         self._names = odict() # Maps from GIName -> node
         self._aliases = {} # Maps from GIName -> GIName
-        self._type_names = {} # Maps from GTName -> node
+        self._type_names = {} # Maps from GTName -> first node registering it
+        self._duplicate_type_names = {} # Maps from GTName -> other nodes
         self._ctypes = {} # Maps from CType -> node
         self._symbols = {} # Maps from function symbols -> Function
+        self._kinds = {} # Maps from class or tuple of classes -> odict
 
     @property
     def names(self):
@@ -380,12 +461,12 @@ fully-qualified GIName like 'Foo.Bar', returns a Type targeting it .
 Otherwise a Type targeting name qualififed with the namespace name is
 returned."""
         if name in type_names:
-            return Type(target_fundamental=name, ctype=ctype)
+            return Type.interned(target_fundamental=name, ctype=ctype)
         if '.' in name:
             target = name
         else:
             target = '%s.%s' % (self.name, name)
-        return Type(target_giname=target, ctype=ctype)
+        return Type.interned(target_giname=target, ctype=ctype)
 
     def append(self, node, replace=False):
         previous = self._names.get(node.name)
@@ -397,7 +478,7 @@ returned."""
         if isinstance(node, Alias):
             self._aliases[node.name] = node
         elif isinstance(node, Registered) and node.gtype_name is not None:
-            self._type_names[node.gtype_name] = node
+            self._add_type_name(node)
         elif isinstance(node, Function):
             self._symbols[node.symbol] = node
         assert isinstance(node, Node)
@@ -408,18 +489,46 @@ returned."""
             self._ctypes[node.ctype] = node
         if hasattr(node, 'symbol'):
             self._ctypes[node.symbol] = node
+        for kind, nodes in self._kinds.iteritems():
+            if isinstance(node, kind):
+                nodes[node.name] = node
 
     def remove(self, node):
         if isinstance(node, Alias):
             del self._aliases[node.name]
         elif isinstance(node, Registered) and node.gtype_name is not None:
-            del self._type_names[node.gtype_name]
+            self._remove_type_name(node)
         del self._names[node.name]
         node.namespace = None
         if hasattr(node, 'ctype'):
             del self._ctypes[node.ctype]
         if isinstance(node, Function):
             del self._symbols[node.symbol]
+        for kind, nodes in self._kinds.iteritems():
+            if isinstance(node, kind):
+                del nodes[node.name]
+
+    def _add_type_name(self, node):
+        # Like a search through the nodes in order, the first node
+        # registering a GType name is the one found
+        if node.gtype_name in self._type_names:
+            self._duplicate_type_names.setdefault(node.gtype_name,
+                                                  []).append(node)
+        else:
+            self._type_names[node.gtype_name] = node
+
+    def _remove_type_name(self, node):
+        gtype_name = node.gtype_name
+        others = self._duplicate_type_names.get(gtype_name)
+        if others is None:
+            del self._type_names[gtype_name]
+            return
+        if self._type_names[gtype_name] is node:
+            self._type_names[gtype_name] = others.pop(0)
+        else:
+            others.remove(node)
+        if not others:
+            del self._duplicate_type_names[gtype_name]
 
     def float(self, node):
         """Like remove(), but doesn't unset the node's namespace
@@ -434,6 +543,9 @@ functions via get_by_symbol()."""
     def __iter__(self):
         return iter(self._names)
 
+    def __contains__(self, name):
+        return name in self._names
+
     def iteritems(self):
         return self._names.iteritems()
 
@@ -443,12 +555,40 @@ functions via get_by_symbol()."""
     def get(self, name):
         return self._names.get(name)
 
+    def get_nodes_of_kind(self, kind):
+        """Return the nodes which are instances of kind, a class or a
+tuple of classes as for isinstance(), in namespace order.  The nodes of
+each kind asked for are indexed from then on, so passes looking for
+one kind don't go through the whole namespace."""
+        nodes = self._kinds.get(kind)
+        if nodes is None:
+            nodes = odict()
+            for node in self.itervalues():
+                if isinstance(node, kind):
+                    nodes[node.name] = node
+            self._kinds[kind] = nodes
+        return nodes.values()
+
     def get_by_ctype(self, ctype):
         return self._ctypes.get(ctype)
 
     def get_by_symbol(self, symbol):
         return self._symbols.get(symbol)
 
+    def get_by_gtype_name(self, gtype_name):
+        """Return the class, interface or other registered type with a
+GType getter that has gtype_name, or None."""
+        node = self._type_names.get(gtype_name)
+        if node is None:
+            return None
+        if isinstance(node, (Class, Interface)) or node.get_type is not None:
+            return node
+        return None
+
+    def get_gtype_names(self):
+        """Return the GType names of the registered types."""
+        return self._type_names.keys()
+
     def walk(self, callback):
         for node in self.itervalues():
             node.walk(callback, [])
@@ -478,6 +618,17 @@ class Include(object):
 class Annotated(object):
     """An object which has a few generic metadata
 properties."""
+
+    # The nodes and their parts declare their attributes in __slots__,
+    # included namespaces hold hundreds of thousands of them.  Optional
+    # attributes are left unset, so that hasattr() keeps telling whether
+    # a node has them.
+    __slots__ = ('version', 'skip', 'introspectable', 'attributes',
+                 'deprecated', 'deprecated_version', 'doc')
+
+    __getstate__ = get_slot_state
+    __setstate__ = set_slot_state
+
     def __init__(self):
         self.version = None
         self.skip = False
@@ -495,17 +646,29 @@ GIName.  It's possible for nodes to contain or point to other nodes."""
     c_name = property(lambda self: self.namespace.name + self.name)
     gi_name = property(lambda self: '%s.%s' % (self.namespace.name, self.name))
 
+    __slots__ = ('namespace', 'name', 'foreign', '_file_positions')
+
     def __init__(self, name=None):
         Annotated.__init__(self)
         self.namespace = None # Should be set later by Namespace.append()
         self.name = name
         self.foreign = False
-        self.file_positions = set()
+
+    @property
+    def file_positions(self):
+        # Only created when used, the nodes of included namespaces
+        # have none
+        try:
+            return self._file_positions
+        except AttributeError:
+            self._file_positions = set()
+            return self._file_positions
 
     def create_type(self):
         """Create a Type object referencing this node."""
         assert self.namespace is not None
-        return Type(target_giname=('%s.%s' % (self.namespace.name, self.name)))
+        return Type.interned(
+            target_giname=('%s.%s' % (self.namespace.name, self.name)))
 
     def __cmp__(self, other):
         nscmp = cmp(self.namespace, other.namespace)
@@ -539,8 +702,11 @@ GIName.  It's possible for nodes to contain or point to other nodes."""
         pass
 
 
-class Registered:
-    """A node that (possibly) has gtype_name and get_type."""
+class Registered(object):
+    """A node that (possibly) has gtype_name and get_type, which are
+declared in the __slots__ of its subclasses."""
+    __slots__ = ()
+
     def __init__(self, gtype_name, get_type):
         assert (gtype_name is None and get_type is None) or \
                (gtype_name is not None and get_type is not None)
@@ -549,6 +715,10 @@ class Registered:
 
 
 class Callable(Node):
+    # The GIR parser also sets is_method, shadows, shadowed_by and
+    # moved_to on callables which are not functions
+    __slots__ = ('retval', 'parameters', 'throws', 'instance_parameter',
+                 'is_method', 'shadows', 'shadowed_by', 'moved_to')
 
     def __init__(self, name, retval, parameters, throws):
         Node.__init__(self, name)
@@ -571,6 +741,8 @@ class Callable(Node):
 
 
 class Function(Callable):
+    # parent_class is only set by the DocBook writer
+    __slots__ = ('symbol', 'is_constructor', 'parent_class')
 
     def __init__(self, name, retval, parameters, throws, symbol):
         Callable.__init__(self, name, retval, parameters, throws)
@@ -590,6 +762,7 @@ class Function(Callable):
 
 
 class ErrorQuarkFunction(Function):
+    __slots__ = ('error_domain', )
 
     def __init__(self, name, retval, parameters, throws, symbol, error_domain):
         Function.__init__(self, name, retval, parameters, throws, symbol)
@@ -597,6 +770,7 @@ class ErrorQuarkFunction(Function):
 
 
 class VFunction(Callable):
+    __slots__ = ('invoker', )
 
     def __init__(self, name, retval, parameters, throws):
         Callable.__init__(self, name, retval, parameters, throws)
@@ -611,6 +785,7 @@ class VFunction(Callable):
 
 
 class Varargs(Type):
+    __slots__ = ()
 
     def __init__(self):
         Type.__init__(self, '<varargs>', target_fundamental='<varargs>')
@@ -622,6 +797,9 @@ class Array(Type):
     GLIB_BYTEARRAY = 'GLib.ByteArray'
     GLIB_PTRARRAY = 'GLib.PtrArray'
 
+    __slots__ = ('array_type', 'element_type', 'zeroterminated',
+                 'length_param_name', 'size')
+
     def __init__(self, array_type, element_type, **kwargs):
         Type.__init__(self, target_fundamental='<array>',
                       **kwargs)
@@ -646,6 +824,7 @@ class Array(Type):
         return arr
 
 class List(Type):
+    __slots__ = ('name', 'element_type')
 
     def __init__(self, name, element_type, **kwargs):
         Type.__init__(self, target_fundamental='<list>',
@@ -662,6 +841,7 @@ class List(Type):
         return l
 
 class Map(Type):
+    __slots__ = ('key_type', 'value_type')
 
     def __init__(self, key_type, value_type, **kwargs):
         Type.__init__(self, target_fundamental='<map>', **kwargs)
@@ -674,6 +854,7 @@ class Map(Type):
         return Map(self.key_type, self.value_type)
 
 class Alias(Node):
+    __slots__ = ('target', 'ctype')
 
     def __init__(self, name, target, ctype=None):
         Node.__init__(self, name)
@@ -684,6 +865,10 @@ class Alias(Node):
 class TypeContainer(Annotated):
     """A fundamental base class for Return and Parameter."""
 
+    # allow_none and caller_allocates may also be annotated on a Return
+    __slots__ = ('type', 'transfer', 'direction', 'allow_none',
+                 'caller_allocates')
+
     def __init__(self, typenode, transfer):
         Annotated.__init__(self)
         self.type = typenode
@@ -698,6 +883,8 @@ class TypeContainer(Annotated):
 class Parameter(TypeContainer):
     """An argument to a function."""
 
+    __slots__ = ('argname', 'scope', 'closure_name', 'destroy_name')
+
     def __init__(self, argname, typenode, direction=None,
                  transfer=None, allow_none=False, scope=None,
                  caller_allocates=False):
@@ -714,12 +901,16 @@ class Parameter(TypeContainer):
 class Return(TypeContainer):
     """A return value from a function."""
 
+    __slots__ = ()
+
     def __init__(self, rtype, transfer=None):
         TypeContainer.__init__(self, rtype, transfer)
         self.direction = PARAM_DIRECTION_OUT
 
 
 class Enum(Node, Registered):
+    __slots__ = ('gtype_name', 'get_type', 'c_symbol_prefix', 'ctype',
+                 'members', 'error_domain', 'static_methods')
 
     def __init__(self, name, ctype,
                  gtype_name=None,
@@ -741,6 +932,9 @@ class Enum(Node, Registered):
 
 
 class Bitfield(Node, Registered):
+    # error_domain is only set by the GIR parser
+    __slots__ = ('gtype_name', 'get_type', 'ctype', 'c_symbol_prefix',
+                 'members', 'static_methods', 'error_domain')
 
     def __init__(self, name, ctype,
                  gtype_name=None,
@@ -760,6 +954,7 @@ class Bitfield(Node, Registered):
 
 
 class Member(Annotated):
+    __slots__ = ('name', 'value', 'symbol', 'nick')
 
     def __init__(self, name, value, symbol, nick):
         Annotated.__init__(self)
@@ -774,6 +969,10 @@ class Member(Annotated):
 
 
 class Compound(Node, Registered):
+    __slots__ = ('gtype_name', 'get_type', 'ctype', 'methods',
+                 'static_methods', 'fields', 'constructors', 'disguised',
+                 'c_symbol_prefix')
+
     def __init__(self, name,
                  ctype=None,
                  gtype_name=None,
@@ -793,8 +992,13 @@ class Compound(Node, Registered):
         self.c_symbol_prefix = c_symbol_prefix
 
     def add_gtype(self, gtype_name, get_type):
+        # Keep the lookup by GType name of the namespace current
+        if self.namespace is not None and self.gtype_name is not None:
+            self.namespace._remove_type_name(self)
         self.gtype_name = gtype_name
         self.get_type = get_type
+        if self.namespace is not None:
+            self.namespace._add_type_name(self)
 
     def _walk(self, callback, chain):
         for ctor in self.constructors:
@@ -808,6 +1012,8 @@ class Compound(Node, Registered):
                 field.anonymous_node.walk(callback, chain)
 
 class Field(Annotated):
+    __slots__ = ('name', 'type', 'readable', 'writable', 'bits',
+                 'anonymous_node', 'private')
 
     def __init__(self, name, typenode, readable, writable, bits=None,
                  anonymous_node=None):
@@ -826,6 +1032,7 @@ class Field(Annotated):
 
 
 class Record(Compound):
+    __slots__ = ('is_gtype_struct_for', )
 
     def __init__(self, name,
                  ctype=None,
@@ -845,6 +1052,7 @@ class Record(Compound):
 
 
 class Union(Compound):
+    __slots__ = ()
 
     def __init__(self, name,
                  ctype=None,
@@ -862,6 +1070,9 @@ class Union(Compound):
 
 class Boxed(Node, Registered):
     """A boxed type with no known associated structure/union."""
+    __slots__ = ('gtype_name', 'get_type', 'c_symbol_prefix', 'constructors',
+                 'methods', 'static_methods')
+
     def __init__(self, name,
                  gtype_name=None,
                  get_type=None,
@@ -887,6 +1098,7 @@ class Boxed(Node, Registered):
 
 
 class Signal(Callable):
+    __slots__ = ('when', 'no_recurse', 'detailed', 'action', 'no_hooks')
 
     def __init__(self, name, retval, parameters, when=None,
                  no_recurse=False, detailed=False, action=False,
@@ -900,6 +1112,12 @@ class Signal(Callable):
 
 
 class Class(Node, Registered):
+    __slots__ = ('gtype_name', 'get_type', 'ctype', 'c_symbol_prefix',
+                 'parent', 'fundamental', 'unref_func', 'ref_func',
+                 'set_value_func', 'get_value_func', 'parent_chain',
+                 'glib_type_struct', 'is_abstract', 'methods',
+                 'virtual_methods', 'static_methods', 'interfaces',
+                 'constructors', 'properties', 'fields', 'signals')
 
     def __init__(self, name, parent,
                  ctype=None,
@@ -949,6 +1167,10 @@ class Class(Node, Registered):
 
 
 class Interface(Node, Registered):
+    __slots__ = ('gtype_name', 'get_type', 'ctype', 'c_symbol_prefix',
+                 'parent', 'parent_chain', 'methods', 'signals',
+                 'static_methods', 'virtual_methods', 'glib_type_struct',
+                 'properties', 'fields', 'prerequisites')
 
     def __init__(self, name, parent,
                  ctype=None,
@@ -985,6 +1207,7 @@ class Interface(Node, Registered):
 
 
 class Constant(Node):
+    __slots__ = ('value_type', 'value', 'ctype')
 
     def __init__(self, name, value_type, value, ctype):
         Node.__init__(self, name)
@@ -994,6 +1217,8 @@ class Constant(Node):
 
 
 class Property(Node):
+    __slots__ = ('type', 'readable', 'writable', 'construct',
+                 'construct_only', 'transfer')
 
     def __init__(self, name, typeobj, readable, writable,
                  construct, construct_only, transfer=None):
@@ -1010,6 +1235,7 @@ class Property(Node):
 
 
 class Callback(Callable):
+    __slots__ = ('ctype', )
 
     def __init__(self, name, retval, parameters, throws, ctype=None):
         Callable.__init__(self, name, retval, parameters, throws)
@@ -18,6 +18,7 @@
 # Boston, MA 02111-1307, USA.
 #
 
+import __builtin__
 import errno
 import cPickle
 import glob
@@ -26,19 +27,78 @@ import os
 import shutil
 import sys
 import tempfile
+import time
 
 import giscanner
+from . import serializer
 
+# Maps from entry name -> (size in bytes, time of last access); lets
+# us enforce the size budget without stat()ing the whole directory.
+_INDEX_FILENAME = '.index'
+
+_DEFAULT_MAX_SIZE = 100 * 1024 * 1024
+
+# Only written by older versions, which wiped the whole cache when
+# the scanner changed.  Its presence means the directory still holds
+# entries in the old format.
 _CACHE_VERSION_FILENAME = '.cache-version'
 
+_versionhash = None
+
+def _get_file_digest(filename):
+    digest = hashlib.sha1()
+    fp = open(filename, 'rb')
+    try:
+        while True:
+            data = fp.read(65536)
+            if not data:
+                break
+            digest.update(data)
+    finally:
+        fp.close()
+    return digest.hexdigest()
+
 def _get_versionhash():
-    toplevel = os.path.dirname(giscanner.__file__)
-    # Use pyc instead of py to avoid extra IO
-    sources = glob.glob(os.path.join(toplevel, '*.pyc'))
-    sources.append(sys.argv[0])
-    # Using mtimes is a bit (5x) faster than hashing the file contents
-    mtimes = (str(os.stat(source).st_mtime) for source in sources)
-    return hashlib.sha1(''.join(mtimes)).hexdigest()
+    global _versionhash
+    if _versionhash is None:
+        toplevel = os.path.dirname(giscanner.__file__)
+        # Hash the contents rather than the mtimes, reinstalling or
+        # touching an identical scanner should not invalidate anything
+        sources = sorted(glob.glob(os.path.join(toplevel, '*.py')))
+        # The source scanner caches the output of the C parser as well,
+        # both installed and uninstalled (libtool) locations are checked
+        for pattern in ['_giscanner.*', os.path.join('.libs', '_giscanner.*')]:
+            sources.extend(sorted(glob.glob(os.path.join(toplevel, pattern))))
+        digest = hashlib.sha1()
+        for source in sources:
+            digest.update(_get_file_digest(source))
+        _versionhash = digest.hexdigest()
+    return _versionhash
+
+def parse_cache_size(value):
+    """Parse a cache size like "4096", "512k", "100M" or "2G" into
+a number of bytes.  Raises ValueError for malformed values."""
+    value = value.strip()
+    multiplier = 1
+    suffix = value[-1:].lower()
+    if suffix in ('k', 'm', 'g'):
+        multiplier = 1024 ** ('kmg'.index(suffix) + 1)
+        value = value[:-1]
+    size = int(value) * multiplier
+    if size < 0:
+        raise ValueError("negative cache size %r" % (value, ))
+    return size
+
+def _get_limit_from_environ(name, default, parse=int):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return parse(value)
+    except ValueError:
+        sys.stderr.write("g-ir-scanner: warning: ignoring invalid %s=%r\n"
+                         % (name, value))
+        return default
 
 def _get_cachedir():
     if 'GI_SCANNER_DISABLE_CACHE' in os.environ:
@@ -67,48 +127,125 @@ def _get_cachedir():
         return None
     return scannerdir
 
+def get_system_cachedir():
+    """Return the directory g-ir-scanner --precompile-cache writes
+to by default, in the data directory of the installed scanner, or None
+if that is unknown, as when giscanner is used as a library."""
+    datadir = getattr(__builtin__, 'DATADIR', None)
+    if datadir is None:
+        return None
+    return os.path.join(datadir, 'gobject-introspection-1.0',
+                        'scanner-cache')
+
+def _get_system_cachedirs():
+    if 'GI_SCANNER_DISABLE_CACHE' in os.environ:
+        return []
+    path = os.environ.get('GI_SCANNER_SYSTEM_CACHE_PATH')
+    if path is None:
+        directory = get_system_cachedir()
+        if directory is None:
+            return []
+        return [directory]
+    return [d for d in path.split(os.pathsep) if d]
+
 
 class CacheStore(object):
+    """A persistent cache of parsed .gir files.
 
-    def __init__(self):
-        try:
-            self._directory = _get_cachedir()
-        except OSError, e:
-            if e.errno != errno.EPERM:
-                raise
-            self._directory = None
+Entries are keyed by a digest of the contents of the source file, and
+each entry starts with a manifest holding the scanner version and the
+digests of every .gir file it depends on.  An entry is only used if
+all of these still match, so neither touching files nor reinstalling
+the scanner invalidates it, while any real change does.
+
+The cache is bounded by a total size and optionally a number of
+entries, taken from GI_SCANNER_CACHE_MAX_SIZE and
+GI_SCANNER_CACHE_MAX_ENTRIES or set_limits().  Once either is
+exceeded, the least recently used entries are evicted.  A value of
+0 means unlimited.
+
+Below the writable per-user directory is a search path of read-only
+system directories, usually filled at install time with
+g-ir-scanner --precompile-cache, and taken from
+GI_SCANNER_SYSTEM_CACHE_PATH.  Entries found there are used as they
+are, without ever being copied to, removed from or counted against
+the per-user cache.
 
+The access times kept for the eviction are saved when an entry is
+stored, and otherwise only by flush()."""
+
+    def __init__(self, directory=None, system_directories=None):
+        if directory is not None:
+            self._directory = directory
+        else:
+            try:
+                self._directory = _get_cachedir()
+            except OSError, e:
+                if e.errno != errno.EPERM:
+                    raise
+                self._directory = None
+        if system_directories is None:
+            system_directories = _get_system_cachedirs()
+        self._system_directories = [d for d in system_directories
+                                    if d != self._directory]
+
+        self._digests = {} # Maps from filename -> content digest
+        self._index = None # Loaded on first use, see _get_index()
+        self._index_dirty = False # Changed since it was last saved
+        self._removed = set() # Entry names removed since index load
+        self._max_size = _get_limit_from_environ('GI_SCANNER_CACHE_MAX_SIZE',
+                                                 _DEFAULT_MAX_SIZE,
+                                                 parse_cache_size)
+        self._max_entries = _get_limit_from_environ(
+            'GI_SCANNER_CACHE_MAX_ENTRIES', 0)
         self._check_cache_version()
 
+    def set_limits(self, max_size=None, max_entries=None):
+        """Override the size (in bytes) and entry budgets; None keeps
+the current value, 0 means unlimited."""
+        if max_size is not None:
+            self._max_size = max_size
+        if max_entries is not None:
+            self._max_entries = max_entries
+
+    def flush(self):
+        """Save the access times of the entries used since the index
+was last saved; to be called once the cache is no longer needed, rather
+than rewriting the index for every entry loaded."""
+        if self._index_dirty:
+            self._save_index()
+
+    def is_enabled(self):
+        """Return whether entries are stored at all; they are not when
+there is no writable cache directory."""
+        return self._directory is not None
+
     def _check_cache_version(self):
         if self._directory is None:
             return
 
-        current_hash = _get_versionhash()
         version = os.path.join(self._directory, _CACHE_VERSION_FILENAME)
-        try:
-            cache_hash = open(version).read()
-        except IOError, e:
-            # File does not exist
-            if e.errno == errno.ENOENT:
-                cache_hash = 0
-            else:
-                raise
-
-        if current_hash == cache_hash:
+        if not os.path.exists(version):
             return
 
+        # Left behind by an older scanner; none of the entries
+        # are readable by us.
         self._clean()
-        try:
-            fp = open(version, 'w')
-        except IOError, e:
-            # Permission denied
-            if e.errno == errno.EACCES:
-                return
-            else:
-                raise
+        self._remove_filename(version)
+        self._remove_filename(os.path.join(self._directory, _INDEX_FILENAME))
 
-        fp.write(current_hash)
+    def _get_digest(self, filename):
+        filename = os.path.abspath(filename)
+        digest = self._digests.get(filename)
+        if digest is None:
+            try:
+                digest = _get_file_digest(filename)
+            except IOError, e:
+                if e.errno == errno.ENOENT:
+                    return None
+                raise
+            self._digests[filename] = digest
+        return digest
 
     def _get_filename(self, filename):
         # If we couldn't create the directory we're probably
@@ -116,12 +253,146 @@ class CacheStore(object):
         # the cache all together.
         if self._directory is None:
             return
-        hexdigest = hashlib.sha1(filename).hexdigest()
-        return os.path.join(self._directory, hexdigest)
+        digest = self._get_digest(filename)
+        if digest is None:
+            return
+        return os.path.join(self._directory, digest)
+
+    def _create_manifest(self, filenames):
+        manifest = []
+        for filename in filenames:
+            manifest.append((os.path.abspath(filename),
+                             self._get_digest(filename)))
+        return (_get_versionhash(), manifest)
+
+    def _manifest_is_valid(self, manifest):
+        try:
+            versionhash, entries = manifest
+        except (TypeError, ValueError):
+            return False
+        if versionhash != _get_versionhash():
+            return False
+        for filename, digest in entries:
+            if digest is None or self._get_digest(filename) != digest:
+                return False
+        return True
+
+    def _load_manifest(self, fd):
+        try:
+            return cPickle.load(fd)
+        except (AttributeError, EOFError, ValueError, cPickle.BadPickleGet,
+                cPickle.UnpicklingError):
+            return None
+
+    def _read_index(self):
+        try:
+            fp = open(os.path.join(self._directory, _INDEX_FILENAME), 'rb')
+        except IOError, e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+        try:
+            index = cPickle.load(fp)
+        except (AttributeError, EOFError, ValueError, cPickle.BadPickleGet,
+                cPickle.UnpicklingError):
+            index = None
+        fp.close()
+        if not isinstance(index, dict):
+            return None
+        return index
+
+    def _rebuild_index(self):
+        # Only needed when the index is missing or broken
+        index = {}
+        for name in os.listdir(self._directory):
+            if name.startswith('.'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self._directory, name))
+            except OSError:
+                continue
+            index[name] = (stat.st_size, stat.st_mtime)
+        return index
 
-    def _cache_is_valid(self, store_filename, filename):
-        return (os.stat(store_filename).st_mtime >=
-                os.stat(filename).st_mtime)
+    def _get_index(self):
+        if self._index is None:
+            self._index = self._read_index()
+            if self._index is None:
+                self._index = self._rebuild_index()
+        return self._index
+
+    def _save_index(self):
+        index = self._get_index()
+        # Other scanners may have updated the index since we read it;
+        # merge their changes in rather than losing track of entries.
+        # Where the indexes disagree, an entry only stays if its file
+        # does, so entries evicted by others don't come back.
+        current = self._read_index() or {}
+        for name, (size, atime) in current.iteritems():
+            if name in self._removed:
+                continue
+            if name in index:
+                if index[name][1] < atime:
+                    index[name] = (size, atime)
+            elif os.path.exists(os.path.join(self._directory, name)):
+                index[name] = (size, atime)
+        for name in index.keys():
+            if (name not in current and
+                not os.path.exists(os.path.join(self._directory, name))):
+                del index[name]
+
+        try:
+            tmp_fd, tmp_filename = tempfile.mkstemp(prefix='.index-',
+                                                    dir=self._directory)
+        except OSError, e:
+            if e.errno in (errno.EACCES, errno.EROFS, errno.ENOSPC):
+                return
+            raise
+        try:
+            fp = os.fdopen(tmp_fd, 'wb')
+            cPickle.dump(index, fp, cPickle.HIGHEST_PROTOCOL)
+            fp.close()
+            os.rename(tmp_filename,
+                      os.path.join(self._directory, _INDEX_FILENAME))
+            self._index_dirty = False
+        except (IOError, OSError), e:
+            self._remove_filename(tmp_filename)
+            if e.errno not in (errno.EACCES, errno.ENOSPC):
+                raise
+
+    def _touch_entry(self, store_filename, size=None):
+        index = self._get_index()
+        name = os.path.basename(store_filename)
+        if size is None:
+            if name in index:
+                size = index[name][0]
+            else:
+                size = os.stat(store_filename).st_size
+        index[name] = (size, time.time())
+        self._removed.discard(name)
+        self._index_dirty = True
+
+    def _remove_entry(self, store_filename):
+        self._remove_filename(store_filename)
+        name = os.path.basename(store_filename)
+        index = self._get_index()
+        if name in index:
+            del index[name]
+        self._removed.add(name)
+        self._index_dirty = True
+
+    def _evict(self):
+        index = self._get_index()
+        total_size = sum(size for size, atime in index.itervalues())
+        entries = len(index)
+        by_access = sorted(index.iteritems(), key=lambda item: item[1][1])
+        for name, (size, atime) in by_access:
+            if ((not self._max_size or total_size <= self._max_size) and
+                (not self._max_entries or entries <= self._max_entries)):
+                break
+            self._remove_entry(os.path.join(self._directory, name))
+            total_size -= size
+            entries -= 1
 
     def _remove_filename(self, filename):
         try:
@@ -141,22 +412,56 @@ class CacheStore(object):
 
     def _clean(self):
         for filename in os.listdir(self._directory):
-            if filename == _CACHE_VERSION_FILENAME:
+            if filename in (_CACHE_VERSION_FILENAME, _INDEX_FILENAME):
                 continue
             self._remove_filename(os.path.join(self._directory, filename))
 
-    def store(self, filename, data):
+    def store(self, filename, data, dependencies=()):
+        """Store data parsed from filename.  dependencies is a
+sequence of the .gir files filename (transitively) includes; the entry
+is discarded as soon as any of them changes."""
         store_filename = self._get_filename(filename)
         if store_filename is None:
             return
+        manifest = self._create_manifest([filename] + sorted(dependencies))
+        self._store_entry(store_filename, manifest, data)
 
-        if (os.path.exists(store_filename) and
-            self._cache_is_valid(store_filename, filename)):
-            return None
+    def store_keyed(self, key, data, dependencies):
+        """Store data computed from the files in dependencies, under
+key, which should be a hex digest of whatever else it depends on."""
+        if self._directory is None:
+            return
+        manifest = self._create_manifest(sorted(dependencies))
+        self._store_entry(os.path.join(self._directory, key), manifest, data)
+
+    def _store_entry(self, store_filename, manifest, data):
+        stale = False
+        try:
+            fd = open(store_filename, 'rb')
+        except IOError, e:
+            if e.errno != errno.ENOENT:
+                raise
+        else:
+            current = self._load_manifest(fd)
+            fd.close()
+            if current == manifest:
+                self._touch_entry(store_filename)
+                return None
+            stale = True
+
+        contents = (cPickle.dumps(manifest, cPickle.HIGHEST_PROTOCOL) +
+                    serializer.dumps(data))
+        # It would be evicted right away
+        if self._max_size and len(contents) > self._max_size:
+            if stale:
+                self._remove_entry(store_filename)
+            return
 
         tmp_fd, tmp_filename = tempfile.mkstemp(prefix='g-ir-scanner-cache-')
         try:
-            cPickle.dump(data, os.fdopen(tmp_fd, 'w'))
+            fp = os.fdopen(tmp_fd, 'wb')
+            fp.write(contents)
+            fp.close()
         except IOError, e:
             # No space left on device
             if e.errno == errno.ENOSPC:
@@ -171,26 +476,66 @@ class CacheStore(object):
             # Permission denied
             if e.errno == errno.EACCES:
                 self._remove_filename(tmp_filename)
+                return
             else:
                 raise
 
-    def load(self, filename):
-        store_filename = self._get_filename(filename)
-        if store_filename is None:
-            return
+        self._touch_entry(store_filename, os.stat(store_filename).st_size)
+        self._evict()
+        self._save_index()
+
+    def _load_entry(self, store_filename, system=False):
         try:
-            fd = open(store_filename)
+            fd = open(store_filename, 'rb')
         except IOError, e:
             if e.errno == errno.ENOENT:
                 return None
+            # Unreadable system caches are simply skipped
+            elif system and e.errno == errno.EACCES:
+                return None
             else:
                 raise
-        if not self._cache_is_valid(store_filename, filename):
-            return None
         try:
-            data = cPickle.load(fd)
-        except (AttributeError, EOFError, ValueError, cPickle.BadPickleGet):
-            # Broken cache entry, remove it
-            self._remove_filename(store_filename)
-            data = None
+            manifest = self._load_manifest(fd)
+            if manifest is None or not self._manifest_is_valid(manifest):
+                data = None
+            else:
+                try:
+                    data = serializer.load(fd)
+                except ValueError:
+                    data = None
+        finally:
+            fd.close()
+        if system:
+            return data
+        if data is None:
+            # Stale or broken cache entry, remove it
+            self._remove_entry(store_filename)
+        else:
+            self._touch_entry(store_filename)
         return data
+
+    def load_keyed(self, key):
+        """Load data stored with store_keyed(), or return None if
+there is none or any of its dependencies changed."""
+        if self._directory is None:
+            return None
+        return self._load_entry(os.path.join(self._directory, key))
+
+    def load(self, filename):
+        store_filename = self._get_filename(filename)
+        if store_filename is not None:
+            data = self._load_entry(store_filename)
+            if data is not None:
+                return data
+        if not self._system_directories:
+            return None
+        digest = self._get_digest(filename)
+        if digest is None:
+            return None
+        for directory in self._system_directories:
+            data = self._load_entry(os.path.join(directory, digest),
+                                    system=True)
+            if data is not None:
+                return data
+        return None
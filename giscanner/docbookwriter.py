@@ -363,10 +363,10 @@ class DocBookWriter(object):
         self._namespace = self._transformer._namespace
         self._formatter.set_namespace(self._namespace)
 
-        for name, node in self._namespace.iteritems():
-            if isinstance(node, (ast.Class, ast.Record, ast.Interface, ast.Alias)):
-                page_name = self._formatter.get_page_name(node)
-                self._add_node(node, page_name)
+        for node in self._namespace.get_nodes_of_kind(
+                (ast.Class, ast.Record, ast.Interface, ast.Alias)):
+            page_name = self._formatter.get_page_name(node)
+            self._add_node(node, page_name)
 
     def _add_node(self, node, name):
         page = DocBookPage(name, node)
@@ -19,6 +19,8 @@
 # Boston, MA 02111-1307, USA.
 #
 
+from __future__ import with_statement
+
 import os
 import sys
 import subprocess
@@ -26,6 +28,7 @@ import shutil
 import tempfile
 
 from .gdumpparser import IntrospectionBinary
+from . import profiler
 from . import utils
 
 # bugzilla.gnome.org/558436
@@ -153,14 +156,16 @@ class DumpCompiler(object):
         bin_path = self._generate_tempfile(tmpdir, ext)
 
         try:
-            self._compile(o_path, c_path)
+            with profiler.span('compile dump binary', 'binary'):
+                self._compile(o_path, c_path)
         except CompilerError, e:
             if not utils.have_debug_flag('save-temps'):
                 shutil.rmtree(tmpdir)
             raise SystemExit('compilation of temporary binary failed:' + str(e))
 
         try:
-            self._link(bin_path, o_path)
+            with profiler.span('link dump binary', 'binary'):
+                self._link(bin_path, o_path)
         except LinkerError, e:
             if not utils.have_debug_flag('save-temps'):
                 shutil.rmtree(tmpdir)
@@ -18,6 +18,8 @@
 # Boston, MA 02111-1307, USA.
 #
 
+from __future__ import with_statement
+
 import os
 import sys
 import tempfile
@@ -27,6 +29,7 @@ from xml.etree.cElementTree import parse
 
 from . import ast
 from . import message
+from . import profiler
 from . import utils
 from .transformer import TransformerException
 from .utils import to_underscores
@@ -84,14 +87,12 @@ class GDumpParser(object):
         """
 
         # First pass: parsing
-        for node in self._namespace.itervalues():
-            if isinstance(node, ast.Function):
-                self._initparse_function(node)
+        for node in self._namespace.get_nodes_of_kind(ast.Function):
+            self._initparse_function(node)
 
         if self._namespace.name == 'GObject' or self._namespace.name == 'GLib':
-            for node in self._namespace.itervalues():
-                if isinstance(node, ast.Record):
-                    self._initparse_gobject_record(node)
+            for node in self._namespace.get_nodes_of_kind(ast.Record):
+                self._initparse_gobject_record(node)
 
     def get_get_type_functions(self):
         return self._get_type_functions
@@ -118,15 +119,15 @@ class GDumpParser(object):
         # Pair up boxed types and class records
         for name, boxed in self._boxed_types.iteritems():
             self._pair_boxed_type(boxed)
-        for node in self._namespace.itervalues():
-            if isinstance(node, (ast.Class, ast.Interface)):
-                self._find_class_record(node)
+        for node in self._namespace.get_nodes_of_kind((ast.Class,
+                                                       ast.Interface)):
+            self._find_class_record(node)
 
         # Clear the _get_type functions out of the namespace;
         # Anyone who wants them can get them from the ast.Class/Interface/Boxed
         to_remove = []
-        for name, node in self._namespace.iteritems():
-            if isinstance(node, ast.Registered) and node.get_type is not None:
+        for node in self._namespace.get_nodes_of_kind(ast.Registered):
+            if node.get_type is not None:
                 get_type_name = node.get_type
                 if get_type_name == 'intern':
                     continue
@@ -164,7 +165,9 @@ blob containing data gleaned from GObject's primitive introspection."""
         # Invoke the binary, having written our get_type functions to types.txt
         try:
             try:
-                subprocess.check_call(args, stdout=sys.stdout, stderr=sys.stderr)
+                with profiler.span('run dump binary', 'binary'):
+                    subprocess.check_call(args, stdout=sys.stdout,
+                                          stderr=sys.stderr)
             except subprocess.CalledProcessError, e:
                 # Clean up temporaries
                 raise SystemExit(e)
@@ -24,6 +24,7 @@ from xml.etree.cElementTree import parse
 
 from . import ast
 from .girwriter import COMPATIBLE_GIR_VERSION
+from .odict import odict
 
 CORE_NS = "http://www.gtk.org/introspection/core/1.0"
 C_NS = "http://www.gtk.org/introspection/c/1.0"
@@ -42,10 +43,130 @@ def _cns(tag):
     return '{%s}%s' % (C_NS, tag)
 
 
+class _LazyNamespace(ast.Namespace):
+    """A namespace which keeps the XML elements of its nodes and only
+parses them when they are looked up.  Anything that needs to see
+every node parses all the remaining ones first."""
+
+    def __init__(self, parser, name, version,
+                 identifier_prefixes=None,
+                 symbol_prefixes=None):
+        ast.Namespace.__init__(self, name, version,
+                               identifier_prefixes=identifier_prefixes,
+                               symbol_prefixes=symbol_prefixes)
+        self._parser = parser
+        self._elements = {} # Maps from GIName -> unparsed element
+        self._element_order = [] # GINames in document order
+        self._element_ctypes = {} # Maps from CType or symbol -> GIName
+        self._element_type_names = {} # Maps from GTName -> GIName
+
+    def add_element(self, node):
+        name = node.attrib.get('name')
+        if name is None:
+            name = node.attrib.get(_glibns('name'))
+        self._elements[name] = node
+        self._element_order.append(name)
+        for attr in (_cns('type'), _cns('identifier')):
+            ctype = node.attrib.get(attr)
+            if ctype is not None:
+                self._element_ctypes[ctype] = name
+        gtype_name = node.attrib.get(_glibns('type-name'))
+        if gtype_name is not None:
+            self._element_type_names.setdefault(gtype_name, name)
+
+    def _materialize(self, name):
+        node = self._elements.pop(name, None)
+        if node is not None:
+            self._parser.parse_element(node)
+
+    def _materialize_all(self):
+        if self._element_order is None:
+            return
+        for name in self._element_order:
+            self._materialize(name)
+        # Keep document order, as if everything was parsed up front
+        names = odict()
+        for name in self._element_order:
+            if name in self._names:
+                names[name] = self._names[name]
+        for name, node in self._names.iteritems():
+            if name not in names:
+                names[name] = node
+        self._names = names
+        self._element_order = None
+
+    @property
+    def names(self):
+        self._materialize_all()
+        return self._names
+
+    @property
+    def aliases(self):
+        self._materialize_all()
+        return self._aliases
+
+    @property
+    def type_names(self):
+        self._materialize_all()
+        return self._type_names
+
+    @property
+    def ctypes(self):
+        self._materialize_all()
+        return self._ctypes
+
+    def append(self, node, replace=False):
+        self._materialize(node.name)
+        ast.Namespace.append(self, node, replace=replace)
+
+    def __iter__(self):
+        self._materialize_all()
+        return ast.Namespace.__iter__(self)
+
+    def __contains__(self, name):
+        return name in self._elements or name in self._names
+
+    def iteritems(self):
+        self._materialize_all()
+        return ast.Namespace.iteritems(self)
+
+    def itervalues(self):
+        self._materialize_all()
+        return ast.Namespace.itervalues(self)
+
+    def get(self, name):
+        self._materialize(name)
+        return ast.Namespace.get(self, name)
+
+    def get_by_ctype(self, ctype):
+        name = self._element_ctypes.get(ctype)
+        if name is not None:
+            self._materialize(name)
+        return ast.Namespace.get_by_ctype(self, ctype)
+
+    def get_by_symbol(self, symbol):
+        name = self._element_ctypes.get(symbol)
+        if name is not None:
+            self._materialize(name)
+        return ast.Namespace.get_by_symbol(self, symbol)
+
+    def get_by_gtype_name(self, gtype_name):
+        name = self._element_type_names.get(gtype_name)
+        if name is not None:
+            self._materialize(name)
+        return ast.Namespace.get_by_gtype_name(self, gtype_name)
+
+    def get_gtype_names(self):
+        names = set(self._element_type_names)
+        names.update(self._type_names)
+        return list(names)
+
+
 class GIRParser(object):
 
-    def __init__(self, types_only=False):
+    def __init__(self, types_only=False, lazy=False):
         self._types_only = types_only
+        self._lazy = lazy
         self._shared_libraries = []
         self._includes = set()
         self._pkgconfig_packages = set()
@@ -93,6 +214,11 @@ class GIRParser(object):
     def get_doc(self):
         return parse(self._filename)
 
+    def parse_element(self, node):
+        """Parse a single toplevel node of the namespace; used to
+materialize the nodes of a lazy namespace."""
+        self._parser_methods[node.tag](node)
+
     # Private
 
     def _find_first_child(self, node, name_or_names):
@@ -142,7 +268,14 @@ class GIRParser(object):
         symbol_prefixes = ns.attrib.get(_cns('symbol-prefixes'))
         if symbol_prefixes:
             symbol_prefixes = symbol_prefixes.split(',')
-        self._namespace = ast.Namespace(ns.attrib['name'],
+        if self._lazy:
+            self._namespace = _LazyNamespace(self,
+                                    ns.attrib['name'],
+                                    ns.attrib['version'],
+                                    identifier_prefixes=identifier_prefixes,
+                                    symbol_prefixes=symbol_prefixes)
+        else:
+            self._namespace = ast.Namespace(ns.attrib['name'],
                                     ns.attrib['version'],
                                     identifier_prefixes=identifier_prefixes,
                                     symbol_prefixes=symbol_prefixes)
@@ -166,9 +299,17 @@ class GIRParser(object):
             parser_methods[_corens('constant')] = self._parse_constant
             parser_methods[_corens('function')] = self._parse_function
 
+        if self._lazy:
+            # Kept only when needed, bound methods can't be cached
+            self._parser_methods = parser_methods
+
         for node in ns.getchildren():
             method = parser_methods.get(node.tag)
-            if method is not None:
+            if method is None:
+                continue
+            if self._lazy:
+                self._namespace.add_element(node)
+            else:
                 method(node)
 
     def _parse_include(self, node):
@@ -246,7 +387,7 @@ class GIRParser(object):
             for func_id in ['ref-func', 'unref-func',
                             'set-value-func', 'get-value-func']:
                 func_name = node.attrib.get(_glibns(func_id))
-                obj.__dict__[func_id.replace('-', '_')] = func_name
+                setattr(obj, func_id.replace('-', '_'), func_name)
         self._namespace.append(obj)
 
         if self._types_only:
@@ -404,9 +545,9 @@ class GIRParser(object):
     def _parse_type_simple(self, typenode):
         # ast.Fields can contain inline callbacks
         if typenode.tag == _corens('callback'):
-            typeval = self._namespace.type_from_name(typenode.attrib['name'])
-            typeval.ctype = typenode.attrib.get(_cns('type'))
-            return typeval
+            ctype = typenode.attrib.get(_cns('type'))
+            return self._namespace.type_from_name(typenode.attrib['name'],
+                                                  ctype)
         # ast.Arrays have their own toplevel XML
         elif typenode.tag == _corens('array'):
             array_type = typenode.attrib.get('name')
@@ -355,8 +355,7 @@ pygi_source_scanner_append_filename (PyGISourceScanner *self,
   if (!PyArg_ParseTuple (args, "s:SourceScanner.append_filename", &filename))
     return NULL;
 
-  self->scanner->filenames = g_list_append (self->scanner->filenames,
-					    g_realpath (filename));
+  gi_source_scanner_append_filename (self->scanner, filename);
 
   Py_INCREF (Py_None);
   return Py_None;
@@ -403,6 +402,7 @@ pygi_source_scanner_parse_file (PyGISourceScanner *self,
 {
   int fd;
   FILE *fp;
+  gboolean ok;
 
   if (!PyArg_ParseTuple (args, "i:SourceScanner.parse_file", &fd))
     return NULL;
@@ -455,7 +455,14 @@ pygi_source_scanner_parse_file (PyGISourceScanner *self,
       return NULL;
     }
 
-  if (!gi_source_scanner_parse_file (self->scanner, fp))
+  /* The parser does not call into Python, so let the threads feeding
+   * the other end of a pipe run while it reads.
+   */
+  Py_BEGIN_ALLOW_THREADS
+  ok = gi_source_scanner_parse_file (self->scanner, fp);
+  Py_END_ALLOW_THREADS
+
+  if (!ok)
     {
       g_print ("Something went wrong during parsing.\n");
       return NULL;
@@ -502,6 +509,88 @@ pygi_source_scanner_set_macro_scan (PyGISourceScanner *self,
   return Py_None;
 }
 
+/* Returns a NULL-terminated array of the strings of list, which are
+ * not copied, or NULL with an exception set
+ */
+static char **
+string_list_to_strv (PyObject *list, const char *error)
+{
+  char **strv;
+  int i, n;
+
+  n = PyList_Size (list);
+  strv = g_new0 (char *, n + 1);
+  for (i = 0; i < n; ++i)
+    {
+      PyObject *obj = PyList_GetItem (list, i);
+
+      if (!PyString_Check (obj))
+	{
+	  g_free (strv);
+	  PyErr_SetString (PyExc_TypeError, error);
+	  return NULL;
+	}
+      strv[i] = PyString_AsString (obj);
+    }
+  return strv;
+}
+
+static PyObject *
+pygi_source_scanner_set_macro_prefixes (PyGISourceScanner *self,
+					PyObject          *args)
+{
+  PyObject *list;
+  char **prefixes;
+
+  if (!PyArg_ParseTuple (args, "O!:SourceScanner.set_macro_prefixes",
+			 &PyList_Type, &list))
+    return NULL;
+
+  prefixes = string_list_to_strv (list,
+				  "set_macro_prefixes takes a list of strings");
+  if (prefixes == NULL)
+    return NULL;
+
+  /* The strings are copied */
+  gi_source_scanner_set_macro_prefixes (self->scanner, prefixes);
+  g_free (prefixes);
+
+  Py_INCREF (Py_None);
+  return Py_None;
+}
+
+static PyObject *
+pygi_source_scanner_set_symbol_prefixes (PyGISourceScanner *self,
+					 PyObject          *args)
+{
+  PyObject *list;
+  char **prefixes;
+
+  if (!PyArg_ParseTuple (args, "O!:SourceScanner.set_symbol_prefixes",
+			 &PyList_Type, &list))
+    return NULL;
+
+  prefixes = string_list_to_strv (list,
+				  "set_symbol_prefixes takes a list of strings");
+  if (prefixes == NULL)
+    return NULL;
+
+  /* The strings are copied */
+  gi_source_scanner_set_symbol_prefixes (self->scanner, prefixes);
+  g_free (prefixes);
+
+  Py_INCREF (Py_None);
+  return Py_None;
+}
+
+static PyObject *
+pygi_source_scanner_get_pruned_counts (PyGISourceScanner *self)
+{
+  return Py_BuildValue ("(II)",
+			self->scanner->n_foreign_file_symbols,
+			self->scanner->n_foreign_prefix_symbols);
+}
+
 static PyObject *
 pygi_source_scanner_get_symbols (PyGISourceScanner *self)
 {
@@ -522,6 +611,185 @@ pygi_source_scanner_get_symbols (PyGISourceScanner *self)
   return list;
 }
 
+/* Bulk export: every symbol and type becomes a tuple, referring to
+ * other symbols and types by their index in the exported lists (or -1
+ * for NULL), so Python never has to call back into the scanner.
+ */
+
+typedef struct {
+  GHashTable *symbol_indexes; /* GISourceSymbol -> index + 1 */
+  GHashTable *type_indexes; /* GISourceType -> index + 1 */
+  PyObject *symbols;
+  PyObject *types;
+} SymbolExport;
+
+static int export_type (SymbolExport   *export,
+			GISourceType   *type);
+
+static PyObject *
+optional_long (gboolean is_set,
+	       gint64   value)
+{
+  if (!is_set)
+    {
+      Py_INCREF (Py_None);
+      return Py_None;
+    }
+  return PyLong_FromLongLong ((long long)value);
+}
+
+static PyObject *
+optional_double (gboolean is_set,
+		 double   value)
+{
+  if (!is_set)
+    {
+      Py_INCREF (Py_None);
+      return Py_None;
+    }
+  return PyFloat_FromDouble (value);
+}
+
+/* Returns the index of symbol, -1 for NULL or -2 on errors */
+static int
+export_symbol (SymbolExport   *export,
+	       GISourceSymbol *symbol)
+{
+  gpointer found;
+  PyObject *item;
+  int index, base_type;
+
+  if (symbol == NULL)
+    return -1;
+
+  /* Symbols are shared between copied types */
+  found = g_hash_table_lookup (export->symbol_indexes, symbol);
+  if (found)
+    return GPOINTER_TO_INT (found) - 1;
+
+  index = PyList_GET_SIZE (export->symbols);
+  if (PyList_Append (export->symbols, Py_None) < 0)
+    return -2;
+  g_hash_table_insert (export->symbol_indexes, symbol,
+		       GINT_TO_POINTER (index + 1));
+
+  base_type = export_type (export, symbol->base_type);
+  if (base_type < -1)
+    return -2;
+
+  item = Py_BuildValue ("(iziNNzziN)",
+			symbol->type,
+			symbol->ident,
+			base_type,
+			optional_long (symbol->const_int_set, symbol->const_int),
+			optional_double (symbol->const_double_set,
+					 symbol->const_double),
+			symbol->const_string,
+			symbol->source_filename,
+			symbol->line,
+			PyBool_FromLong (symbol->private));
+  if (!item)
+    return -2;
+
+  PyList_SetItem (export->symbols, index, item);
+  return index;
+}
+
+/* Returns the index of type, -1 for NULL or -2 on errors */
+static int
+export_type (SymbolExport *export,
+	     GISourceType *type)
+{
+  gpointer found;
+  GList *l;
+  PyObject *children, *item;
+  int index, base_type, i = 0;
+
+  if (type == NULL)
+    return -1;
+
+  found = g_hash_table_lookup (export->type_indexes, type);
+  if (found)
+    return GPOINTER_TO_INT (found) - 1;
+
+  index = PyList_GET_SIZE (export->types);
+  if (PyList_Append (export->types, Py_None) < 0)
+    return -2;
+  g_hash_table_insert (export->type_indexes, type,
+		       GINT_TO_POINTER (index + 1));
+
+  base_type = export_type (export, type->base_type);
+  if (base_type < -1)
+    return -2;
+
+  children = PyList_New (g_list_length (type->child_list));
+  if (!children)
+    return -2;
+  for (l = type->child_list; l; l = l->next)
+    {
+      int child = export_symbol (export, l->data);
+
+      if (child < -1)
+	{
+	  Py_DECREF (children);
+	  return -2;
+	}
+      PyList_SET_ITEM (children, i++, PyInt_FromLong (child));
+    }
+
+  item = Py_BuildValue ("(iiiiziNi)",
+			type->type,
+			type->storage_class_specifier,
+			type->type_qualifier,
+			type->function_specifier,
+			type->name,
+			base_type,
+			children,
+			type->is_bitfield);
+  if (!item)
+    return -2;
+
+  PyList_SetItem (export->types, index, item);
+  return index;
+}
+
+static PyObject *
+pygi_source_scanner_export_symbols (PyGISourceScanner *self)
+{
+  SymbolExport export;
+  GSList *l, *symbols;
+  PyObject *roots = NULL, *result = NULL;
+  int i = 0;
+
+  export.symbol_indexes = g_hash_table_new (g_direct_hash, g_direct_equal);
+  export.type_indexes = g_hash_table_new (g_direct_hash, g_direct_equal);
+  export.symbols = PyList_New (0);
+  export.types = PyList_New (0);
+  symbols = gi_source_scanner_get_symbols (self->scanner);
+  roots = PyList_New (g_slist_length (symbols));
+  if (!export.symbols || !export.types || !roots)
+    goto out;
+
+  for (l = symbols; l; l = l->next)
+    {
+      int index = export_symbol (&export, l->data);
+
+      if (index < -1)
+	goto out;
+      PyList_SET_ITEM (roots, i++, PyInt_FromLong (index));
+    }
+
+  result = Py_BuildValue ("(OOO)", roots, export.symbols, export.types);
+
+ out:
+  Py_XDECREF (roots);
+  Py_XDECREF (export.symbols);
+  Py_XDECREF (export.types);
+  g_hash_table_destroy (export.symbol_indexes);
+  g_hash_table_destroy (export.type_indexes);
+  return result;
+}
+
 static PyObject *
 pygi_source_scanner_get_comments (PyGISourceScanner *self)
 {
@@ -545,14 +813,119 @@ pygi_source_scanner_get_comments (PyGISourceScanner *self)
   return list;
 }
 
+static PyObject *
+pygi_source_scanner_get_typedefs (PyGISourceScanner *self)
+{
+  GList *l, *typedefs;
+  PyObject *list;
+  int i = 0;
+
+  typedefs = gi_source_scanner_get_typedefs (self->scanner);
+  list = PyList_New (g_list_length (typedefs));
+
+  for (l = typedefs; l; l = l->next)
+    PyList_SetItem (list, i++, PyString_FromString (l->data));
+
+  g_list_free (typedefs);
+  return list;
+}
+
+static PyObject *
+pygi_source_scanner_add_typedefs (PyGISourceScanner *self,
+				  PyObject          *args)
+{
+  PyObject *list;
+  int i;
+
+  if (!PyArg_ParseTuple (args, "O!:SourceScanner.add_typedefs",
+			 &PyList_Type, &list))
+    return NULL;
+
+  for (i = 0; i < PyList_Size (list); ++i)
+    {
+      PyObject *obj = PyList_GetItem (list, i);
+
+      if (!PyString_Check (obj))
+	{
+	  PyErr_SetString (PyExc_TypeError, "add_typedefs takes a list of strings");
+	  return NULL;
+	}
+      gi_source_scanner_add_typedef (self->scanner, PyString_AsString (obj));
+    }
+
+  Py_INCREF (Py_None);
+  return Py_None;
+}
+
+static PyObject *
+pygi_source_scanner_get_constants (PyGISourceScanner *self)
+{
+  GList *l, *constants;
+  PyObject *list;
+  int i = 0;
+
+  constants = gi_source_scanner_get_constants (self->scanner);
+  list = PyList_New (g_list_length (constants));
+
+  for (l = constants; l; l = l->next)
+    {
+      GISourceSymbol *symbol = l->data;
+      PyObject *item = Py_BuildValue ("(sLzi)", symbol->ident,
+				      (PY_LONG_LONG) symbol->const_int,
+				      symbol->source_filename,
+				      symbol->line);
+      PyList_SetItem (list, i++, item);
+    }
+
+  g_list_free (constants);
+  return list;
+}
+
+static PyObject *
+pygi_source_scanner_add_constants (PyGISourceScanner *self,
+				   PyObject          *args)
+{
+  PyObject *list;
+  int i;
+
+  if (!PyArg_ParseTuple (args, "O!:SourceScanner.add_constants",
+			 &PyList_Type, &list))
+    return NULL;
+
+  for (i = 0; i < PyList_Size (list); ++i)
+    {
+      PyObject *obj = PyList_GetItem (list, i);
+      char *name, *filename;
+      PY_LONG_LONG value;
+      int line;
+
+      if (!PyArg_ParseTuple (obj, "sLzi:SourceScanner.add_constants",
+			     &name, &value, &filename, &line))
+	return NULL;
+      gi_source_scanner_add_constant (self->scanner, name, value,
+				      filename, line);
+    }
+
+  Py_INCREF (Py_None);
+  return Py_None;
+}
+
 static const PyMethodDef _PyGISourceScanner_methods[] = {
   { "get_comments", (PyCFunction) pygi_source_scanner_get_comments, METH_NOARGS },
   { "get_symbols", (PyCFunction) pygi_source_scanner_get_symbols, METH_NOARGS },
+  { "export_symbols", (PyCFunction) pygi_source_scanner_export_symbols, METH_NOARGS },
+  { "get_typedefs", (PyCFunction) pygi_source_scanner_get_typedefs, METH_NOARGS },
+  { "add_typedefs", (PyCFunction) pygi_source_scanner_add_typedefs, METH_VARARGS },
+  { "get_constants", (PyCFunction) pygi_source_scanner_get_constants, METH_NOARGS },
+  { "add_constants", (PyCFunction) pygi_source_scanner_add_constants, METH_VARARGS },
   { "append_filename", (PyCFunction) pygi_source_scanner_append_filename, METH_VARARGS },
   { "parse_file", (PyCFunction) pygi_source_scanner_parse_file, METH_VARARGS },
   { "parse_macros", (PyCFunction) pygi_source_scanner_parse_macros, METH_VARARGS },
   { "lex_filename", (PyCFunction) pygi_source_scanner_lex_filename, METH_VARARGS },
   { "set_macro_scan", (PyCFunction) pygi_source_scanner_set_macro_scan, METH_VARARGS },
+  { "set_macro_prefixes", (PyCFunction) pygi_source_scanner_set_macro_prefixes, METH_VARARGS },
+  { "set_symbol_prefixes", (PyCFunction) pygi_source_scanner_set_symbol_prefixes, METH_VARARGS },
+  { "get_pruned_counts", (PyCFunction) pygi_source_scanner_get_pruned_counts, METH_NOARGS },
   { NULL, NULL, 0 }
 };
 
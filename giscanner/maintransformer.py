@@ -17,10 +17,13 @@
 # Boston, MA 02111-1307, USA.
 #
 
+from __future__ import with_statement
+
 import re
 
 from . import ast
 from . import message
+from . import profiler
 from .annotationparser import (TAG_VFUNC, TAG_SINCE, TAG_DEPRECATED, TAG_RETURNS,
                                TAG_ATTRIBUTES, TAG_RENAME_TO, TAG_TYPE,
                                TAG_UNREF_FUNC, TAG_REF_FUNC, TAG_SET_VALUE_FUNC,
@@ -57,55 +60,62 @@ class MainTransformer(object):
 """)
 
         # Some initial namespace surgery
-        self._namespace.walk(self._pass_fixup_hidden_fields)
+        self._walk(self._pass_fixup_hidden_fields)
 
         # We have a rough tree which should have most of of the types
         # we know about.  Let's attempt closure; walk over all of the
         # Type() types and see if they match up with something.
-        self._namespace.walk(self._pass_type_resolution)
+        self._walk(self._pass_type_resolution)
 
         # Read in annotations needed early
-        self._namespace.walk(self._pass_read_annotations_early)
+        self._walk(self._pass_read_annotations_early)
 
         # Determine some default values for transfer etc.
         # based on the current tree.
-        self._namespace.walk(self._pass_callable_defaults)
+        self._walk(self._pass_callable_defaults)
 
         # Read in most annotations now.
-        self._namespace.walk(self._pass_read_annotations)
+        self._walk(self._pass_read_annotations)
 
         # Now that we've possibly seen more types from annotations,
         # do another type resolution pass.
-        self._namespace.walk(self._pass_type_resolution)
+        self._walk(self._pass_type_resolution)
 
         # Generate a reverse mapping "bar_baz" -> BarBaz
-        for node in self._namespace.itervalues():
-            if isinstance(node, ast.Registered) and node.get_type is not None:
+        for node in self._namespace.get_nodes_of_kind(ast.Registered):
+            if node.get_type is not None:
                 self._uscore_type_names[node.c_symbol_prefix] = node
             elif isinstance(node, (ast.Record, ast.Union)):
                 uscored = to_underscores_noprefix(node.name).lower()
                 self._uscore_type_names[uscored] = node
 
-        for node in list(self._namespace.itervalues()):
-            if isinstance(node, ast.Function):
-                # Discover which toplevel functions are actually methods
-                self._pair_function(node)
-            if isinstance(node, (ast.Class, ast.Interface)):
-                self._pair_class_virtuals(node)
+        with profiler.span('pair methods', 'transform'):
+            for node in self._namespace.get_nodes_of_kind(
+                    (ast.Function, ast.Class, ast.Interface)):
+                if isinstance(node, ast.Function):
+                    # Discover which toplevel functions are actually methods
+                    self._pair_function(node)
+                if isinstance(node, (ast.Class, ast.Interface)):
+                    self._pair_class_virtuals(node)
 
         # Some annotations need to be post function pairing
-        self._namespace.walk(self._pass_read_annotations2)
+        self._walk(self._pass_read_annotations2)
 
         # Another type resolution pass after we've parsed virtuals, etc.
-        self._namespace.walk(self._pass_type_resolution)
+        self._walk(self._pass_type_resolution)
 
-        self._namespace.walk(self._pass3)
+        self._walk(self._pass3)
 
         # TODO - merge into pass3
-        self._pair_quarks_with_enums()
+        with profiler.span('pair quarks with enums', 'transform'):
+            self._pair_quarks_with_enums()
 
     # Private
 
+    def _walk(self, callback):
+        with profiler.span(callback.__name__.lstrip('_'), 'transform'):
+            self._namespace.walk(callback)
+
     def _pass_fixup_hidden_fields(self, node, chain):
         """Hide all callbacks starting with _; the typical
 usage is void (*_gtk_reserved1)(void);"""
@@ -287,7 +297,7 @@ usage is void (*_gtk_reserved1)(void);"""
             return base
         def top_combiner(base, *rest):
             if type_node is not None and isinstance(type_node, ast.Type):
-                base.is_const = type_node.is_const
+                base = base.replace(is_const=type_node.is_const)
             return combiner(base, *rest)
 
         result, rest = grab_one(type_str, resolver, top_combiner, combiner)
@@ -312,7 +322,7 @@ usage is void (*_gtk_reserved1)(void);"""
         # If we replace a node with a new type (such as an annotated) we
         # might lose the ctype from the original node.
         if type_node is not None:
-            result.ctype = type_node.ctype
+            result = result.replace(ctype=type_node.ctype)
         return result
 
     def _get_position(self, func, param):
@@ -631,7 +641,7 @@ usage is void (*_gtk_reserved1)(void);"""
         if OPT_CONSTRUCTOR in block.options and isinstance(node, ast.Function):
             node.is_constructor = True
 
-        if OPT_METHOD in block.options:
+        if OPT_METHOD in block.options and isinstance(node, ast.Callable):
             node.is_method = True
 
     def _apply_annotations_alias(self, node, chain):
@@ -893,9 +903,7 @@ the ones that failed to resolve removed."""
         # but only covers enums that are registered as GObject enums.
         # Create a fallback mapping based on all known enums in this module.
         uscore_enums = {}
-        for enum in self._namespace.itervalues():
-            if not isinstance(enum, ast.Enum):
-                continue
+        for enum in self._namespace.get_nodes_of_kind(ast.Enum):
             type_name = enum.ctype
             uscored = to_underscores(type_name).lower()
 
@@ -910,9 +918,7 @@ the ones that failed to resolve removed."""
             if no_uscore_prefixed not in uscore_enums:
                 uscore_enums[no_uscore_prefixed] = enum
 
-        for node in self._namespace.itervalues():
-            if not isinstance(node, ast.ErrorQuarkFunction):
-                continue
+        for node in self._namespace.get_nodes_of_kind(ast.ErrorQuarkFunction):
             short = node.symbol[:-len('_quark')]
             if short == "g_io_error":
                 # Special case; GIOError was already taken forcing GIOErrorEnum
@@ -34,6 +34,11 @@ class Position(object):
     """Represents a position in the source file which we
     want to inform about.
     """
+    __slots__ = ('filename', 'line', 'column')
+
+    __getstate__ = utils.get_slot_state
+    __setstate__ = utils.set_slot_state
+
     def __init__(self, filename=None, line=None, column=None):
         self.filename = filename
         self.line = line
@@ -24,13 +24,20 @@ from UserDict import DictMixin
 
 
 class odict(DictMixin):
+    """A dict which keeps its keys in insertion order.  Setting an existing
+key keeps its position.  Removing a key only leaves a hole in the list
+of keys, which is compacted once it is mostly holes, so all of these are
+amortized O(1)."""
 
     def __init__(self):
         self._items = {}
         self._keys = []
+        self._positions = {} # Maps from key -> index in _keys
+        self._holes = 0
 
     def __setitem__(self, key, value):
         if key not in self._items:
+            self._positions[key] = len(self._keys)
             self._keys.append(key)
         self._items[key] = value
 
@@ -39,7 +46,33 @@ class odict(DictMixin):
 
     def __delitem__(self, key):
         del self._items[key]
-        self._keys.remove(key)
+        del self._positions[key]
+        self._holes += 1
+        if self._holes > len(self._items):
+            self._keys = self.keys()
+            self._positions = dict([(k, i) for i, k in enumerate(self._keys)])
+            self._holes = 0
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
 
     def keys(self):
-        return self._keys[:]
+        if not self._holes:
+            return self._keys[:]
+        # A removed key which was set again is at its last position
+        positions = self._positions
+        return [key for i, key in enumerate(self._keys)
+                if positions.get(key) == i]
+
+    def iteritems(self):
+        items = self._items
+        for key in self.keys():
+            yield key, items[key]
+
+    def itervalues(self):
+        items = self._items
+        for key in self.keys():
+            yield items[key]
@@ -0,0 +1,258 @@
+# -*- Mode: Python -*-
+# GObject-Introspection - a framework for introspecting GObject libraries
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+#
+
+# Time and memory used by the phases of a scan, for --profile and
+# --memory-report.  The phases are recorded as spans, which are reported
+# as a table and written as a trace in the Trace Event Format, to be
+# loaded in chrome://tracing or https://ui.perfetto.dev.  Spans cost
+# nothing when profiling is off.
+
+from __future__ import with_statement
+
+import os
+import sys
+import thread
+import time
+from contextlib import contextmanager
+
+from .utils import get_slot_state
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# (name, category, start, end, thread, peak RSS at the start and at
+# the end) tuples, None when disabled
+_spans = None
+
+
+def enable():
+    global _spans
+    _spans = []
+
+def disable():
+    global _spans
+    _spans = None
+
+def is_enabled():
+    return _spans is not None
+
+def get_peak_rss():
+    """Return the largest resident set size of the process so far in
+bytes, or None where it is unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux and most others count in kilobytes, Mac OS X in bytes
+    if sys.platform != 'darwin':
+        peak *= 1024
+    return peak
+
+@contextmanager
+def span(name, category='scanner'):
+    """Record the time spent in the with block as name."""
+    if _spans is None:
+        yield
+        return
+    start = time.time()
+    start_rss = get_peak_rss()
+    try:
+        yield
+    finally:
+        # Appending is atomic, spans may end in other threads
+        _spans.append((name, category, start, time.time(),
+                       thread.get_ident(), start_rss, get_peak_rss()))
+
+
+def _get_phases():
+    """Return the names of the spans in the order they first started,
+and a dict of the name to [calls, time, peak RSS, RSS growth]."""
+    names = []
+    phases = {}
+    for span in sorted(_spans, key=lambda s: s[2]):
+        name, category, start, end, ident, start_rss, end_rss = span
+        if name not in phases:
+            names.append(name)
+            phases[name] = [0, 0.0, None, None]
+        phase = phases[name]
+        phase[0] += 1
+        phase[1] += end - start
+        if end_rss is not None:
+            phase[2] = max(phase[2], end_rss)
+            phase[3] = max(phase[3], end_rss - start_rss)
+    return names, phases
+
+def get_summary():
+    """Return the table of the time spent in each span, and the peak
+RSS at its end, in the order they first started."""
+    if not _spans:
+        return ''
+    wall = max(s[3] for s in _spans) - min(s[2] for s in _spans)
+    names, phases = _get_phases()
+    lines = ['%-32s %6s %10s %6s %9s' % ('span', 'calls', 'time (ms)', '%',
+                                         'peak (MB)')]
+    for name in names:
+        calls, total, peak_rss, growth = phases[name]
+        if wall > 0:
+            percent = total * 100 / wall
+        else:
+            percent = 100.0
+        if peak_rss is not None:
+            peak = '%9.1f' % (peak_rss / (1024.0 * 1024), )
+        else:
+            peak = '%9s' % ('-', )
+        lines.append('%-32s %6d %10.1f %6.1f %s' % (name, calls, total * 1000,
+                                                    percent, peak))
+    return '\n'.join(lines) + '\n'
+
+def _quote(value):
+    value = value.replace('\\', '\\\\').replace('"', '\\"')
+    return '"%s"' % (''.join(c if c >= ' ' else '\\u%04x' % (ord(c), )
+                             for c in value), )
+
+def _to_json(value, indent=''):
+    """Return value, made of dicts, lists, strings, numbers and None,
+as JSON; the json module is not available in Python 2.5."""
+    if value is None:
+        return 'null'
+    elif value is True:
+        return 'true'
+    elif value is False:
+        return 'false'
+    elif isinstance(value, basestring):
+        return _quote(value)
+    elif isinstance(value, (int, long)):
+        return str(value)
+    elif isinstance(value, float):
+        return repr(value)
+    inner = indent + '  '
+    if isinstance(value, dict):
+        items = ['%s%s: %s' % (inner, _quote(key), _to_json(value[key], inner))
+                 for key in sorted(value)]
+        return '{\n%s\n%s}' % (',\n'.join(items), indent)
+    items = [inner + _to_json(item, inner) for item in value]
+    return '[\n%s\n%s]' % (',\n'.join(items), indent)
+
+def write_trace(filename):
+    """Write the spans to filename as complete events of the Trace
+Event Format, with a counter of the peak RSS."""
+    spans = sorted(_spans, key=lambda s: s[2])
+    origin = spans and spans[0][2] or 0
+    pid = os.getpid()
+    # Thread ids are huge, number them in order of appearance instead
+    tids = {}
+    events = []
+    for name, category, start, end, ident, start_rss, end_rss in spans:
+        tid = tids.setdefault(ident, len(tids) + 1)
+        events.append(dict(name=name, cat=category, ph='X',
+                           ts=int((start - origin) * 1000000),
+                           dur=int((end - start) * 1000000),
+                           pid=pid, tid=tid))
+        if end_rss is not None:
+            events.append(dict(name='peak RSS (MB)', ph='C',
+                               ts=int((end - origin) * 1000000),
+                               pid=pid,
+                               args=dict(rss=end_rss / (1024.0 * 1024))))
+    f = open(filename, 'w')
+    try:
+        f.write(_to_json(dict(traceEvents=events, displayTimeUnit='ms')))
+        f.write('\n')
+    finally:
+        f.close()
+
+
+# Objects which are sized but hold nothing to follow
+_SCALARS = (basestring, int, long, float, bool, type(None))
+
+def get_ast_sizes(namespace, seen=None):
+    """Return a dict of the names of the ast classes to the number of
+their instances reachable from namespace and their approximate size in
+bytes, counting the strings, containers and other scanner objects they
+hold with the nearest instance holding them.  Objects whose id is in
+the set seen are skipped, and seen is updated, so that objects shared
+by namespaces are only counted once.  Sizes are 0 without
+sys.getsizeof(), which Python 2.5 lacks."""
+    from . import ast
+    getsizeof = getattr(sys, 'getsizeof', lambda obj: 0)
+    if seen is None:
+        seen = set()
+    sizes = {}
+    stack = [(namespace, None)]
+    while stack:
+        obj, owner = stack.pop()
+        if id(obj) in seen:
+            continue
+        # Nodes point back to their own namespace only
+        if isinstance(obj, ast.Namespace) and obj is not namespace:
+            continue
+        module = getattr(type(obj), '__module__', '')
+        if isinstance(obj, _SCALARS):
+            children = []
+        elif isinstance(obj, dict):
+            children = obj.keys() + obj.values()
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            children = list(obj)
+        elif module.startswith('giscanner.'):
+            children = get_slot_state(obj).values()
+            if module == ast.__name__:
+                owner = type(obj).__name__
+                sizes.setdefault(owner, [0, 0])[0] += 1
+        else:
+            continue
+        seen.add(id(obj))
+        if owner is not None:
+            size = getsizeof(obj)
+            attributes = getattr(obj, '__dict__', None)
+            if attributes is not None:
+                size += getsizeof(attributes)
+            sizes[owner][1] += size
+        stack.extend([(child, owner) for child in children])
+    return dict((name, dict(count=count, size=size))
+                for name, (count, size) in sizes.iteritems())
+
+def write_memory_report(filename, namespace, includes):
+    """Write the peak RSS of the phases, and the sizes of the ast nodes
+of namespace and of the namespaces in includes, to filename as JSON."""
+    phases = []
+    if _spans is not None:
+        names, phase_values = _get_phases()
+        for name in names:
+            calls, total, peak_rss, growth = phase_values[name]
+            phases.append(dict(name=name, peak_rss=peak_rss, growth=growth))
+
+    # What the scanned namespace shares with the includes is counted
+    # with it
+    seen = set()
+    namespaces = []
+    for ns in [namespace] + sorted(includes, key=lambda ns: ns.name):
+        namespaces.append(dict(name=ns.name,
+                               version=ns.version,
+                               included=ns is not namespace,
+                               nodes=get_ast_sizes(ns, seen)))
+
+    report = dict(peak_rss=get_peak_rss(),
+                  phases=phases,
+                  namespaces=namespaces)
+    f = open(filename, 'w')
+    try:
+        f.write(_to_json(report))
+        f.write('\n')
+    finally:
+        f.close()
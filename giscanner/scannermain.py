@@ -20,7 +20,10 @@
 # 02110-1301, USA.
 #
 
+from __future__ import with_statement
+
 import errno
+import glob
 import optparse
 import os
 import shutil
@@ -31,6 +34,7 @@ import tempfile
 from giscanner import message
 from giscanner.annotationparser import AnnotationParser
 from giscanner.ast import Include, Namespace
+from giscanner.cachestore import get_system_cachedir, parse_cache_size
 from giscanner.dumper import compile_introspection_binary
 from giscanner.gdumpparser import GDumpParser, IntrospectionBinary
 from giscanner.introspectablepass import IntrospectablePass
@@ -40,6 +44,7 @@ from giscanner.maintransformer import MainTransformer
 from giscanner.shlibs import resolve_shlibs
 from giscanner.sourcescanner import SourceScanner
 from giscanner.transformer import Transformer
+from . import profiler
 from . import utils
 
 def get_preprocessor_option_group(parser):
@@ -86,6 +91,27 @@ def _get_option_parser():
     parser.add_option("", "--add-include-path",
                       action="append", dest="include_paths", default=[],
                       help="include paths for other GIR files")
+    parser.add_option("", "--lazy-includes",
+                      action="store_true", dest="lazy_includes",
+                      default=False,
+                      help=("only parse the types of included GIR files "
+                            "which are actually referenced"))
+    parser.add_option("", "--include-jobs",
+                      action="store", type="int", dest="include_jobs",
+                      default=None,
+                      help=("number of processes to parse included GIR "
+                            "files in (default: number of CPUs)"))
+    parser.add_option("", "--lex-jobs",
+                      action="store", type="int", dest="lex_jobs",
+                      default=None,
+                      help=("number of processes to lex source files in "
+                            "(default: number of CPUs)"))
+    parser.add_option("", "--incremental",
+                      action="store_true", dest="incremental",
+                      default=False,
+                      help=("cache the symbols and comments scanned from "
+                            "the sources and only scan them again when "
+                            "they change"))
     parser.add_option("", "--program",
                       action="store", dest="program", default=None,
                       help="program to execute")
@@ -155,9 +181,36 @@ match the namespace prefix.""")
     parser.add_option("-v", "--verbose",
                       action="store_true", dest="verbose",
                       help="be verbose")
+    parser.add_option("", "--profile",
+                      action="store_true", dest="profile", default=False,
+                      help=("report the time spent in each phase, and write "
+                            "it as a trace to OUTPUT.trace.json"))
+    parser.add_option("", "--memory-report",
+                      action="store", dest="memory_report", default=None,
+                      metavar="FILE",
+                      help=("write the peak memory use of each phase and the "
+                            "size of the parsed namespaces to FILE as JSON"))
     parser.add_option("", "--c-include",
                       action="append", dest="c_includes", default=[],
                       help="headers which should be included in C programs")
+    parser.add_option("", "--cache-max-size",
+                      action="store", dest="cache_max_size", default=None,
+                      help=("maximum total size of the cache, like 100M; "
+                            "0 for unlimited (default: "
+                            "$GI_SCANNER_CACHE_MAX_SIZE or 100M)"))
+    parser.add_option("", "--cache-max-entries",
+                      action="store", type="int", dest="cache_max_entries",
+                      default=None,
+                      help=("maximum number of entries in the cache; "
+                            "0 for unlimited (default: "
+                            "$GI_SCANNER_CACHE_MAX_ENTRIES or 0)"))
+    parser.add_option("", "--precompile-cache",
+                      action="store_true", dest="precompile_cache",
+                      default=False,
+                      help=("parse the given .gir files (default: all "
+                            "installed ones) into a read-only cache shared "
+                            "by all users, written to --output (default: %s)"
+                            % (get_system_cachedir(), )))
 
     group = get_preprocessor_option_group(parser)
     parser.add_option_group(group)
@@ -197,6 +250,41 @@ def passthrough_gir(path, f):
                        parser.get_c_includes())
     f.write(writer.get_xml())
 
+def precompile_cache(options, args):
+    if options.output == '-':
+        directory = get_system_cachedir()
+    else:
+        directory = options.output
+    filenames = args[1:]
+    if not filenames:
+        filenames = sorted(glob.glob(os.path.join(DATADIR, 'gir-1.0',
+                                                  '*.gir')))
+
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError, e:
+            _error("Couldn't create cache directory %r: %s"
+                   % (directory, e.strerror))
+    if not os.access(directory, os.W_OK):
+        _error("Cache directory %r is not writable" % (directory, ))
+
+    # Includes are resolved next to the files being precompiled first
+    include_paths = list(options.include_paths)
+    for filename in filenames:
+        dirname = os.path.dirname(os.path.abspath(filename))
+        if dirname not in include_paths:
+            include_paths.append(dirname)
+
+    transformer = Transformer(None)
+    transformer.set_include_paths(include_paths)
+    transformer.set_cache_directory(directory)
+    transformer.set_cache_limits(0, 0)
+    for filename in filenames:
+        transformer.register_include_uninstalled(filename)
+    transformer.flush_cache()
+    return 0
+
 def test_codegen(optstring):
     (namespace, out_h_filename, out_c_filename) = optstring.split(',')
     if namespace == 'Everything':
@@ -278,6 +366,14 @@ see --identifier-prefix and --symbol-prefix."""
                      identifier_prefixes=identifier_prefixes,
                      symbol_prefixes=symbol_prefixes)
 
+def get_cache_max_size(options):
+    if options.cache_max_size is None:
+        return None
+    try:
+        return parse_cache_size(options.cache_max_size)
+    except ValueError:
+        _error("Invalid cache size %r" % (options.cache_max_size, ))
+
 def create_transformer(namespace, options):
     transformer = Transformer(namespace,
                               accept_unprefixed=options.accept_unprefixed)
@@ -285,8 +381,13 @@ def create_transformer(namespace, options):
     if options.passthrough_gir:
         transformer.disable_cache()
         transformer.set_passthrough_mode()
+    if options.lazy_includes:
+        transformer.set_lazy_includes()
+    transformer.set_cache_limits(get_cache_max_size(options),
+                                 options.cache_max_entries)
 
     shown_include_warning = False
+    includes = []
     for include in options.includes:
         if os.sep in include:
             _error("Invalid include path %r" % (include, ))
@@ -294,9 +395,14 @@ def create_transformer(namespace, options):
             include_obj = Include.from_string(include)
         except:
             _error("Malformed include %r\n" % (include, ))
-        transformer.register_include(include_obj)
-    for include_path in options.includes_uninstalled:
-        transformer.register_include_uninstalled(include_path)
+        includes.append(include_obj)
+    with profiler.span('includes'):
+        transformer.prefetch_includes(includes, options.includes_uninstalled,
+                                      options.include_jobs)
+        for include_obj in includes:
+            transformer.register_include(include_obj)
+        for include_path in options.includes_uninstalled:
+            transformer.register_include_uninstalled(include_path)
 
     return transformer
 
@@ -307,7 +413,8 @@ def create_binary(transformer, options, args):
 
     # Do enough parsing that we have the get_type() functions to reference
     # when creating the introspection binary
-    gdump_parser.init_parse()
+    with profiler.span('find get_type functions'):
+        gdump_parser.init_parse()
 
     if options.program:
         args=[options.program]
@@ -320,15 +427,28 @@ def create_binary(transformer, options, args):
 
     shlibs = resolve_shlibs(options, binary, options.libraries)
     gdump_parser.set_introspection_binary(binary)
-    gdump_parser.parse()
+    with profiler.span('introspect types'):
+        gdump_parser.parse()
     return shlibs
 
-def create_source_scanner(options, args):
+def create_source_scanner(options, args, namespace=None):
     filenames = extract_filenames(args)
 
     # Run the preprocessor, tokenize and construct simple
     # objects representing the raw C symbols
     ss = SourceScanner()
+    ss.set_cache_limits(get_cache_max_size(options),
+                        options.cache_max_entries)
+    ss.set_incremental(options.incremental)
+    ss.set_lex_jobs(options.lex_jobs)
+    # Symbols and constants without the prefixes of the namespace
+    # would be skipped; with --warn-all or --warn-error, the transformer
+    # warns about them
+    if (namespace is not None and not options.accept_unprefixed
+        and not options.warn_all and not options.warn_fatal):
+        ss.set_symbol_prefixes(namespace.identifier_prefixes,
+                               namespace.symbol_prefixes)
+        ss.set_macro_prefixes(namespace.symbol_prefixes)
     ss.set_cpp_options(options.cpp_includes,
                        options.cpp_defines,
                        options.cpp_undefines)
@@ -372,14 +492,49 @@ def write_output(data, options):
     except IOError, e:
         _error("while writing output: %s" % (e.strerror, ))
 
+def get_trace_filename(options):
+    if options.output and options.output != '-':
+        return options.output + '.trace.json'
+    if options.namespace_name:
+        return '%s-%s.trace.json' % (options.namespace_name,
+                                     options.namespace_version)
+    return 'g-ir-scanner.trace.json'
+
+def write_profile(options):
+    sys.stderr.write(profiler.get_summary())
+    filename = get_trace_filename(options)
+    try:
+        profiler.write_trace(filename)
+    except IOError, e:
+        sys.stderr.write("g-ir-scanner: could not write the trace to %s: "
+                         "%s\n" % (filename, e.strerror))
+        return
+    sys.stderr.write("g-ir-scanner: wrote the trace to %s\n" % (filename, ))
+
 def scanner_main(args):
     parser = _get_option_parser()
     (options, args) = parser.parse_args(args)
 
+    profile = options.profile or utils.have_debug_flag('profile')
+    if not (profile or options.memory_report):
+        return _scanner_main(options, args)
+
+    profiler.enable()
+    try:
+        with profiler.span('g-ir-scanner'):
+            return _scanner_main(options, args)
+    finally:
+        if profile:
+            write_profile(options)
+        profiler.disable()
+
+def _scanner_main(options, args):
     if options.passthrough_gir:
         passthrough_gir(options.passthrough_gir, sys.stdout)
     if options.test_codegen:
         return test_codegen(options.test_codegen)
+    if options.precompile_cache:
+        return precompile_cache(options, args)
 
     if len(args) <= 1:
         _error('Need at least one filename')
@@ -409,14 +564,22 @@ def scanner_main(args):
     if exit_code:
         return exit_code
 
-    ss = create_source_scanner(options, args)
+    with profiler.span('scan sources'):
+        ss = create_source_scanner(options, args, namespace)
+    if options.verbose:
+        foreign_files, foreign_prefixes = ss.get_pruned_counts()
+        sys.stderr.write("g-ir-scanner: skipped %d symbols from other "
+                         "files and %d without the namespace prefixes\n"
+                         % (foreign_files, foreign_prefixes))
 
     ap = AnnotationParser()
-    blocks = ap.parse(ss.get_comments())
+    with profiler.span('parse annotations'):
+        blocks = ap.parse(ss.get_comments())
 
     # Transform the C symbols into AST nodes
     transformer.set_annotations(blocks)
-    transformer.parse(ss.get_symbols())
+    with profiler.span('transform symbols'):
+        transformer.parse(ss.get_symbols())
 
     if not options.header_only:
         shlibs = create_binary(transformer, options, args)
@@ -424,12 +587,18 @@ def scanner_main(args):
         shlibs = []
 
     main = MainTransformer(transformer, blocks)
-    main.transform()
+    with profiler.span('main transformer', 'transform'):
+        main.transform()
 
     utils.break_on_debug_flag('tree')
 
     final = IntrospectablePass(transformer, blocks)
-    final.validate()
+    with profiler.span('introspectable pass', 'transform'):
+        final.validate()
+
+    # The cache is no longer used from here on
+    transformer.flush_cache()
+    ss.flush_cache()
 
     warning_count = logger.get_warning_count()
     if options.warn_fatal and warning_count > 0:
@@ -447,8 +616,16 @@ def scanner_main(args):
 
     writer = Writer(transformer.namespace, shlibs, transformer.get_includes(),
                     exported_packages, options.c_includes)
-    data = writer.get_xml()
+    with profiler.span('write gir', 'output'):
+        data = writer.get_xml()
+        write_output(data, options)
 
-    write_output(data, options)
+    if options.memory_report:
+        try:
+            profiler.write_memory_report(
+                options.memory_report, transformer.namespace,
+                transformer.get_include_namespaces())
+        except IOError, e:
+            _error("while writing the memory report: %s" % (e.strerror, ))
 
     return 0
@@ -1386,49 +1386,80 @@ yyerror (GISourceScanner *scanner, const char *s)
     }
 }
 
+/* The macro scan reads the headers from memory, through these */
+typedef struct
+{
+  const gchar *data;
+  gsize length;
+  gsize pos;
+} MacroBuffer;
+
 static int
-eat_hspace (FILE * f)
+macro_getc (MacroBuffer *b)
+{
+  if (b->pos >= b->length)
+    return EOF;
+  return (guchar) b->data[b->pos++];
+}
+
+static int
+eat_hspace (MacroBuffer *b)
 {
   int c;
   do
     {
-      c = fgetc (f);
+      c = macro_getc (b);
     }
   while (c == ' ' || c == '\t');
   return c;
 }
 
 static int
-eat_line (FILE * f, int c)
+eat_line (MacroBuffer *b, int c)
 {
-  while (c != EOF && c != '\n')
+  const gchar *newline;
+
+  if (c != EOF && c != '\n')
     {
-      c = fgetc (f);
+      newline = memchr (b->data + b->pos, '\n', b->length - b->pos);
+      b->pos = newline ? (gsize) (newline - b->data) + 1 : b->length;
+      c = newline ? '\n' : EOF;
     }
   if (c == '\n')
     {
-      c = fgetc (f);
+      c = macro_getc (b);
       if (c == ' ' || c == '\t')
         {
-          c = eat_hspace (f);
+          c = eat_hspace (b);
         }
     }
   return c;
 }
 
+/* Points identifier into the buffer, it is not nul-terminated */
 static int
-read_identifier (FILE * f, int c, char **identifier)
+read_identifier (MacroBuffer *b, int c, const gchar **identifier,
+                 gsize *length)
 {
-  GString *id = g_string_new ("");
+  *identifier = b->data + b->pos - 1;
+  *length = 0;
   while (g_ascii_isalnum (c) || c == '_')
     {
-      g_string_append_c (id, c);
-      c = fgetc (f);
+      (*length)++;
+      c = macro_getc (b);
     }
-  *identifier = g_string_free (id, FALSE);
   return c;
 }
 
+static gboolean
+macro_has_prefix (GISourceScanner *scanner, const gchar *name, gsize length)
+{
+  if (scanner->macro_prefixes == NULL)
+    return TRUE;
+
+  return gi_source_scanner_has_prefix (scanner->macro_prefixes, name, length);
+}
+
 void
 gi_source_scanner_parse_macros (GISourceScanner *scanner, GList *filenames)
 {
@@ -1442,105 +1473,75 @@ gi_source_scanner_parse_macros (GISourceScanner *scanner, GList *filenames)
   GList *l;
   for (l = filenames; l != NULL; l = l->next)
     {
-      FILE *f = fopen (l->data, "r");
+      GMappedFile *mapped;
+      MacroBuffer buffer;
+      MacroBuffer *b = &buffer;
       int line = 1;
 
       GString *define_line;
-      char *str;
-      gboolean error_line = FALSE;
-      int c = eat_hspace (f);
+      const gchar *str;
+      gsize length;
+      char *filename;
+      int c;
+
+      mapped = g_mapped_file_new (l->data, FALSE, &error);
+      if (mapped == NULL)
+        {
+          g_clear_error (&error);
+          continue;
+        }
+      b->data = g_mapped_file_get_contents (mapped);
+      b->length = g_mapped_file_get_length (mapped);
+      b->pos = 0;
+
+      c = eat_hspace (b);
       while (c != EOF)
         {
           if (c != '#')
             {
               /* ignore line */
-              c = eat_line (f, c);
+              c = eat_line (b, c);
               line++;
               continue;
             }
 
-          /* print current location */
-          str = g_strescape (l->data, "");
-          fprintf (fmacros, "# %d \"%s\"\n", line, str);
-          g_free (str);
-
-          c = eat_hspace (f);
-          c = read_identifier (f, c, &str);
-          if (strcmp (str, "define") != 0 || (c != ' ' && c != '\t'))
+          c = eat_hspace (b);
+          c = read_identifier (b, c, &str, &length);
+          if (length != 6 || strncmp (str, "define", 6) != 0 ||
+              (c != ' ' && c != '\t'))
             {
-              g_free (str);
               /* ignore line */
-              c = eat_line (f, c);
+              c = eat_line (b, c);
               line++;
               continue;
             }
-          g_free (str);
-          c = eat_hspace (f);
-          c = read_identifier (f, c, &str);
-          if (strlen (str) == 0 || (c != ' ' && c != '\t' && c != '('))
+          c = eat_hspace (b);
+          c = read_identifier (b, c, &str, &length);
+          /* Function-like macros never become symbols, and constants
+           * without one of the prefixes of the namespace would be
+           * skipped by the transformer anyway.
+           */
+          if (length == 0 || (c != ' ' && c != '\t') ||
+              !macro_has_prefix (scanner, str, length))
             {
-              g_free (str);
               /* ignore line */
-              c = eat_line (f, c);
+              c = eat_line (b, c);
               line++;
               continue;
             }
           define_line = g_string_new ("#define ");
-          g_string_append (define_line, str);
-          g_free (str);
-          if (c == '(')
-            {
-              while (c != ')')
-                {
-                  g_string_append_c (define_line, c);
-                  c = fgetc (f);
-                  if (c == EOF || c == '\n')
-                    {
-                      error_line = TRUE;
-                      break;
-                    }
-                }
-              if (error_line)
-                {
-                  g_string_free (define_line, TRUE);
-                  /* ignore line */
-                  c = eat_line (f, c);
-                  line++;
-                  continue;
-                }
-
-              g_assert (c == ')');
-              g_string_append_c (define_line, c);
-              c = fgetc (f);
-
-              /* found function-like macro */
-              fprintf (fmacros, "%s\n", define_line->str);
-
-              g_string_free (define_line, TRUE);
-              /* ignore rest of line */
-              c = eat_line (f, c);
-              line++;
-              continue;
-            }
-          if (c != ' ' && c != '\t')
-            {
-              g_string_free (define_line, TRUE);
-              /* ignore line */
-              c = eat_line (f, c);
-              line++;
-              continue;
-            }
+          g_string_append_len (define_line, str, length);
           while (c != EOF && c != '\n')
             {
               g_string_append_c (define_line, c);
-              c = fgetc (f);
+              c = macro_getc (b);
               if (c == '\\')
                 {
-                  c = fgetc (f);
+                  c = macro_getc (b);
                   if (c == '\n')
                     {
                       /* fold lines when seeing backslash new-line sequence */
-                      c = fgetc (f);
+                      c = macro_getc (b);
                     }
                   else
                     {
@@ -1549,14 +1550,18 @@ gi_source_scanner_parse_macros (GISourceScanner *scanner, GList *filenames)
                 }
             }
 
-          /* found object-like macro */
-          fprintf (fmacros, "%s\n", define_line->str);
+          /* found object-like macro, print its location first */
+          filename = g_strescape (l->data, "");
+          fprintf (fmacros, "# %d \"%s\"\n%s\n", line, filename,
+                   define_line->str);
+          g_free (filename);
+          g_string_free (define_line, TRUE);
 
-          c = eat_line (f, c);
+          c = eat_line (b, c);
           line++;
         }
 
-      fclose (f);
+      g_mapped_file_unref (mapped);
     }
 
   rewind (fmacros);
@@ -1568,14 +1573,21 @@ gi_source_scanner_parse_file (GISourceScanner *scanner, FILE *file)
 {
   g_return_val_if_fail (file != NULL, FALSE);
 
-  const_table = g_hash_table_new_full (g_str_hash, g_str_equal,
-				       g_free, (GDestroyNotify)gi_source_symbol_unref);
+  /* Enum values stay visible to the headers parsed next, which may be
+   * the rest of a stream whose start was restored, but not to macros
+   */
+  if (scanner->macro_scan)
+    const_table = g_hash_table_new_full (g_str_hash, g_str_equal,
+					 g_free, (GDestroyNotify)gi_source_symbol_unref);
+  else
+    const_table = scanner->const_table;
 
   lineno = 1;
   yyin = file;
   yyparse (scanner);
 
-  g_hash_table_destroy (const_table);
+  if (scanner->macro_scan)
+    g_hash_table_destroy (const_table);
   const_table = NULL;
 
   yyin = NULL;
@@ -0,0 +1,383 @@
+# -*- Mode: Python -*-
+# GObject-Introspection - a framework for introspecting GObject libraries
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+#
+
+# A long-lived g-ir-scanner process for build systems running it many
+# times.  It listens on a Unix socket and forks a child for each
+# command line it is sent, which runs scanner_main() exactly like a
+# fresh g-ir-scanner would, in the cwd and environment of the client,
+# and relays its output.  Forking spares the children the imports, and
+# the server keeps the included namespaces it parsed for them.
+#
+# The client side only uses the standard library, to keep starting it
+# cheap; it is used by tools/g-ir-scanner when GI_SCANNER_SERVER is set.
+
+import errno
+import glob
+import hashlib
+import marshal
+import os
+import select
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+# Variables which are read when importing the scanner, requests can only
+# be served by a server started with the same values
+_SERVER_ENVIRON = ['GI_SCANNER_DEBUG',
+                   'PYTHONPATH',
+                   'UNINSTALLED_INTROSPECTION_BUILDDIR',
+                   'UNINSTALLED_INTROSPECTION_SRCDIR',
+                   'XDG_DATA_DIRS']
+
+# Seconds the server waits for a new request before exiting
+_IDLE_TIMEOUT = 10 * 60
+
+# Seconds a client waits for the server it started to listen
+_START_TIMEOUT = 10
+
+
+def get_socket_path():
+    """Return the socket of the server for this scanner and environment,
+in a directory private to the user, or None if there is none."""
+    if os.name == 'nt' or not hasattr(socket, 'AF_UNIX'):
+        return None
+    directory = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    directory = os.path.join(directory, 'g-ir-scanner-%d' % (os.getuid(), ))
+    try:
+        os.mkdir(directory, 0700)
+    except OSError, e:
+        if e.errno != errno.EEXIST:
+            return None
+    stat = os.lstat(directory)
+    if stat.st_uid != os.getuid() or stat.st_mode & 0077:
+        return None
+    identity = repr((sys.executable,
+                     os.path.dirname(os.path.abspath(__file__)),
+                     DATADIR,
+                     [os.environ.get(name) for name in _SERVER_ENVIRON]))
+    return os.path.join(directory,
+                        hashlib.sha1(identity).hexdigest()[:16] + '.sock')
+
+
+# Messages are marshalled values, preceded by their length
+
+def _send(sock, value):
+    data = marshal.dumps(value)
+    sock.sendall(struct.pack('!I', len(data)) + data)
+
+def _recv(fp):
+    header = fp.read(4)
+    if len(header) < 4:
+        return None
+    length = struct.unpack('!I', header)[0]
+    data = fp.read(length)
+    if len(data) < length:
+        return None
+    return marshal.loads(data)
+
+
+# Client
+
+def _connect(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        sock.close()
+        return None
+    return sock
+
+def _start_server(path, script):
+    devnull = open(os.devnull, 'r+')
+    subprocess.Popen([sys.executable, script, '--serve', path],
+                     stdin=devnull, stdout=devnull, stderr=devnull,
+                     close_fds=True, cwd='/', preexec_fn=os.setsid)
+    devnull.close()
+    deadline = time.time() + _START_TIMEOUT
+    while time.time() < deadline:
+        sock = _connect(path)
+        if sock is not None:
+            return sock
+        time.sleep(0.05)
+    return None
+
+def client_main(args):
+    """Run the scanner with the command line args in the server, which
+is started if it is not running yet.  Return the exit status, or None
+if the server cannot be used and the scanner should run in this process
+instead."""
+    path = get_socket_path()
+    if path is None:
+        return None
+    sock = _connect(path)
+    if sock is None:
+        sock = _start_server(path, os.path.abspath(args[0]))
+        if sock is None:
+            return None
+
+    umask = os.umask(0)
+    os.umask(umask)
+    request = dict(argv=list(args),
+                   cwd=os.getcwd(),
+                   environ=dict(os.environ),
+                   umask=umask)
+    received = False
+    try:
+        _send(sock, request)
+        fp = sock.makefile('rb')
+        while True:
+            message = _recv(fp)
+            if message is None:
+                break
+            received = True
+            kind, value = message
+            if kind == 'stdout':
+                sys.stdout.write(value)
+                sys.stdout.flush()
+            elif kind == 'stderr':
+                sys.stderr.write(value)
+            elif kind == 'exit':
+                return value
+    except socket.error:
+        pass
+    finally:
+        sock.close()
+
+    # A server about to exit closes the connection right away; once
+    # output was relayed, running again would repeat it
+    if not received:
+        return None
+    sys.stderr.write("g-ir-scanner: lost the connection to the server\n")
+    return 1
+
+
+# Server
+
+def _get_scanner_stamps():
+    """Return the mtimes of the modules of the scanner, the server exits
+when they change."""
+    toplevel = os.path.dirname(os.path.abspath(__file__))
+    filenames = glob.glob(os.path.join(toplevel, '*.py'))
+    for pattern in ['_giscanner.*', os.path.join('.libs', '_giscanner.*')]:
+        filenames.extend(glob.glob(os.path.join(toplevel, pattern)))
+    stamps = []
+    for filename in sorted(filenames):
+        try:
+            stamps.append((filename, os.stat(filename).st_mtime))
+        except OSError:
+            pass
+    return stamps
+
+def _relay(sock, fds):
+    """Send what is written to fds, a dict of fd -> kind, until all of
+them are closed."""
+    fds = dict(fds)
+    while fds:
+        readable = select.select(list(fds), [], [])[0]
+        for fd in readable:
+            data = os.read(fd, 65536)
+            if not data:
+                os.close(fd)
+                del fds[fd]
+                continue
+            try:
+                _send(sock, (fds[fd], data))
+            except socket.error:
+                # The client went away, keep draining
+                pass
+
+def _run_scanner(scanner_main, argv):
+    from . import message
+    from . import utils
+    # Not shared with the server, but let's not rely on it
+    message.MessageLogger._instance = None
+    utils._debugflags = None
+    try:
+        status = scanner_main(argv)
+    except SystemExit, e:
+        status = e.code
+    except:
+        traceback.print_exc()
+        return 1
+    # Like the interpreter handles the status given to sys.exit()
+    if status is None:
+        return 0
+    if isinstance(status, (int, long)):
+        return status
+    sys.stderr.write('%s\n' % (status, ))
+    return 1
+
+def _serve_request(sock, report_fd, scanner_main):
+    request = _recv(sock.makefile('rb'))
+    if request is None:
+        return
+    report = os.fdopen(report_fd, 'wb')
+    report.write(marshal.dumps((request['argv'], request['cwd'])))
+    report.close()
+
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['environ'])
+    os.umask(request['umask'])
+    sys.argv = request['argv']
+
+    # Subprocesses like cpp and the compiler write to the same fds
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    stdout_read, stdout_write = os.pipe()
+    stderr_read, stderr_write = os.pipe()
+    os.dup2(stdout_write, 1)
+    os.dup2(stderr_write, 2)
+    os.close(stdout_write)
+    os.close(stderr_write)
+    relay = threading.Thread(target=_relay,
+                             args=(sock, {stdout_read: 'stdout',
+                                          stderr_read: 'stderr'}))
+    relay.start()
+    try:
+        status = _run_scanner(scanner_main, request['argv'])
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+        relay.join()
+    _send(sock, ('exit', status))
+
+def _warm_includes(argv, cwd):
+    """Parse the includes of the command line argv into the memo of the
+server, so that the next children find them."""
+    from .ast import Include
+    from .scannermain import _get_option_parser
+    from .transformer import Transformer
+
+    try:
+        options, args = _get_option_parser().parse_args(argv)
+    except SystemExit:
+        return
+    if options.passthrough_gir or options.lazy_includes:
+        return
+    try:
+        os.chdir(cwd)
+        transformer = Transformer(None)
+        transformer.set_include_paths(options.include_paths)
+        for include in options.includes:
+            transformer.register_include(Include.from_string(include))
+        for include_path in options.includes_uninstalled:
+            transformer.register_include_uninstalled(include_path)
+    except (Exception, SystemExit):
+        # The child reported whatever went wrong
+        pass
+    os.chdir('/')
+
+def server_main(path):
+    """Serve requests on the socket path until none came for a while or
+the scanner changed."""
+    import fcntl
+
+    # Only one server per socket; a second one started by a racing
+    # client just exits
+    lock = open(path + '.lock', 'w')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except IOError:
+        return 0
+    if os.path.exists(path):
+        os.unlink(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(64)
+    os.chdir('/')
+
+    # Everything the children need is imported once, here
+    from .scannermain import scanner_main
+    from . import transformer
+    transformer.enable_include_memo()
+    stamps = _get_scanner_stamps()
+
+    reports = {} # fd -> what the child reported so far
+    pids = set()
+    while True:
+        while pids:
+            pid = os.waitpid(-1, os.WNOHANG)[0]
+            if pid == 0:
+                break
+            pids.discard(pid)
+        if pids or reports:
+            timeout = 1
+        else:
+            timeout = _IDLE_TIMEOUT
+        readable = select.select([listener] + list(reports), [], [],
+                                 timeout)[0]
+        if not readable and not pids and not reports:
+            break
+
+        for fd in readable:
+            if fd is listener:
+                continue
+            data = os.read(fd, 65536)
+            if data:
+                reports[fd] += data
+                continue
+            # The child reports the request as soon as it has it, so
+            # this runs while it scans
+            os.close(fd)
+            data = reports.pop(fd)
+            if data:
+                argv, cwd = marshal.loads(data)
+                _warm_includes(argv, cwd)
+
+        if listener not in readable:
+            continue
+        sock = listener.accept()[0]
+        if _get_scanner_stamps() != stamps:
+            # The client runs the new scanner itself
+            sock.close()
+            break
+        report_read, report_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            listener.close()
+            lock.close()
+            os.close(report_read)
+            for fd in reports:
+                os.close(fd)
+            status = 0
+            try:
+                try:
+                    _serve_request(sock, report_write, scanner_main)
+                except:
+                    status = 1
+            finally:
+                os._exit(status)
+        os.close(report_write)
+        sock.close()
+        reports[report_read] = ''
+        pids.add(pid)
+
+    # Unlinked before unlocking, a new server may start right away
+    os.unlink(path)
+    listener.close()
+    lock.close()
+    return 0
@@ -0,0 +1,387 @@
+# -*- Mode: Python -*-
+# GObject-Introspection - a framework for introspecting GObject libraries
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+#
+
+
+"""serializer - compact storage for parsed namespaces
+
+This is a replacement for pickle tailored to the object graphs built
+by GIRParser: thousands of small ast objects made almost entirely of
+short, highly repetitive strings.  The graph is flattened into
+records which are written with marshal:
+
+ * Every string short enough to be repeated is interned, so marshal
+   writes it once and refers to it by index afterwards; this is the
+   string table.
+ * Each object becomes a record holding an index into a table of
+   layouts - the class plus the names of the attributes referring to
+   other objects - a dict of the remaining attributes, and the values
+   of the referring ones.  Values which contain no objects ("plain"
+   values: strings, numbers, and lists, tuples, sets and dicts of
+   those) are stored as they are and the dict is used directly as
+   the instance __dict__; only values that refer to other objects
+   are decoded in Python.  The attributes of classes with __slots__,
+   like the ast nodes, are gathered into the same dict and set on
+   the instance one by one instead.
+ * Module-level singletons such as ast.TYPE_ANY, and the ast classes,
+   are stored by name, so loading preserves their identity instead of
+   copying them.
+ * Objects of classes defining __reduce__, like ast.InternedType, are
+   stored as the function and plain arguments it returns, and loaded
+   by calling it, so interned objects stay shared.
+
+Loading allocates every object up front and fills them in afterwards,
+so cycles (like Node.namespace) are handled.  The data is preceded by
+its length and checksum, and anything malformed raises ValueError, so
+a broken cache entry is discarded rather than failing the scan.
+"""
+
+import marshal
+import struct
+import sys
+import types
+import zlib
+
+from .utils import get_slot_names
+
+_MAGIC = 'GISR'
+_VERSION = 4
+
+# Follows the magic: the length and CRC-32 of the marshalled data, so
+# truncated or corrupted data is rejected before marshal reads it
+_HEADER_FORMAT = '<II'
+_HEADER_SIZE = struct.calcsize(_HEADER_FORMAT)
+
+# Tags for complex values which can't be stored inline
+(_TAG_NUMBER,
+ _TAG_TUPLE,
+ _TAG_SET,
+ _TAG_DICT,
+ _TAG_REFS) = range(5)
+
+_SCALAR_TYPES = (type(None), bool, int, long, float, unicode)
+
+# Longer strings, like preprocessor output, are written inline rather
+# than hashed into the string table
+_MAX_INTERN_LENGTH = 1024
+
+_singletons = None
+
+def _intern(value):
+    if len(value) > _MAX_INTERN_LENGTH:
+        return value
+    return intern(value)
+
+def _get_singletons():
+    global _singletons
+    if _singletons is None:
+        from . import ast
+        _singletons = {}
+        for name, value in vars(ast).iteritems():
+            # The classes key the kind indexes of ast.Namespace
+            if (isinstance(value, ast.Type)
+                or (isinstance(value, type)
+                    and value.__module__ == ast.__name__)):
+                _singletons[id(value)] = (ast.__name__, name)
+    return _singletons
+
+
+class _Encoder(object):
+
+    def __init__(self):
+        self._singletons = _get_singletons()
+        self._globals = []
+        self._global_ids = {}
+        self._classes = []
+        self._class_ids = {}
+        self._layouts = []
+        self._layout_ids = {}
+        self._records = []
+        self._order = []
+        self._object_ids = {} # id(obj) -> record index
+        self._keepalive = []
+
+    def encode(self, obj):
+        root = self._encode_value(obj)
+        return (_VERSION, self._globals, self._classes, self._layouts,
+                self._records, self._order, root)
+
+    def _plain(self, value):
+        """Return an equivalent of value with all strings interned,
+or raise ValueError if value refers to an object."""
+        valtype = type(value)
+        if valtype is str:
+            return _intern(value)
+        elif valtype in _SCALAR_TYPES:
+            return value
+        elif valtype is list:
+            return [self._plain(item) for item in value]
+        elif valtype is tuple:
+            return tuple([self._plain(item) for item in value])
+        elif valtype is set:
+            return set([self._plain(item) for item in value])
+        elif valtype is frozenset:
+            return frozenset([self._plain(item) for item in value])
+        elif valtype is dict:
+            return dict([(self._plain(key), self._plain(item))
+                         for key, item in value.iteritems()])
+        raise ValueError(value)
+
+    def _encode_value(self, value):
+        valtype = type(value)
+        if valtype is str:
+            return _intern(value)
+        elif valtype in (int, long, float):
+            return (_TAG_NUMBER, value)
+        elif valtype in _SCALAR_TYPES:
+            return value
+        elif valtype is list:
+            items = [self._encode_value(item) for item in value]
+            for item in items:
+                if type(item) is not int:
+                    return items
+            # Lists of objects, like Class.methods, load in one step
+            return (_TAG_REFS, items)
+        elif valtype is tuple:
+            return (_TAG_TUPLE, [self._encode_value(item) for item in value])
+        elif valtype in (set, frozenset):
+            return (_TAG_SET, [self._encode_value(item) for item in value])
+        elif valtype is dict:
+            keys = value.keys()
+            return (_TAG_DICT, [self._encode_value(key) for key in keys],
+                    [self._encode_value(value[key]) for key in keys])
+        return self._encode_object(value)
+
+    def _get_class_id(self, klass):
+        class_id = self._class_ids.get(klass)
+        if class_id is None:
+            module = klass.__module__
+            if module != 'giscanner' and not module.startswith('giscanner.'):
+                raise TypeError("Can't serialize instances of %r" % (klass, ))
+            class_id = len(self._classes)
+            self._classes.append((module, klass.__name__))
+            self._class_ids[klass] = class_id
+        return class_id
+
+    def _get_layout_id(self, layout):
+        layout_id = self._layout_ids.get(layout)
+        if layout_id is None:
+            layout_id = len(self._layouts)
+            self._layouts.append(layout)
+            self._layout_ids[layout] = layout_id
+        return layout_id
+
+    def _encode_object(self, obj):
+        index = self._object_ids.get(id(obj))
+        if index is not None:
+            return index
+        index = len(self._records)
+        self._records.append(None)
+        self._object_ids[id(obj)] = index
+        self._keepalive.append(obj)
+
+        singleton = self._singletons.get(id(obj))
+        if singleton is not None:
+            global_id = self._global_ids.get(singleton)
+            if global_id is None:
+                global_id = len(self._globals)
+                self._globals.append(singleton)
+                self._global_ids[singleton] = global_id
+            self._records[index] = (-1 - global_id, None, ())
+            return index
+
+        klass = obj.__class__
+        reduce = getattr(klass, '__reduce__', object.__reduce__)
+        if reduce is not object.__reduce__:
+            function, args = obj.__reduce__()
+            try:
+                args = self._plain(args)
+            except ValueError:
+                raise TypeError("Can't serialize %r" % (obj, ))
+            # Stored with the classes, without any attribute names
+            layout = (self._get_class_id(function), None)
+            self._records[index] = (self._get_layout_id(layout), args, ())
+            return index
+
+        slot_names = get_slot_names(klass)
+        state = getattr(obj, '__dict__', None)
+        if slot_names:
+            if state is None:
+                state = {}
+            else:
+                state = dict(state)
+            for name in slot_names:
+                try:
+                    state[name] = getattr(obj, name)
+                except AttributeError:
+                    # Unset slots stay unset
+                    pass
+        elif state is None:
+            raise TypeError("Can't serialize %r" % (obj, ))
+        plain_state = {}
+        complex_keys = []
+        complex_values = []
+        for key in sorted(state):
+            value = state[key]
+            try:
+                value = self._plain(value)
+            except ValueError:
+                complex_keys.append(intern(key))
+                complex_values.append(self._encode_value(value))
+            else:
+                plain_state[intern(key)] = value
+        layout = (self._get_class_id(klass), tuple(complex_keys))
+        self._records[index] = (self._get_layout_id(layout),
+                                plain_state, tuple(complex_values))
+        # Filled in post-order on load, so objects which are only
+        # reachable through hashed containers are complete by then
+        self._order.append(index)
+        return index
+
+
+def _resolve(module, name):
+    if module != 'giscanner' and not module.startswith('giscanner.'):
+        raise ValueError("Refusing to load %s.%s" % (module, name))
+    try:
+        __import__(module)
+        return getattr(sys.modules[module], name)
+    except (ImportError, AttributeError), e:
+        raise ValueError("Can't load %s.%s: %s" % (module, name, e))
+
+
+def _decode(data):
+    # Whatever garbage is loaded, only report it as malformed
+    try:
+        return _decode_records(data)
+    except (IndexError, KeyError, TypeError, AttributeError,
+            AssertionError), e:
+        raise ValueError("Malformed serialized data: %s" % (e, ))
+
+
+def _decode_records(data):
+    try:
+        version, globals_, classes, layouts, records, order, root = data
+    except (TypeError, ValueError):
+        raise ValueError("Malformed serialized data")
+    if version != _VERSION:
+        raise ValueError("Unsupported serialization version %r" % (version, ))
+
+    globals_ = [_resolve(module, name) for module, name in globals_]
+    classes = [_resolve(module, name) for module, name in classes]
+    new_style = [isinstance(klass, type) for klass in classes]
+    slotted = [bool(get_slot_names(klass)) for klass in classes]
+
+    objects = []
+    append = objects.append
+    for layout_id, plain_state, complex_values in records:
+        if layout_id < 0:
+            append(globals_[-1 - layout_id])
+            continue
+        class_id, complex_keys = layouts[layout_id]
+        klass = classes[class_id]
+        if complex_keys is None:
+            # The function an object was reduced to
+            append(klass(*plain_state))
+        elif slotted[class_id]:
+            obj = klass.__new__(klass)
+            for key, value in plain_state.iteritems():
+                setattr(obj, key, value)
+            append(obj)
+        elif new_style[class_id]:
+            obj = klass.__new__(klass)
+            obj.__dict__ = plain_state
+            append(obj)
+        else:
+            # Old-style classes, like odict
+            append(types.InstanceType(klass, plain_state))
+
+    def decode_value(value):
+        valtype = type(value)
+        if valtype is int:
+            return objects[value]
+        elif valtype is list:
+            return [decode_value(item) for item in value]
+        elif valtype is tuple:
+            tag = value[0]
+            if tag == _TAG_NUMBER:
+                return value[1]
+            elif tag == _TAG_TUPLE:
+                return tuple([decode_value(item) for item in value[1]])
+            elif tag == _TAG_SET:
+                return set([decode_value(item) for item in value[1]])
+            elif tag == _TAG_REFS:
+                return map(objects.__getitem__, value[1])
+            elif tag == _TAG_DICT:
+                return dict(zip([decode_value(key) for key in value[1]],
+                                [decode_value(item) for item in value[2]]))
+            raise ValueError("Unknown tag %r" % (tag, ))
+        return value
+
+    for index in order:
+        layout_id, plain_state, complex_values = records[index]
+        if not complex_values:
+            continue
+        class_id, complex_keys = layouts[layout_id]
+        if slotted[class_id]:
+            obj = objects[index]
+            for key, value in zip(complex_keys, complex_values):
+                setattr(obj, key, decode_value(value))
+        else:
+            for key, value in zip(complex_keys, complex_values):
+                plain_state[key] = decode_value(value)
+
+    return decode_value(root)
+
+
+def dumps(obj):
+    """Serialize obj, which may be composed of builtin types and
+instances of giscanner classes, into a string."""
+    data = marshal.dumps(_Encoder().encode(obj), 2)
+    header = struct.pack(_HEADER_FORMAT, len(data),
+                         zlib.crc32(data) & 0xffffffff)
+    return _MAGIC + header + data
+
+
+def loads(data):
+    """Load an object serialized by dumps().  Raises ValueError
+if data is malformed or was written by a different version."""
+    if data[:len(_MAGIC)] != _MAGIC:
+        raise ValueError("Not a serialized namespace")
+    start = len(_MAGIC) + _HEADER_SIZE
+    if len(data) < start:
+        raise ValueError("Truncated serialized data")
+    length, checksum = struct.unpack(_HEADER_FORMAT,
+                                     data[len(_MAGIC):start])
+    if len(data) - start != length:
+        raise ValueError("Truncated serialized data")
+    data = buffer(data, start)
+    if zlib.crc32(data) & 0xffffffff != checksum:
+        raise ValueError("Corrupted serialized data")
+    try:
+        data = marshal.loads(data)
+    except (EOFError, TypeError), e:
+        raise ValueError(str(e))
+    return _decode(data)
+
+
+def dump(obj, fp):
+    fp.write(dumps(obj))
+
+
+def load(fp):
+    return loads(fp.read())
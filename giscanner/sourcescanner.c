@@ -23,6 +23,11 @@
 #include "sourcescanner.h"
 #include <string.h>
 
+#ifdef G_OS_WIN32
+#define USE_WINDOWS
+#endif
+#include "grealpath.h"
+
 GISourceSymbol *
 gi_source_symbol_new (GISourceSymbolType type, const gchar *filename, int line)
 {
@@ -191,6 +196,10 @@ gi_source_scanner_new (void)
   scanner->struct_or_union_or_enum_table =
     g_hash_table_new_full (g_str_hash, g_str_equal,
 			   g_free, (GDestroyNotify)gi_source_symbol_unref);
+  scanner->filenames_table = g_hash_table_new (g_str_hash, g_str_equal);
+  scanner->const_table =
+    g_hash_table_new_full (g_str_hash, g_str_equal,
+			   g_free, (GDestroyNotify)gi_source_symbol_unref);
 
   return scanner;
 }
@@ -199,7 +208,6 @@ static void
 gi_source_comment_free (GISourceComment *comment)
 {
   g_free (comment->comment);
-  g_free (comment->filename);
   g_slice_free (GISourceComment, comment);
 }
 
@@ -210,15 +218,20 @@ gi_source_scanner_free (GISourceScanner *scanner)
 
   g_hash_table_destroy (scanner->typedef_table);
   g_hash_table_destroy (scanner->struct_or_union_or_enum_table);
+  g_hash_table_destroy (scanner->const_table);
 
   g_slist_foreach (scanner->comments, (GFunc)gi_source_comment_free, NULL);
   g_slist_free (scanner->comments);
   g_slist_foreach (scanner->symbols, (GFunc)gi_source_symbol_unref, NULL);
   g_slist_free (scanner->symbols);
 
+  g_hash_table_destroy (scanner->filenames_table);
   g_list_foreach (scanner->filenames, (GFunc)g_free, NULL);
   g_list_free (scanner->filenames);
 
+  g_strfreev (scanner->macro_prefixes);
+  g_strfreev (scanner->symbol_prefixes);
+
 }
 
 gboolean
@@ -229,6 +242,44 @@ gi_source_scanner_is_typedef (GISourceScanner *scanner,
   return b;
 }
 
+void
+gi_source_scanner_add_typedef (GISourceScanner *scanner,
+			       const char      *name)
+{
+  g_hash_table_insert (scanner->typedef_table,
+		       g_strdup (name),
+		       GINT_TO_POINTER (TRUE));
+}
+
+GList *
+gi_source_scanner_get_typedefs (GISourceScanner *scanner)
+{
+  return g_hash_table_get_keys (scanner->typedef_table);
+}
+
+void
+gi_source_scanner_add_constant (GISourceScanner *scanner,
+				const char      *name,
+				gint64           value,
+				const char      *filename,
+				int              line)
+{
+  GISourceSymbol *symbol;
+
+  symbol = gi_source_symbol_new (CSYMBOL_TYPE_OBJECT, filename, line);
+  symbol->ident = g_strdup (name);
+  symbol->const_int_set = TRUE;
+  symbol->const_int = value;
+  g_hash_table_insert (scanner->const_table, g_strdup (name), symbol);
+}
+
+/* Returns the enum values, GISourceSymbols owned by the scanner */
+GList *
+gi_source_scanner_get_constants (GISourceScanner *scanner)
+{
+  return g_hash_table_get_values (scanner->const_table);
+}
+
 void
 gi_source_scanner_set_macro_scan (GISourceScanner  *scanner,
 				  gboolean          macro_scan)
@@ -236,24 +287,89 @@ gi_source_scanner_set_macro_scan (GISourceScanner  *scanner,
   scanner->macro_scan = macro_scan;
 }
 
+/* Only object-like macros starting with one of prefixes are parsed
+ * by gi_source_scanner_parse_macros(), NULL or an empty array keeps all
+ */
 void
-gi_source_scanner_add_symbol (GISourceScanner  *scanner,
-			      GISourceSymbol   *symbol)
+gi_source_scanner_set_macro_prefixes (GISourceScanner  *scanner,
+				      char            **prefixes)
 {
-  gboolean found_filename = FALSE;
-  GList *l;
+  g_strfreev (scanner->macro_prefixes);
+  scanner->macro_prefixes = NULL;
+  if (prefixes != NULL && prefixes[0] != NULL)
+    scanner->macro_prefixes = g_strdupv (prefixes);
+}
 
-  g_assert (scanner->current_filename);
-  for (l = scanner->filenames; l != NULL; l = l->next)
+/* Symbols of the scanned files not starting with one of prefixes are
+ * dropped, like the transformer would skip them as foreign, NULL or an
+ * empty array keeps all
+ */
+void
+gi_source_scanner_set_symbol_prefixes (GISourceScanner  *scanner,
+				       char            **prefixes)
+{
+  g_strfreev (scanner->symbol_prefixes);
+  scanner->symbol_prefixes = NULL;
+  if (prefixes != NULL && prefixes[0] != NULL)
+    scanner->symbol_prefixes = g_strdupv (prefixes);
+}
+
+/* Whether the first length bytes of name start with one of prefixes,
+ * hidden names like _FOO_BAR are stripped of the underscore first
+ */
+gboolean
+gi_source_scanner_has_prefix (char       **prefixes,
+			      const char  *name,
+			      gsize        length)
+{
+  char **prefix;
+
+  if (length > 0 && name[0] == '_')
     {
-      if (strcmp (l->data, scanner->current_filename) == 0)
-	{
-	  found_filename = TRUE;
-	  break;
-	}
+      name++;
+      length--;
     }
+  for (prefix = prefixes; *prefix; prefix++)
+    {
+      gsize prefix_length = strlen (*prefix);
+      if (prefix_length <= length &&
+          strncmp (name, *prefix, prefix_length) == 0)
+        return TRUE;
+    }
+  return FALSE;
+}
+
+void
+gi_source_scanner_append_filename (GISourceScanner *scanner,
+				   const char      *filename)
+{
+  char *path = g_realpath (filename);
+
+  if (path == NULL)
+    return;
+  scanner->filenames = g_list_append (scanner->filenames, path);
+  g_hash_table_insert (scanner->filenames_table, path, path);
+}
+
+void
+gi_source_scanner_add_symbol (GISourceScanner  *scanner,
+			      GISourceSymbol   *symbol)
+{
+  g_assert (scanner->current_filename);
 
-  if (found_filename || scanner->macro_scan)
+  /* Most symbols come from the system and dependency headers, only
+   * keep those the transformer will not skip as foreign anyway
+   */
+  if (!scanner->macro_scan &&
+      !g_hash_table_lookup (scanner->filenames_table,
+			    scanner->current_filename))
+    scanner->n_foreign_file_symbols++;
+  else if (scanner->symbol_prefixes != NULL && symbol->ident != NULL &&
+	   !gi_source_scanner_has_prefix (scanner->symbol_prefixes,
+					  symbol->ident,
+					  strlen (symbol->ident)))
+    scanner->n_foreign_prefix_symbols++;
+  else
     scanner->symbols = g_slist_prepend (scanner->symbols,
 					gi_source_symbol_ref (symbol));
   g_assert (symbol->source_filename != NULL);
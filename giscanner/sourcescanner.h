@@ -99,7 +99,7 @@ typedef enum
 struct _GISourceComment
 {
   char *comment;
-  char *filename;
+  const char *filename; /* interned, shared by all comments of a file */
   int line;
 };
 
@@ -111,9 +111,15 @@ struct _GISourceScanner
   gboolean flags; /* set by gtk-doc comment <flags> */
   GSList *symbols;
   GList *filenames;
+  GHashTable *filenames_table; /* the same, for lookups */
   GSList *comments; /* _GIComment */
   GHashTable *typedef_table;
   GHashTable *struct_or_union_or_enum_table;
+  GHashTable *const_table; /* enum values of the parsed headers */
+  char **macro_prefixes; /* NULL to keep all macros */
+  char **symbol_prefixes; /* NULL to keep all symbols */
+  guint n_foreign_file_symbols; /* dropped, not in filenames */
+  guint n_foreign_prefix_symbols; /* dropped, no symbol prefix */
 };
 
 struct _GISourceSymbol
@@ -154,8 +160,23 @@ void                gi_source_scanner_parse_macros     (GISourceScanner  *scanne
 							GList            *filenames);
 void                gi_source_scanner_set_macro_scan   (GISourceScanner  *scanner,
 							gboolean          macro_scan);
+void                gi_source_scanner_set_macro_prefixes (GISourceScanner  *scanner,
+							  char            **prefixes);
+void                gi_source_scanner_set_symbol_prefixes (GISourceScanner  *scanner,
+							   char            **prefixes);
+void                gi_source_scanner_append_filename  (GISourceScanner  *scanner,
+							const char       *filename);
 GSList *            gi_source_scanner_get_symbols      (GISourceScanner  *scanner);
 GSList *            gi_source_scanner_get_comments     (GISourceScanner  *scanner);
+void                gi_source_scanner_add_typedef      (GISourceScanner  *scanner,
+							const char       *name);
+GList *             gi_source_scanner_get_typedefs     (GISourceScanner  *scanner);
+void                gi_source_scanner_add_constant     (GISourceScanner  *scanner,
+							const char       *name,
+							gint64            value,
+							const char       *filename,
+							int               line);
+GList *             gi_source_scanner_get_constants    (GISourceScanner  *scanner);
 void                gi_source_scanner_free             (GISourceScanner  *scanner);
 
 GISourceSymbol *    gi_source_symbol_new               (GISourceSymbolType  type, const gchar *filename, int line);
@@ -168,6 +189,9 @@ void                gi_source_scanner_add_symbol       (GISourceScanner  *scanne
 							GISourceSymbol   *symbol);
 gboolean            gi_source_scanner_is_typedef       (GISourceScanner  *scanner,
 							const char       *name);
+gboolean            gi_source_scanner_has_prefix       (char            **prefixes,
+							const char       *name,
+							gsize             length);
 void                gi_source_symbol_merge_type        (GISourceSymbol   *symbol,
 							GISourceType     *type);
 GISourceType *      gi_source_type_new                 (GISourceTypeType  type);
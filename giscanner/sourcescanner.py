@@ -19,12 +19,26 @@
 #
 
 from __future__ import with_statement
+import errno
+import hashlib
+import itertools
 import os
+import re
 import subprocess
-import tempfile
+import sys
+import threading
 
+try:
+    import multiprocessing
+except ImportError:
+    # Python 2.5, the sources are lexed in this process
+    multiprocessing = None
+
+from .cachestore import CacheStore
 from .libtoolimporter import LibtoolImporter
 from .message import Position
+from .utils import get_slot_state, set_slot_state
+from . import profiler
 
 with LibtoolImporter(None, None):
     if 'UNINSTALLED_INTROSPECTION_SRCDIR' in os.environ:
@@ -78,6 +92,54 @@ FUNCTION_INLINE = 1 << 1
  UNARY_LOGICAL_NEGATION) = range(6)
 
 
+# Matches the line markers cpp writes, like: # 1 "foo.h" 2
+_LINEMARKER_RE = re.compile(r'^# \d+ "((?:[^"\\]|\\.)*)"', re.MULTILINE)
+
+def _get_cpp_dependencies(output):
+    """Return the names of all files cpp read to produce output."""
+    filenames = set()
+    for filename in _LINEMARKER_RE.findall(output):
+        filename = filename.replace('\\\\', '\\').replace('\\"', '"')
+        # Skip <stdin>, <built-in> and <command-line>
+        if not filename.startswith('<'):
+            filenames.add(filename)
+    return filenames
+
+# Parsing less than this again is cheaper than loading a snapshot
+_SNAPSHOT_MIN_SIZE = 64 * 1024
+
+# Comments and preprocessor lines, which are not declarations
+_NON_CONTENT_RE = re.compile(r'/\*.*?\*/|//[^\n]*|^#[^\n]*',
+                             re.DOTALL | re.MULTILINE)
+
+def _get_scanned_offset(output, filenames):
+    """Return the offset of the line marker of the first declaration
+in output from one of filenames, or None.  What comes before it are the
+system headers the files include first."""
+    filenames = set(os.path.realpath(filename) for filename in filenames)
+    realpaths = {}
+    markers = list(_LINEMARKER_RE.finditer(output))
+    for i, marker in enumerate(markers):
+        filename = marker.group(1)
+        filename = filename.replace('\\\\', '\\').replace('\\"', '"')
+        if filename not in realpaths:
+            realpaths[filename] = os.path.realpath(filename)
+        if realpaths[filename] not in filenames:
+            continue
+        if i + 1 < len(markers):
+            end = markers[i + 1].start()
+        else:
+            end = len(output)
+        # Past the flags of the marker
+        start = output.find('\n', marker.end(), end)
+        if start < 0:
+            continue
+        segment = _NON_CONTENT_RE.sub('', output[start:end])
+        if segment.strip():
+            return marker.start()
+    return None
+
+
 def symbol_type_name(symbol_type):
     return {
         CSYMBOL_TYPE_INVALID: 'invalid',
@@ -111,6 +173,9 @@ def ctype_name(ctype):
 class SourceType(object):
     __members__ = ['type', 'base_type', 'name', 'type_qualifier',
                    'child_list', 'is_bitfield']
+    # The wrappers of the base type and children are created once, on
+    # first use
+    __slots__ = ('_scanner', '_stype', '_base_type', '_child_list')
 
     def __init__(self, scanner, stype):
         self._scanner = scanner
@@ -128,8 +193,11 @@ class SourceType(object):
 
     @property
     def base_type(self):
-        if self._stype.base_type is not None:
-            return SourceType(self._scanner, self._stype.base_type)
+        try:
+            return self._base_type
+        except AttributeError:
+            self._base_type = _wrap_type(self._scanner, self._stype.base_type)
+            return self._base_type
 
     @property
     def name(self):
@@ -141,10 +209,13 @@ class SourceType(object):
 
     @property
     def child_list(self):
-        for symbol in self._stype.child_list:
-            if symbol is None:
-                continue
-            yield SourceSymbol(self._scanner, symbol)
+        try:
+            return self._child_list
+        except AttributeError:
+            self._child_list = tuple([SourceSymbol(self._scanner, symbol)
+                                      for symbol in self._stype.child_list
+                                      if symbol is not None])
+            return self._child_list
 
     @property
     def is_bitfield(self):
@@ -154,6 +225,7 @@ class SourceType(object):
 class SourceSymbol(object):
     __members__ = ['const_int', 'const_double', 'const_string', 'ident',
                    'type', 'base_type']
+    __slots__ = ('_scanner', '_symbol', '_base_type')
 
     def __init__(self, scanner, symbol):
         self._scanner = scanner
@@ -193,8 +265,12 @@ class SourceSymbol(object):
 
     @property
     def base_type(self):
-        if self._symbol.base_type is not None:
-            return SourceType(self._scanner, self._symbol.base_type)
+        try:
+            return self._base_type
+        except AttributeError:
+            self._base_type = _wrap_type(self._scanner,
+                                         self._symbol.base_type)
+            return self._base_type
 
     @property
     def source_filename(self):
@@ -214,15 +290,107 @@ class SourceSymbol(object):
                         self._symbol.line)
 
 
+def _wrap_type(scanner, stype):
+    if stype is None:
+        return None
+    return SourceType(scanner, stype)
+
+
+# Plain copies of the symbols and types of the C scanner, with the same
+# attributes, so that walking them never calls into the scanner and they
+# can be stored in the cache.  SourceSymbol and SourceType wrap them
+# like the originals.
+
+class _TypeRecord(object):
+    __slots__ = ('type', 'storage_class_specifier', 'type_qualifier',
+                 'function_specifier', 'name', 'base_type', 'child_list',
+                 'is_bitfield')
+
+    __getstate__ = get_slot_state
+    __setstate__ = set_slot_state
+
+
+class _SymbolRecord(object):
+    __slots__ = ('type', 'ident', 'base_type', 'const_int', 'const_double',
+                 'const_string', 'source_filename', 'line', 'private')
+
+    __getstate__ = get_slot_state
+    __setstate__ = set_slot_state
+
+
+def _export_symbols(scanner):
+    """Return copies of the symbols of the C scanner, exporting all of
+them and their types in a single call."""
+    roots, symbol_values, type_values = scanner.export_symbols()
+    symbols = [_SymbolRecord() for values in symbol_values]
+    types = [_TypeRecord() for values in type_values]
+    # Symbols and types refer to each other by index, -1 is None
+    for symbol, values in itertools.izip(symbols, symbol_values):
+        (symbol.type, symbol.ident, base_type, symbol.const_int,
+         symbol.const_double, symbol.const_string, symbol.source_filename,
+         symbol.line, symbol.private) = values
+        symbol.base_type = types[base_type] if base_type >= 0 else None
+    for stype, values in itertools.izip(types, type_values):
+        (stype.type, stype.storage_class_specifier, stype.type_qualifier,
+         stype.function_specifier, stype.name, base_type, children,
+         stype.is_bitfield) = values
+        stype.base_type = types[base_type] if base_type >= 0 else None
+        stype.child_list = [symbols[child] if child >= 0 else None
+                            for child in children]
+    return [symbols[root] for root in roots]
+
+
+def _lex_source(filename):
+    scanner = CSourceScanner()
+    scanner.lex_filename(filename)
+    return scanner.get_comments()
+
+
+def _is_broken_pipe(e):
+    return (isinstance(e, (IOError, OSError))
+            and e.errno == errno.EPIPE)
+
+
 class SourceScanner(object):
 
     def __init__(self):
         self._scanner = CSourceScanner()
         self._filenames = []
         self._cpp_options = []
+        self._cachestore = CacheStore()
+        self._incremental = False
+        self._lex_jobs = None
+        self._scanned_filenames = []
+        self._symbol_prefixes = []
+        # Symbols from other files and without the prefixes, which
+        # were dropped by scanners other than our own
+        self._pruned_counts = (0, 0)
+        # Results replayed from the cache in incremental mode, these
+        # come before the ones of the C scanner
+        self._symbols = []
+        self._comments = []
 
     # Public API
 
+    def set_incremental(self, incremental):
+        """In incremental mode the comments of every source file and the
+symbols of the headers are stored in the cache, and only scanned
+again when one of the files they were read from changes."""
+        self._incremental = incremental
+
+    def set_cache_limits(self, max_size=None, max_entries=None):
+        if self._cachestore is not None:
+            self._cachestore.set_limits(max_size, max_entries)
+
+    def flush_cache(self):
+        """Save the state of the cache, once done scanning."""
+        self._cachestore.flush()
+
+    def set_lex_jobs(self, jobs):
+        """Lex the source files in up to jobs processes, by default one
+per CPU."""
+        self._lex_jobs = jobs
+
     def set_cpp_options(self, includes, defines, undefines):
         for prefix, args in [('-I', includes),
                              ('-D', defines),
@@ -236,34 +404,73 @@ class SourceScanner(object):
         for filename in filenames:
             filename = os.path.abspath(filename)
             self._scanner.append_filename(filename)
+            self._scanned_filenames.append(filename)
 
         headers = []
+        sources = []
         for filename in filenames:
             if (filename.endswith('.c') or filename.endswith('.cpp') or
                 filename.endswith('.cc') or filename.endswith('.cxx')):
-                filename = os.path.abspath(filename)
-                self._scanner.lex_filename(filename)
+                sources.append(os.path.abspath(filename))
             else:
                 headers.append(filename)
 
+        # Only the comments of the sources are used
+        with profiler.span('lex sources'):
+            self._comments.extend(self._lex_sources(sources))
         self._parse(headers)
         self._filenames.extend(headers)
 
+    def set_macro_prefixes(self, symbol_prefixes):
+        """Only parse the constants starting with one of symbol_prefixes,
+in lower or upper case, like the transformer would accept them.  No
+prefixes parses all of them."""
+        prefixes = []
+        for prefix in symbol_prefixes:
+            if not prefix.endswith('_'):
+                prefix = prefix + '_'
+            prefixes.extend([prefix, prefix.upper()])
+        self._scanner.set_macro_prefixes(prefixes)
+
+    def set_symbol_prefixes(self, identifier_prefixes, symbol_prefixes):
+        """Drop the symbols of the headers which do not start with one
+of identifier_prefixes or symbol_prefixes in lower or upper case, as the
+transformer would skip them as foreign.  No prefixes keeps all of them."""
+        prefixes = list(identifier_prefixes)
+        for prefix in symbol_prefixes:
+            if not prefix.endswith('_'):
+                prefix = prefix + '_'
+            prefixes.extend([prefix, prefix.upper()])
+        self._symbol_prefixes = prefixes
+        self._scanner.set_symbol_prefixes(prefixes)
+
     def parse_macros(self, filenames):
         self._scanner.set_macro_scan(True)
-        self._scanner.parse_macros(filenames)
+        with profiler.span('parse macros'):
+            self._scanner.parse_macros(filenames)
         self._scanner.set_macro_scan(False)
 
     def get_symbols(self):
-        for symbol in self._scanner.get_symbols():
+        for symbol in itertools.chain(self._symbols,
+                                      _export_symbols(self._scanner)):
             yield SourceSymbol(self._scanner, symbol)
 
+    def get_pruned_counts(self):
+        """Return the number of symbols dropped because they were not
+in one of the scanned files, and because they did not have the prefixes
+of the namespace."""
+        foreign_files, foreign_prefixes = self._scanner.get_pruned_counts()
+        return (self._pruned_counts[0] + foreign_files,
+                self._pruned_counts[1] + foreign_prefixes)
+
     def get_comments(self):
-        return self._scanner.get_comments()
+        """Return an iterator over the gtk-doc comments found, as
+(comment, filename, line) tuples."""
+        return itertools.chain(self._comments, self._scanner.get_comments())
 
     def dump(self):
         print '-'*30
-        for symbol in self._scanner.get_symbols():
+        for symbol in self.get_symbols():
             print symbol.ident, symbol.base_type.name, symbol.type
 
     # Private
@@ -278,37 +485,258 @@ class SourceScanner(object):
         cpp_args += ['-E', '-C', '-I.', '-']
 
         cpp_args += self._cpp_options
-        proc = subprocess.Popen(cpp_args,
-                                stdin=subprocess.PIPE,
-                                stdout=subprocess.PIPE)
 
+        source = []
         for define in defines:
-            proc.stdin.write('#ifndef %s\n' % (define, ))
-            proc.stdin.write('# define %s\n' % (define, ))
-            proc.stdin.write('#endif\n')
+            source.append('#ifndef %s\n' % (define, ))
+            source.append('# define %s\n' % (define, ))
+            source.append('#endif\n')
         for undef in undefs:
-            proc.stdin.write('#undef %s\n' % (undef, ))
+            source.append('#undef %s\n' % (undef, ))
         for filename in filenames:
             filename = os.path.abspath(filename)
-            proc.stdin.write('#include <%s>\n' % (filename, ))
-        proc.stdin.close()
-
-        tmp = tempfile.mktemp()
-        fp = open(tmp, 'w+')
-        while True:
-            data = proc.stdout.read(4096)
-            if data is None:
-                break
-            fp.write(data)
-            if len(data) < 4096:
-                break
-        fp.seek(0, 0)
-
-        assert proc, 'Proc was none'
-        proc.wait()
+            source.append('#include <%s>\n' % (filename, ))
+        source = ''.join(source)
+
+        # The output only depends on the command, the working directory
+        # (for -I.), the input and the files cpp reads; the latter are
+        # checked by the cache store itself.
+        key = hashlib.sha1(repr((cpp_args, os.getcwd(), source))).hexdigest()
+        if self._incremental:
+            self._parse_incremental(cpp_args, source, key)
+        else:
+            output, symbols, comments, pruned_counts = self._scan(
+                self._scanner, cpp_args, source, key)
+            self._add_pruned_counts(pruned_counts)
+            self._symbols.extend(symbols)
+            self._comments.extend(comments)
+
+    def _scan(self, scanner, cpp_args, source, key):
+        """Parse the preprocessed source with scanner.  Return the output
+of the preprocessor, and the symbols, comments and pruned counts of the
+system headers at its start, which were restored from a snapshot rather
+than parsed by scanner.  Unless the output is in the cache, it is parsed
+while cpp is still writing it."""
+        output = self._cachestore.load_keyed(key)
+        if output is None:
+            output = self._parse_stream(
+                scanner, lambda fp: self._preprocess(cpp_args, source, fp))
+            # The snapshot is taken from the stored copy on the next scan
+            if self._cachestore.is_enabled():
+                self._cachestore.store_keyed(key, output,
+                                             _get_cpp_dependencies(output))
+            return output, [], [], (0, 0)
+
+        offset = None
+        if len(output) >= _SNAPSHOT_MIN_SIZE:
+            offset = _get_scanned_offset(output, self._scanned_filenames)
+        if offset is None or offset < _SNAPSHOT_MIN_SIZE:
+            self._parse_stream(scanner, lambda fp: fp.write(output))
+            return output, [], [], (0, 0)
+
+        symbols, comments, pruned_counts = self._restore_snapshot(
+            scanner, buffer(output, 0, offset))
+        # The rest starts with a line marker, which sets the file
+        self._parse_stream(scanner,
+                           lambda fp: fp.write(buffer(output, offset)))
+        return output, symbols, comments, pruned_counts
+
+    def _restore_snapshot(self, scanner, prefix):
+        """Add the typedefs and enum values of the preprocessed prefix to
+scanner, as if it had parsed it, and return the symbols, comments and
+pruned counts it would have found.  The state is taken from the cache,
+where it is stored the first time prefix is parsed."""
+        # The prefix usually is the same for all the libraries using
+        # the same system headers, and keys the snapshot by itself
+        key = hashlib.sha1(repr(('snapshot', hashlib.sha1(prefix).hexdigest(),
+                                 self._scanned_filenames,
+                                 self._symbol_prefixes))).hexdigest()
+        with profiler.span('load snapshot'):
+            snapshot = self._cachestore.load_keyed(key)
+        if snapshot is None:
+            prefix_scanner = CSourceScanner()
+            for filename in self._scanned_filenames:
+                prefix_scanner.append_filename(filename)
+            prefix_scanner.set_symbol_prefixes(self._symbol_prefixes)
+            self._parse_stream(prefix_scanner, lambda fp: fp.write(prefix))
+            snapshot = (_export_symbols(prefix_scanner),
+                        prefix_scanner.get_comments(),
+                        prefix_scanner.get_typedefs(),
+                        prefix_scanner.get_constants(),
+                        prefix_scanner.get_pruned_counts())
+            self._cachestore.store_keyed(key, snapshot, [])
+
+        symbols, comments, typedefs, constants, pruned_counts = snapshot
+        scanner.add_typedefs(typedefs)
+        scanner.add_constants(constants)
+        return symbols, comments, pruned_counts
+
+    def _add_pruned_counts(self, pruned_counts):
+        self._pruned_counts = (self._pruned_counts[0] + pruned_counts[0],
+                               self._pruned_counts[1] + pruned_counts[1])
+
+    def _parse_stream(self, scanner, write):
+        """Parse what write(fp) writes to fp with scanner, through a pipe
+rather than a temporary file.  Returns what write returns, or None if
+the scanner stopped reading before the end."""
+        read_fd, write_fd = os.pipe()
+        fp = os.fdopen(write_fd, 'w')
+        result = []
+        error = []
+
+        def writer():
+            try:
+                result.append(write(fp))
+            except:
+                error.extend(sys.exc_info())
+            try:
+                fp.close()
+            except (IOError, OSError):
+                if not error:
+                    error.extend(sys.exc_info())
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            with profiler.span('parse headers'):
+                scanner.parse_file(read_fd)
+        finally:
+            # Closing our end first stops the writer if parsing
+            # stopped early
+            os.close(read_fd)
+            thread.join()
+        # The parser stops at the first syntax error, keeping the
+        # symbols found so far; the rest of the output has nowhere to go
+        if error and not _is_broken_pipe(error[1]):
+            raise error[0], error[1], error[2]
+        if not result:
+            return None
+        return result[0]
+
+    def _lex_sources(self, filenames):
+        """Return the comments of all filenames, in order."""
+        comments = {}
+        keys = {}
+        if self._incremental:
+            for filename in filenames:
+                key = hashlib.sha1(repr(('lex', filename))).hexdigest()
+                keys[filename] = key
+                cached = self._cachestore.load_keyed(key)
+                if cached is not None:
+                    comments[filename] = cached
+
+        unlexed = []
+        for filename in filenames:
+            if filename not in comments and filename not in unlexed:
+                unlexed.append(filename)
+        for filename, lexed in zip(unlexed, self._lex(unlexed)):
+            comments[filename] = lexed
+            if self._incremental:
+                self._cachestore.store_keyed(keys[filename], lexed,
+                                             [filename])
+
+        result = []
+        for filename in filenames:
+            result.extend(comments[filename])
+        return result
+
+    def _lex(self, filenames):
+        # The lexer is not reentrant, so this takes processes
+        if multiprocessing is None:
+            return map(_lex_source, filenames)
+        jobs = self._lex_jobs
+        if jobs is None:
+            try:
+                jobs = multiprocessing.cpu_count()
+            except NotImplementedError:
+                jobs = 1
+        if jobs <= 1 or len(filenames) < 2 or os.name == 'nt':
+            return map(_lex_source, filenames)
+
+        pool = multiprocessing.Pool(min(jobs, len(filenames)))
+        try:
+            return pool.map(_lex_source, filenames)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _parse_incremental(self, cpp_args, source, cpp_key):
+        # The headers are parsed as a whole: they share the typedefs and
+        # usually refuse to be included on their own.  Which symbols the
+        # C scanner keeps depends on the files being scanned and on the
+        # prefixes.
+        key = hashlib.sha1(repr(('parse', cpp_key, self._scanned_filenames,
+                                 self._symbol_prefixes))).hexdigest()
+        result = self._cachestore.load_keyed(key)
+        if result is None:
+            scanner = CSourceScanner()
+            for filename in self._scanned_filenames:
+                scanner.append_filename(filename)
+            scanner.set_symbol_prefixes(self._symbol_prefixes)
+            output, symbols, comments, pruned_counts = self._scan(
+                scanner, cpp_args, source, cpp_key)
+            scanner_pruned_counts = scanner.get_pruned_counts()
+            result = (symbols + _export_symbols(scanner),
+                      comments + scanner.get_comments(),
+                      scanner.get_typedefs(),
+                      (pruned_counts[0] + scanner_pruned_counts[0],
+                       pruned_counts[1] + scanner_pruned_counts[1]))
+            self._cachestore.store_keyed(key, result,
+                                         _get_cpp_dependencies(output))
+
+        symbols, comments, typedefs, pruned_counts = result
+        self._add_pruned_counts(pruned_counts)
+        self._symbols.extend(symbols)
+        self._comments.extend(comments)
+        # The macros are still parsed by our own scanner, which has to
+        # know the typedefs of the headers to do so
+        self._scanner.add_typedefs(typedefs)
+
+    def _preprocess(self, cpp_args, source, fp):
+        """Run cpp on source, copying its output to fp as it arrives if
+fp is not None, and return all of the output."""
+        # cpp must not inherit the pipe to the parser, or the parser
+        # would not see the end of the output when we close it
+        proc = subprocess.Popen(cpp_args,
+                                stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE,
+                                close_fds=os.name != 'nt')
+
+        # cpp starts writing before it read all of the includes, so
+        # feed it from another thread to not block on a full pipe
+        def feed():
+            try:
+                try:
+                    proc.stdin.write(source)
+                except IOError:
+                    # cpp failed, which is reported below
+                    pass
+            finally:
+                proc.stdin.close()
+
+        feeder = threading.Thread(target=feed)
+        feeder.start()
+        chunks = []
+        try:
+            with profiler.span('cpp'):
+                while True:
+                    chunk = os.read(proc.stdout.fileno(), 65536)
+                    if not chunk:
+                        break
+                    if fp is not None:
+                        try:
+                            fp.write(chunk)
+                        except IOError, e:
+                            # The parser stopped early, the output
+                            # is still wanted for the cache
+                            if not _is_broken_pipe(e):
+                                raise
+                            fp = None
+                    chunks.append(chunk)
+        finally:
+            proc.stdout.close()
+            proc.wait()
+            feeder.join()
         if proc.returncode != 0:
             raise SystemExit('Error while processing the source.')
-
-        self._scanner.parse_file(fp.fileno())
-        fp.close()
-        os.unlink(tmp)
+        return ''.join(chunks)
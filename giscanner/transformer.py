@@ -20,11 +20,19 @@
 
 import os
 import sys
+from xml.etree.cElementTree import iterparse
+
+try:
+    import multiprocessing
+except ImportError:
+    # Python 2.5, the includes are parsed one after the other
+    multiprocessing = None
 
 from . import ast
 from . import message
+from . import serializer
 from .cachestore import CacheStore
-from .girparser import GIRParser
+from .girparser import GIRParser, CORE_NS
 from .sourcescanner import (
     SourceSymbol, ctype_name, CTYPE_POINTER,
     CTYPE_BASIC_TYPE, CTYPE_UNION, CTYPE_ARRAY, CTYPE_TYPEDEF,
@@ -45,6 +53,54 @@ if os.name != 'nt':
     _xdg_data_dirs.append('/usr/share')
 
 
+# .gir filename -> ((mtime, size), GIRParser) of the includes parsed by
+# this process, see enable_include_memo()
+_include_memo = None
+
+def enable_include_memo():
+    """Keep the includes parsed by every transformer of this process in
+memory, and use them again as long as their .gir file is unchanged.
+Meant for long-lived processes like the g-ir-scanner server."""
+    global _include_memo
+    if _include_memo is None:
+        _include_memo = {}
+
+def _get_file_stamp(filename):
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return (stat.st_mtime, stat.st_size)
+
+
+# Kinds of prefixes _split_c_string_for_namespace_matches() looks at
+(_PREFIX_IDENTIFIER,
+ _PREFIX_UCASE_SYMBOL,
+ _PREFIX_SYMBOL) = range(3)
+
+def _read_gir_includes(filename):
+    """Return the includes of a .gir file, reading only as far as
+the start of its namespace."""
+    includes = []
+    for event, node in iterparse(filename, events=('start', )):
+        if node.tag == '{%s}include' % (CORE_NS, ):
+            includes.append(ast.Include(node.attrib['name'],
+                                        node.attrib['version']))
+        elif node.tag == '{%s}namespace' % (CORE_NS, ):
+            break
+    return includes
+
+def _parse_gir_worker(args):
+    filename, types_only = args
+    try:
+        parser = GIRParser(types_only=types_only)
+        parser.parse(filename)
+        return serializer.dumps(parser)
+    except (Exception, SystemExit):
+        # Left for the main process, which will report the error
+        return None
+
+
 class Transformer(object):
     namespace = property(lambda self: self._namespace)
 
@@ -56,22 +112,50 @@ class Transformer(object):
         self._typedefs_ns = {}
         self._includes = {} # <string namespace -> Namespace>
         self._include_names = set() # string namespace
+        self._include_filenames = {} # Include -> .gir filename
+        self._include_dependencies = {} # .gir filename -> set of filenames
+        self._prefetched = {} # .gir filename -> (GIRParser, needs_store)
+        self._prefix_tries = None # See _get_prefix_tries()
+        self._gtype_name_index = None # See _get_gtype_name_index()
         self._includepaths = []
         self._passthrough_mode = False
+        self._lazy_includes = False
         self._annotations = {}
 
     def get_includes(self):
         return self._include_names
 
+    def get_include_namespaces(self):
+        return self._includes.values()
+
     def get_pkgconfig_packages(self):
         return self._pkg_config_packages
 
     def disable_cache(self):
         self._cachestore = None
 
+    def set_cache_limits(self, max_size=None, max_entries=None):
+        if self._cachestore is not None:
+            self._cachestore.set_limits(max_size, max_entries)
+
+    def flush_cache(self):
+        """Save the state of the cache, once done registering includes."""
+        if self._cachestore is not None:
+            self._cachestore.flush()
+
+    def set_cache_directory(self, directory):
+        """Cache includes in directory rather than the per-user cache,
+ignoring the system caches; used to precompile one."""
+        self._cachestore = CacheStore(directory, system_directories=())
+
     def set_passthrough_mode(self):
         self._passthrough_mode = True
 
+    def set_lazy_includes(self):
+        """Only parse the nodes of included namespaces which are
+actually looked up, rather than all of them."""
+        self._lazy_includes = True
+
     def set_annotations(self, annotations):
         self._annotations = annotations
 
@@ -124,12 +208,74 @@ class Transformer(object):
     def set_include_paths(self, paths):
         self._includepaths = list(paths)
 
+    def prefetch_includes(self, includes, include_paths_uninstalled=(),
+                          jobs=None):
+        """Parse the .gir files of includes, include_paths_uninstalled
+and everything they include in up to jobs processes, by default one
+per CPU.  Registering them afterwards gives exactly the same result as
+it would without prefetching, just sooner.  Without multiprocessing,
+nothing is prefetched and they are parsed when registered."""
+        if (self._lazy_includes or os.name == 'nt'
+            or multiprocessing is None):
+            return
+        if jobs is None:
+            try:
+                jobs = multiprocessing.cpu_count()
+            except NotImplementedError:
+                jobs = 1
+        if jobs <= 1:
+            return
+
+        # Resolve the whole include graph up front
+        pending = [self._find_include(include) for include in includes
+                   if include not in self._include_names]
+        pending.extend(include_paths_uninstalled)
+        filenames = []
+        while pending:
+            filename = pending.pop(0)
+            if filename in filenames:
+                continue
+            filenames.append(filename)
+            for include in _read_gir_includes(filename):
+                if include not in self._include_names:
+                    pending.append(self._find_include(include))
+
+        unparsed = []
+        for filename in filenames:
+            if self._get_memoized_include(filename) is not None:
+                continue
+            parser = None
+            if self._cachestore is not None:
+                parser = self._cachestore.load(filename)
+            if parser is not None:
+                self._prefetched[filename] = (parser, False)
+            else:
+                unparsed.append(filename)
+        if len(unparsed) < 2:
+            return
+
+        types_only = not self._passthrough_mode
+        pool = multiprocessing.Pool(min(jobs, len(unparsed)))
+        try:
+            results = pool.map(_parse_gir_worker,
+                               [(filename, types_only)
+                                for filename in unparsed])
+        finally:
+            pool.close()
+            pool.join()
+        needs_store = self._cachestore is not None
+        for filename, data in zip(unparsed, results):
+            if data is not None:
+                self._prefetched[filename] = (serializer.loads(data),
+                                              needs_store)
+
     def register_include(self, include):
         if include in self._include_names:
             return
         filename = self._find_include(include)
         self._parse_include(filename)
         self._include_names.add(include)
+        self._include_filenames[include] = filename
 
     def register_include_uninstalled(self, include_path):
         basename = os.path.basename(include_path)
@@ -142,6 +288,7 @@ class Transformer(object):
             return
         self._parse_include(include_path, uninstalled=True)
         self._include_names.add(include)
+        self._include_filenames[include] = include_path
 
     def lookup_giname(self, name):
         """Given a name of the form Foo or Bar.Foo,
@@ -188,30 +335,74 @@ None."""
         if extra_include_dirs is not None:
             self.set_include_paths(extra_include_dirs)
         self.set_passthrough_mode()
-        self._parse_include(filename)
-        parser = self._cachestore.load(filename)
+        parser = self._parse_include(filename)
         self._namespace = parser.get_namespace()
         del self._includes[self._namespace.name]
+        self._prefix_tries = None
+        self._gtype_name_index = None
+        self.flush_cache()
         return self
 
+    def _uses_include_memo(self):
+        # Only complete parsers of the types are kept
+        return (_include_memo is not None and not self._passthrough_mode
+                and not self._lazy_includes)
+
+    def _get_memoized_include(self, filename, stamp=None):
+        if not self._uses_include_memo():
+            return None
+        if stamp is None:
+            stamp = _get_file_stamp(filename)
+        memo = _include_memo.get(filename)
+        if memo is not None and stamp is not None and memo[0] == stamp:
+            return memo[1]
+        return None
+
     def _parse_include(self, filename, uninstalled=False):
         parser = None
-        if self._cachestore is not None:
+        if self._uses_include_memo():
+            # Taken before reading the file, which might change meanwhile
+            stamp = _get_file_stamp(filename)
+            parser = self._get_memoized_include(filename, stamp)
+        needs_store = False
+        if parser is not None:
+            pass
+        elif filename in self._prefetched:
+            parser, needs_store = self._prefetched.pop(filename)
+        elif self._cachestore is not None:
             parser = self._cachestore.load(filename)
         if parser is None:
-            parser = GIRParser(types_only=not self._passthrough_mode)
+            lazy = self._lazy_includes and not self._passthrough_mode
+            parser = GIRParser(types_only=not self._passthrough_mode,
+                               lazy=lazy)
             parser.parse(filename)
-            if self._cachestore is not None:
-                self._cachestore.store(filename, parser)
+            # Storing a lazy parser would mean parsing everything anyway
+            needs_store = self._cachestore is not None and not lazy
 
+        dependencies = set()
         for include in parser.get_includes():
             self.register_include(include)
+            include_filename = self._include_filenames[include]
+            dependencies.add(include_filename)
+            dependencies.update(
+                self._include_dependencies.get(include_filename, ()))
+        self._include_dependencies[filename] = dependencies
+
+        # Stored only now that the includes are resolved, so the cache
+        # entry can record the exact files it was built against.
+        if needs_store:
+            self._cachestore.store(filename, parser, dependencies)
+        if self._uses_include_memo():
+            _include_memo[filename] = (stamp, parser)
 
         if not uninstalled:
             for pkg in parser.get_pkgconfig_packages():
                 self._pkg_config_packages.add(pkg)
         namespace = parser.get_namespace()
         self._includes[namespace.name] = namespace
+        self._prefix_tries = None
+        self._gtype_name_index = None
+        return parser
 
     def _iter_namespaces(self):
         """Return an iterator over all included namespaces; the
@@ -227,28 +418,79 @@ currently-scanned namespace is first."""
             return -1
         return cmp(x[2], y[2])
 
-    def _split_c_string_for_namespace_matches(self, name, is_identifier=False):
-        matches = []  # Namespaces which might contain this name
-        unprefixed_namespaces = [] # Namespaces with no prefix, last resort
-        for ns in self._iter_namespaces():
-            if is_identifier:
-                prefixes = ns.identifier_prefixes
-            elif name[0].isupper():
-                prefixes = ns._ucase_symbol_prefixes
-            else:
-                prefixes = ns.symbol_prefixes
-            if prefixes:
-                for prefix in prefixes:
-                    if (not is_identifier) and (not prefix.endswith('_')):
+    def _get_prefix_tries(self):
+        """Return the namespaces, and for each kind of prefix a trie of
+the prefixes of all namespaces plus the namespaces without any, and a
+memo of results.  Rebuilt whenever the set of namespaces changes."""
+        if self._prefix_tries is not None:
+            return self._prefix_tries
+        namespaces = list(self._iter_namespaces())
+        tries = []
+        for kind in (_PREFIX_IDENTIFIER, _PREFIX_UCASE_SYMBOL, _PREFIX_SYMBOL):
+            # Nodes map from the next character -> node, and None ->
+            # [(namespace index, prefix index)] for prefixes ending there
+            root = {}
+            unprefixed_namespaces = []
+            for ns_index, ns in enumerate(namespaces):
+                if kind == _PREFIX_IDENTIFIER:
+                    prefixes = ns.identifier_prefixes
+                elif kind == _PREFIX_UCASE_SYMBOL:
+                    prefixes = ns._ucase_symbol_prefixes
+                else:
+                    prefixes = ns.symbol_prefixes
+                if not prefixes:
+                    unprefixed_namespaces.append(ns)
+                    continue
+                for prefix_index, prefix in enumerate(prefixes):
+                    if kind != _PREFIX_IDENTIFIER and not prefix.endswith('_'):
                         prefix = prefix + '_'
-                    if name.startswith(prefix):
-                        matches.append((ns, name[len(prefix):], len(prefix)))
-                        break
-            else:
-                unprefixed_namespaces.append(ns)
-        if matches:
+                    node = root
+                    for char in prefix:
+                        node = node.setdefault(char, {})
+                    node.setdefault(None, []).append((ns_index, prefix_index))
+            tries.append((root, unprefixed_namespaces, {}))
+        self._prefix_tries = (namespaces, tries)
+        return self._prefix_tries
+
+    def _split_c_string_for_namespace_matches(self, name, is_identifier=False):
+        if is_identifier:
+            kind = _PREFIX_IDENTIFIER
+        elif name[0].isupper():
+            kind = _PREFIX_UCASE_SYMBOL
+        else:
+            kind = _PREFIX_SYMBOL
+        namespaces, tries = self._get_prefix_tries()
+        root, unprefixed_namespaces, memo = tries[kind]
+        result = memo.get(name)
+        if result is not None:
+            return list(result)
+
+        # Like checking name.startswith() for every prefix; a namespace
+        # matches with the first of its prefixes that does.
+        best = {} # namespace index -> (prefix index, prefix length)
+        node = root
+        length = 0
+        while node is not None:
+            for ns_index, prefix_index in node.get(None, ()):
+                current = best.get(ns_index)
+                if current is None or prefix_index < current[0]:
+                    best[ns_index] = (prefix_index, length)
+            if length == len(name):
+                break
+            node = node.get(name[length])
+            length += 1
+
+        if best:
+            matches = []  # Namespaces which might contain this name
+            for ns_index in sorted(best):
+                prefix_length = best[ns_index][1]
+                matches.append((namespaces[ns_index], name[prefix_length:],
+                                prefix_length))
             matches.sort(self._sort_matches)
-            return map(lambda x: (x[0], x[1]), matches)
+            # Only depends on the prefixes, so it can be remembered
+            result = map(lambda x: (x[0], x[1]), matches)
+            memo[name] = result
+            return list(result)
         elif self._accept_unprefixed:
             return [(self._namespace, name)]
         elif unprefixed_namespaces:
@@ -623,16 +865,16 @@ raise ValueError."""
 
         # Special default: char ** -> ast.Array, same for GStrv
         if (is_return and canonical == 'utf8*') or base == 'GStrv':
-            bare_utf8 = ast.TYPE_STRING.clone()
-            bare_utf8.ctype = None
+            bare_utf8 = ast.TYPE_STRING.replace(ctype=None)
             return ast.Array(None, bare_utf8, ctype=ctype,
                              is_const=is_const)
 
         fundamental = ast.type_names.get(base)
         if fundamental is not None:
-            return ast.Type(target_fundamental=fundamental.target_fundamental,
-                        ctype=ctype,
-                        is_const=is_const)
+            return ast.Type.interned(
+                target_fundamental=fundamental.target_fundamental,
+                ctype=ctype,
+                is_const=is_const)
         container = self._create_bare_container_type(base, ctype=ctype, is_const=is_const)
         if container:
             return container
@@ -800,7 +1042,7 @@ Note that type resolution may not succeed."""
         self.resolve_type(typeval)
         if typeval.resolved:
             # Explicitly clear out the c_type; there isn't one in this case.
-            typeval.ctype = None
+            typeval = typeval.replace(ctype=None)
         return typeval
 
     def _resolve_type_from_ctype_all_namespaces(self, typeval, pointer_stripped):
@@ -833,17 +1075,33 @@ Note that type resolution may not succeed."""
                 return True
         return False
 
+    def _get_gtype_name_index(self):
+        """Return a dict of the GType names of the included namespaces
+to the namespace registering them.  The namespace being scanned changes
+all the time and is looked up directly.  Rebuilt whenever the set of
+namespaces changes."""
+        if self._gtype_name_index is not None:
+            return self._gtype_name_index
+        index = {}
+        for ns in self._includes.itervalues():
+            for gtype_name in ns.get_gtype_names():
+                index.setdefault(gtype_name, ns)
+        self._gtype_name_index = index
+        return index
+
     def _resolve_type_from_gtype_name(self, typeval):
         assert typeval.gtype_name is not None
-        for ns in self._iter_namespaces():
-            for node in ns.itervalues():
-                if not (isinstance(node, (ast.Class, ast.Interface))
-                        or (isinstance(node, ast.Registered) and node.get_type is not None)):
-                    continue
-                if node.gtype_name == typeval.gtype_name:
-                    typeval.target_giname = '%s.%s' % (ns.name, node.name)
-                    return True
-        return False
+        ns = self._namespace
+        node = ns.get_by_gtype_name(typeval.gtype_name)
+        if node is None:
+            ns = self._get_gtype_name_index().get(typeval.gtype_name)
+            if ns is None:
+                return False
+            node = ns.get_by_gtype_name(typeval.gtype_name)
+            if node is None:
+                return False
+        typeval.target_giname = '%s.%s' % (ns.name, node.name)
+        return True
 
     def resolve_type(self, typeval):
         if isinstance(typeval, (ast.Array, ast.List)):
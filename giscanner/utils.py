@@ -30,6 +30,7 @@ Well-known flags:
  * exception: Drop into debugger on fatalexception
  * warning: Drop into debugger on warning
  * posttrans: Drop into debugger just before introspectable pass
+ * profile: Report the time spent in each phase, like --profile
 """
     global _debugflags
     if _debugflags is None:
@@ -136,3 +137,43 @@ def files_are_identical(path1, path2):
     f1.close()
     f2.close()
     return buf1 == buf2
+
+
+# class -> names of the __slots__ of the class and its bases
+_slot_names = {}
+
+def get_slot_names(klass):
+    names = _slot_names.get(klass)
+    if names is None:
+        names = []
+        # Old-style classes have no __mro__, and no slots either
+        for base in getattr(klass, '__mro__', ()):
+            slots = base.__dict__.get('__slots__', ())
+            if isinstance(slots, basestring):
+                slots = (slots, )
+            names.extend([name for name in slots
+                          if name not in ('__dict__', '__weakref__')])
+        names = _slot_names[klass] = tuple(names)
+    return names
+
+
+def get_slot_state(obj):
+    """A __getstate__() for classes with __slots__, which pickle can
+only store with protocol 2 otherwise.  Unset slots are left out."""
+    state = getattr(obj, '__dict__', None)
+    if state is None:
+        state = {}
+    else:
+        state = dict(state)
+    for name in get_slot_names(obj.__class__):
+        try:
+            state[name] = getattr(obj, name)
+        except AttributeError:
+            pass
+    return state
+
+
+def set_slot_state(obj, state):
+    """The __setstate__() matching get_slot_state()."""
+    for name, value in state.iteritems():
+        setattr(obj, name, value)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# Measure the memory taken by the ast nodes of parsed GIR files.  Every
+# node is sized as it is, with the attributes in __slots__, and as the
+# same attributes would take in an instance __dict__ along with the
+# set of file positions every node used to carry.  The default set is
+# the GIR files in gir/ and the expected output of the scanner tests,
+# e.g.:
+#   ./bench-ast-memory.py
+#   ./bench-ast-memory.py /usr/share/gir-1.0/Gtk-3.0.gir
+#
+# Sizes are those of the nodes themselves, the strings and lists they
+# refer to are shared by both representations and not counted.
+#
+# Run it from a built tree; set UNINSTALLED_INTROSPECTION_BUILDDIR when
+# building outside of the source directory.
+
+import glob
+import optparse
+import os
+import sys
+
+srcdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+builddir = os.environ.get('UNINSTALLED_INTROSPECTION_BUILDDIR', srcdir)
+os.environ['UNINSTALLED_INTROSPECTION_SRCDIR'] = srcdir
+os.environ['UNINSTALLED_INTROSPECTION_BUILDDIR'] = builddir
+sys.path.insert(0, srcdir)
+
+from giscanner import ast
+from giscanner.girparser import GIRParser
+from giscanner.message import Position
+
+
+class DictNode(object):
+    pass
+
+
+def get_default_filenames():
+    return sorted(glob.glob(os.path.join(srcdir, 'gir', '*.gir')) +
+                  glob.glob(os.path.join(srcdir, 'tests', 'scanner',
+                                         '*-expected.gir')))
+
+def get_slot_values(obj):
+    values = {}
+    for cls in type(obj).__mro__:
+        for name in cls.__dict__.get('__slots__', ()):
+            if hasattr(obj, name):
+                values[name] = getattr(obj, name)
+    return values
+
+def get_sizes(obj):
+    """Return the size of obj with its slots, and the size it would
+take with the same attributes in a __dict__."""
+    slotted = sys.getsizeof(obj)
+    values = get_slot_values(obj)
+    if '_file_positions' in values:
+        slotted += sys.getsizeof(values['_file_positions'])
+    if isinstance(obj, ast.Node):
+        values['file_positions'] = values.pop('_file_positions', set())
+    twin = DictNode()
+    twin.__dict__.update(values)
+    unslotted = sys.getsizeof(twin) + sys.getsizeof(twin.__dict__)
+    if 'file_positions' in values:
+        unslotted += sys.getsizeof(values['file_positions'])
+    return slotted, unslotted
+
+def collect(obj, seen, sizes):
+    """Add the sizes of the ast nodes and positions reachable from obj
+to sizes, a dict of class name -> [count, slotted, unslotted]."""
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, (list, tuple, set)):
+            stack.extend(obj)
+        elif isinstance(obj, (ast.Annotated, ast.Type, Position)):
+            slotted, unslotted = get_sizes(obj)
+            entry = sizes.setdefault(type(obj).__name__, [0, 0, 0])
+            entry[0] += 1
+            entry[1] += slotted
+            entry[2] += unslotted
+            stack.extend(get_slot_values(obj).values())
+
+def print_sizes(name, count, slotted, unslotted):
+    print '%-20s %8d %12.1f %12.1f %7.1f%%' % (
+        name, count, unslotted / float(count), slotted / float(count),
+        (unslotted - slotted) * 100.0 / unslotted)
+
+def main(args):
+    parser = optparse.OptionParser('%prog [GIR...]')
+    options, filenames = parser.parse_args(args[1:])
+    if not hasattr(sys, 'getsizeof'):
+        print 'sys.getsizeof() requires Python 2.6'
+        return 1
+    if not filenames:
+        filenames = get_default_filenames()
+
+    # Singletons like ast.TYPE_ANY are not counted
+    seen = set([id(value) for value in vars(ast).itervalues()])
+    sizes = {}
+    # Kept alive, the ids in seen must not be reused
+    namespaces = []
+    for filename in filenames:
+        gir_parser = GIRParser()
+        gir_parser.parse(filename)
+        namespaces.append(gir_parser.get_namespace())
+        collect(list(namespaces[-1].itervalues()), seen, sizes)
+
+    print '%d files' % (len(filenames), )
+    print '%-20s %8s %12s %12s %8s' % ('class', 'count', 'dict (B)',
+                                       'slots (B)', 'saved')
+    totals = [0, 0, 0]
+    for name in sorted(sizes):
+        print_sizes(name, *sizes[name])
+        for i, value in enumerate(sizes[name]):
+            totals[i] += value
+    if totals[0]:
+        print_sizes('all', *totals)
+        print 'total: %d bytes with __dict__, %d with __slots__' % (
+            totals[2], totals[1])
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# Compare the formats the scanner cache can store parsed .gir files in.
+# For every file, the parsed namespace is written with giscanner.serializer
+# and with cPickle (protocol 0, as the cache used to, and protocol 2), and
+# each is then loaded in a fresh process to measure load time and peak RSS.
+# e.g.:
+#   ./bench-cache.py
+#   ./bench-cache.py --types-only /usr/share/gir-1.0/Gio-2.0.gir
+#
+# Run it from an uninstalled tree; set UNINSTALLED_INTROSPECTION_BUILDDIR
+# when building outside of the source directory.
+
+import cPickle
+import glob
+import optparse
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+srcdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, srcdir)
+builddir = os.environ.get('UNINSTALLED_INTROSPECTION_BUILDDIR')
+if builddir is not None:
+    sys.path.insert(0, builddir)
+
+from giscanner import serializer
+from giscanner.girparser import GIRParser
+
+FORMATS = ['serializer', 'pickle0', 'pickle2']
+
+def dump(format, data, fp):
+    if format == 'serializer':
+        serializer.dump(data, fp)
+    elif format == 'pickle0':
+        cPickle.dump(data, fp, 0)
+    else:
+        cPickle.dump(data, fp, 2)
+
+def load(format, fp):
+    if format == 'serializer':
+        return serializer.load(fp)
+    return cPickle.load(fp)
+
+def run_child(format, filename, repeat):
+    """Load filename repeat times, print the best time in seconds and
+the growth of the peak RSS in kilobytes caused by the first load."""
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    best = None
+    for i in range(repeat):
+        fp = open(filename, 'rb')
+        start = time.time()
+        data = load(format, fp)
+        elapsed = time.time() - start
+        fp.close()
+        if i == 0:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        del data
+        if best is None or elapsed < best:
+            best = elapsed
+    print best, peak - before
+
+def run_dump(format, filename, store_filename, types_only):
+    gir = GIRParser(types_only=types_only)
+    gir.parse(filename)
+    fp = open(store_filename, 'wb')
+    dump(format, gir, fp)
+    fp.close()
+
+# The peak RSS of a process is inherited across fork and exec, so the
+# parsing is done in a child too, keeping this process small.
+def spawn(args):
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__)] + args,
+                            stdout=subprocess.PIPE).communicate()[0]
+
+def measure(format, filename, repeat):
+    output = spawn(['--child', format, '--repeat', str(repeat), filename])
+    elapsed, rss = output.split()
+    return float(elapsed), int(rss)
+
+def main(args):
+    parser = optparse.OptionParser('%prog [options] [GIR...]')
+    parser.add_option('', '--types-only', action='store_true', default=False,
+                      help='parse only the types, like included namespaces')
+    parser.add_option('', '--repeat', type='int', default=5,
+                      help='number of loads to take the best time of')
+    parser.add_option('', '--child', help=optparse.SUPPRESS_HELP)
+    parser.add_option('', '--dump', help=optparse.SUPPRESS_HELP)
+    options, filenames = parser.parse_args(args[1:])
+
+    if options.child:
+        run_child(options.child, filenames[0], options.repeat)
+        return 0
+    if options.dump:
+        run_dump(options.dump, filenames[0], filenames[1], options.types_only)
+        return 0
+
+    if not filenames:
+        filenames = sorted(glob.glob(os.path.join(srcdir, 'gir', '*.gir')))
+
+    tmpdir = tempfile.mkdtemp(prefix='bench-cache-')
+    totals = dict((format, [0, 0.0, 0]) for format in FORMATS)
+    print '%-24s %-10s %10s %10s %10s' % ('file', 'format', 'size',
+                                          'load (ms)', 'RSS (kB)')
+    try:
+        for filename in filenames:
+            for format in FORMATS:
+                store_filename = os.path.join(tmpdir, format)
+                dump_args = ['--dump', format, filename, store_filename]
+                if options.types_only:
+                    dump_args.append('--types-only')
+                spawn(dump_args)
+                size = os.stat(store_filename).st_size
+                elapsed, rss = measure(format, store_filename, options.repeat)
+                total = totals[format]
+                total[0] += size
+                total[1] += elapsed
+                total[2] += rss
+                print '%-24s %-10s %10d %10.2f %10d' % (
+                    os.path.basename(filename)[:24], format, size,
+                    elapsed * 1000, rss)
+    finally:
+        shutil.rmtree(tmpdir)
+
+    print
+    for format in FORMATS:
+        size, elapsed, rss = totals[format]
+        print '%-24s %-10s %10d %10.2f %10d' % ('total', format, size,
+                                                elapsed * 1000, rss)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
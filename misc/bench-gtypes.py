@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# Time the resolution of the types named by GType name, which the
+# GDumpParser creates for every parent, interface, property and signal
+# parameter it introspects.  A synthetic library the size of Gtk is
+# scanned against includes the size of GObject, Gio and Gdk, and each
+# lookup is resolved once by looking at every node of every namespace,
+# as the transformer used to, and once with its index, e.g.:
+#   ./bench-gtypes.py
+#   ./bench-gtypes.py --types=2000 --lookups=100000
+
+import __builtin__
+import optparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+srcdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+builddir = os.environ.get('UNINSTALLED_INTROSPECTION_BUILDDIR', srcdir)
+os.environ['UNINSTALLED_INTROSPECTION_SRCDIR'] = srcdir
+os.environ['UNINSTALLED_INTROSPECTION_BUILDDIR'] = builddir
+sys.path.insert(0, srcdir)
+__builtin__.__dict__['DATADIR'] = os.path.join(sys.prefix, 'share')
+
+from giscanner import ast
+from giscanner.transformer import Transformer
+
+# Name, identifier prefix, symbol prefix and share of the registered
+# types of Gtk 3 and its includes
+NAMESPACES = [('GObject', 'G', 'g', 0.06),
+              ('Gio', 'G', 'g', 0.25),
+              ('Gdk', 'Gdk', 'gdk', 0.08)]
+SCANNED = ('Gtk', 'Gtk', 'gtk', 0.61)
+
+GIR_HEADER = '''<?xml version="1.0"?>
+<repository version="1.2"
+            xmlns="http://www.gtk.org/introspection/core/1.0"
+            xmlns:c="http://www.gtk.org/introspection/c/1.0"
+            xmlns:glib="http://www.gtk.org/introspection/glib/1.0">
+  <namespace name="%s" version="1.0" shared-library=""
+             c:identifier-prefixes="%s" c:symbol-prefixes="%s">
+'''
+GIR_CLASS = ('    <class name="Type%d" c:type="%sType%d" '
+             'glib:type-name="%sType%d" glib:get-type="%s_type%d_get_type"/>\n')
+GIR_FOOTER = '''  </namespace>
+</repository>
+'''
+
+
+def write_gir(directory, name, identifier_prefix, symbol_prefix, count):
+    f = open(os.path.join(directory, '%s-1.0.gir' % (name, )), 'w')
+    f.write(GIR_HEADER % (name, identifier_prefix, symbol_prefix))
+    for i in range(count):
+        f.write(GIR_CLASS % (i, identifier_prefix, i, name, i,
+                             symbol_prefix, i))
+    f.write(GIR_FOOTER)
+    f.close()
+    return ['%sType%d' % (name, i) for i in range(count)]
+
+def create_transformer(directory, total):
+    gtype_names = []
+    for name, identifier_prefix, symbol_prefix, share in NAMESPACES:
+        gtype_names.extend(write_gir(directory, name, identifier_prefix,
+                                     symbol_prefix, int(total * share)))
+
+    name, identifier_prefix, symbol_prefix, share = SCANNED
+    namespace = ast.Namespace(name, '1.0', [identifier_prefix],
+                              [symbol_prefix])
+    transformer = Transformer(namespace)
+    transformer.disable_cache()
+    transformer.set_include_paths([directory])
+    for name, identifier_prefix, symbol_prefix, share in NAMESPACES:
+        transformer.register_include(ast.Include(name, '1.0'))
+    for i in range(int(total * SCANNED[3])):
+        gtype_name = '%sType%d' % (name, i)
+        namespace.append(ast.Class('Type%d' % (i, ), None,
+                                   gtype_name=gtype_name,
+                                   get_type='%s_type%d_get_type'
+                                   % (symbol_prefix, i)))
+        gtype_names.append(gtype_name)
+    return transformer, gtype_names
+
+def resolve_linear(namespaces, typeval):
+    for ns in namespaces:
+        for node in ns.itervalues():
+            if not (isinstance(node, (ast.Class, ast.Interface))
+                    or (isinstance(node, ast.Registered)
+                        and node.get_type is not None)):
+                continue
+            if node.gtype_name == typeval.gtype_name:
+                typeval.target_giname = '%s.%s' % (ns.name, node.name)
+                return True
+    return False
+
+def run(resolve, lookups, repeat):
+    """Return the best time to resolve all lookups and what each of
+them resolved to."""
+    best = None
+    for i in range(repeat):
+        types = [ast.Type(gtype_name=gtype_name) for gtype_name in lookups]
+        start = time.time()
+        for typeval in types:
+            resolve(typeval)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, [typeval.target_giname for typeval in types]
+
+def main(args):
+    parser = optparse.OptionParser('%prog [options]')
+    parser.add_option('', '--types', type='int', default=1200,
+                      help='number of registered types in all namespaces')
+    parser.add_option('', '--lookups', type='int', default=25000,
+                      help='number of types to resolve by GType name')
+    parser.add_option('', '--repeat', type='int', default=3,
+                      help='number of runs to take the best time of')
+    options, args = parser.parse_args(args[1:])
+
+    directory = tempfile.mkdtemp(prefix='bench-gtypes')
+    try:
+        transformer, gtype_names = create_transformer(directory,
+                                                      options.types)
+        # A few lookups are for types nobody registers
+        rand = random.Random(0)
+        lookups = []
+        for i in range(options.lookups):
+            if i % 20 == 0:
+                lookups.append('Unknown%d' % (i, ))
+            else:
+                lookups.append(rand.choice(gtype_names))
+
+        namespaces = ([transformer.namespace] +
+                      transformer.get_include_namespaces())
+        results = [
+            ('linear', run(lambda t: resolve_linear(namespaces, t),
+                           lookups, options.repeat)),
+            ('indexed', run(transformer.resolve_type,
+                            lookups, options.repeat))]
+    finally:
+        shutil.rmtree(directory)
+
+    print '%d types, %d lookups' % (len(gtype_names), len(lookups))
+    print '%-10s %10s %10s' % ('resolution', 'time (ms)', 'resolved')
+    for name, (elapsed, targets) in results:
+        resolved = len([target for target in targets if target is not None])
+        print '%-10s %10.2f %10d' % (name, elapsed * 1000, resolved)
+    if results[0][1][1] != results[1][1][1]:
+        print 'the resolutions differ'
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# Time the macro scan of the source scanner over a set of headers, once
+# keeping every constant and once only those with the symbol prefixes
+# of the namespace, as g-ir-scanner does.  The default sets are the test
+# headers in tests/scanner and the GLib headers, e.g.:
+#   ./bench-macros.py
+#   ./bench-macros.py --prefix=gtk /usr/include/gtk-3.0/gtk/*.h
+#
+# Run it from a built tree; set UNINSTALLED_INTROSPECTION_BUILDDIR when
+# building outside of the source directory.
+
+import __builtin__
+import glob
+import optparse
+import os
+import subprocess
+import sys
+import time
+
+srcdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+builddir = os.environ.get('UNINSTALLED_INTROSPECTION_BUILDDIR', srcdir)
+os.environ['UNINSTALLED_INTROSPECTION_SRCDIR'] = srcdir
+os.environ['UNINSTALLED_INTROSPECTION_BUILDDIR'] = builddir
+sys.path.insert(0, srcdir)
+__builtin__.__dict__['DATADIR'] = os.path.join(sys.prefix, 'share')
+
+from giscanner.sourcescanner import SourceScanner
+
+
+def get_default_sets():
+    testsdir = os.path.join(srcdir, 'tests', 'scanner')
+    sets = [('tests/scanner', ['regress'],
+             sorted(glob.glob(os.path.join(testsdir, '*.h'))))]
+    includedir = subprocess.Popen(
+        ['pkg-config', '--variable=includedir', 'glib-2.0'],
+        stdout=subprocess.PIPE).communicate()[0].strip()
+    headers = sorted(glob.glob(os.path.join(includedir, 'glib-2.0',
+                                            'glib', '*.h')))
+    if headers:
+        sets.append(('glib', ['g', 'glib'], headers))
+    return sets
+
+def scan_macros(filenames, prefixes, repeat):
+    """Return the best time to scan the macros of filenames and the
+number of constants found."""
+    best = None
+    for i in range(repeat):
+        ss = SourceScanner()
+        if prefixes is not None:
+            ss.set_macro_prefixes(prefixes)
+        start = time.time()
+        ss.parse_macros(filenames)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, len(list(ss.get_symbols()))
+
+def main(args):
+    parser = optparse.OptionParser('%prog [options] [HEADER...]')
+    parser.add_option('', '--prefix', action='append', dest='prefixes',
+                      default=[],
+                      help='symbol prefix of the namespace (repeatable)')
+    parser.add_option('', '--repeat', type='int', default=5,
+                      help='number of scans to take the best time of')
+    options, filenames = parser.parse_args(args[1:])
+
+    if filenames:
+        sets = [('arguments', options.prefixes or ['g'], filenames)]
+    else:
+        sets = get_default_sets()
+
+    print '%-16s %-10s %8s %10s %10s' % ('headers', 'macros', 'files',
+                                         'time (ms)', 'constants')
+    for name, prefixes, filenames in sets:
+        for label, scan_prefixes in [('all', None), ('prefixed', prefixes)]:
+            elapsed, count = scan_macros(filenames, scan_prefixes,
+                                         options.repeat)
+            print '%-16s %-10s %8d %10.2f %10d' % (name, label,
+                                                   len(filenames),
+                                                   elapsed * 1000, count)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# Time the removals and replacements GDumpParser makes in the namespace
+# of a large library: every registered type has its get_type function
+# removed, and is then replaced by the node built from the introspection
+# data.  The namespace is run once with the odict that removed keys by
+# searching the list of keys, as it used to, and once with the current
+# one, e.g.:
+#   ./bench-namespace.py
+#   ./bench-namespace.py --types=50000
+
+import optparse
+import os
+import sys
+import time
+
+srcdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+builddir = os.environ.get('UNINSTALLED_INTROSPECTION_BUILDDIR', srcdir)
+os.environ['UNINSTALLED_INTROSPECTION_SRCDIR'] = srcdir
+os.environ['UNINSTALLED_INTROSPECTION_BUILDDIR'] = builddir
+sys.path.insert(0, srcdir)
+
+from giscanner import ast
+from giscanner.odict import odict
+
+
+class LinearOdict(odict):
+    """The odict as it was, with removals linear in the number of keys."""
+
+    def __setitem__(self, key, value):
+        if key not in self._items:
+            self._keys.append(key)
+        self._items[key] = value
+
+    def __delitem__(self, key):
+        del self._items[key]
+        self._keys.remove(key)
+
+    def keys(self):
+        return self._keys[:]
+
+
+def create_namespace(names_class, count):
+    """Return a namespace with count records and their get_type
+functions, and the classes replacing the records."""
+    namespace = ast.Namespace('Foo', '1.0')
+    namespace._names = names_class()
+    for i in range(count):
+        get_type = 'foo_type%d_get_type' % (i, )
+        namespace.append(ast.Record('Type%d' % (i, ), 'FooType%d' % (i, ),
+                                    gtype_name='FooType%d' % (i, ),
+                                    get_type=get_type))
+        namespace.append(ast.Function('type%d_get_type' % (i, ),
+                                      ast.Return(ast.TYPE_GTYPE), [], False,
+                                      get_type))
+    classes = [ast.Class('Type%d' % (i, ), None,
+                         ctype='FooType%d' % (i, ),
+                         gtype_name='FooType%d' % (i, ),
+                         get_type='foo_type%d_get_type' % (i, ))
+               for i in range(count)]
+    return namespace, classes
+
+def scan(namespace, classes):
+    for i in range(len(classes)):
+        namespace.remove(namespace.get('type%d_get_type' % (i, )))
+    for node in classes:
+        namespace.append(node, replace=True)
+
+def run(names_class, count, repeat):
+    """Return the best time to scan and the names left in order."""
+    best = None
+    for i in range(repeat):
+        namespace, classes = create_namespace(names_class, count)
+        start = time.time()
+        scan(namespace, classes)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, list(namespace)
+
+def main(args):
+    parser = optparse.OptionParser('%prog [options]')
+    parser.add_option('', '--types', type='int', default=20000,
+                      help='number of registered types in the namespace')
+    parser.add_option('', '--repeat', type='int', default=3,
+                      help='number of runs to take the best time of')
+    options, args = parser.parse_args(args[1:])
+
+    results = [('linear', run(LinearOdict, options.types, options.repeat)),
+               ('odict', run(odict, options.types, options.repeat))]
+
+    print '%d types, %d nodes' % (options.types, options.types * 2)
+    print '%-10s %10s' % ('removal', 'time (ms)')
+    for name, (elapsed, names) in results:
+        print '%-10s %10.2f' % (name, elapsed * 1000)
+    if results[0][1][1] != results[1][1][1]:
+        print 'the namespaces differ'
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
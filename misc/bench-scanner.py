@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# Measure the phases of g-ir-scanner one by one over the corpora in the
+# tree: the GLib, GObject and Gio headers scanned with gir/*-2.0.c, and
+# the test libraries in tests/scanner.  The introspection binary is
+# replaced by a stub which dumps no types, so nothing needs to be built
+# or loaded and no network access is needed.
+#
+# For every phase the best wall time, the number of objects it left
+# allocated and the peak RSS of the process after it are reported, e.g.:
+#   ./bench-scanner.py
+#   ./bench-scanner.py --save-baseline=bench.json GLib Regress
+#   ./bench-scanner.py --baseline=bench.json --threshold=5
+#
+# With --baseline the exit status is 1 when a phase got slower or bigger
+# than the threshold allows.  Run it from a built tree; set
+# UNINSTALLED_INTROSPECTION_BUILDDIR when building outside of the source
+# directory, the included .gir files are looked up there.
+
+import __builtin__
+import gc
+import glob
+import json
+import optparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+srcdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+builddir = os.environ.get('UNINSTALLED_INTROSPECTION_BUILDDIR', srcdir)
+os.environ['UNINSTALLED_INTROSPECTION_SRCDIR'] = srcdir
+os.environ['UNINSTALLED_INTROSPECTION_BUILDDIR'] = builddir
+sys.path.insert(0, srcdir)
+__builtin__.__dict__['DATADIR'] = os.path.join(sys.prefix, 'share')
+
+STUB_DUMP = '<?xml version="1.0"?>\n<dump>\n</dump>\n'
+
+
+def pkgconfig_variable(package, variable):
+    return subprocess.Popen(['pkg-config', '--variable=' + variable, package],
+                            stdout=subprocess.PIPE).communicate()[0].strip()
+
+def glib_args():
+    includedir = os.path.join(pkgconfig_variable('glib-2.0', 'includedir'),
+                              'glib-2.0')
+    configdir = os.path.join(pkgconfig_variable('glib-2.0', 'libdir'),
+                             'glib-2.0', 'include')
+    return (['--namespace=GLib', '--nsversion=2.0', '--pkg=glib-2.0',
+             '--identifier-prefix=G', '--symbol-prefix=g',
+             '--symbol-prefix=glib', '--c-include=glib.h',
+             '-I' + includedir, '-I' + configdir,
+             '-DGETTEXT_PACKAGE=Dummy', '-DGLIB_COMPILATION',
+             '-D__G_I18N_LIB_H__',
+             os.path.join(configdir, 'glibconfig.h')] +
+            sorted(glob.glob(os.path.join(includedir, 'glib', '*.h'))) +
+            [os.path.join(includedir, 'gobject', 'glib-types.h'),
+             os.path.join(srcdir, 'gir', 'glib-2.0.c')])
+
+def gobject_args():
+    includedir = os.path.join(pkgconfig_variable('gobject-2.0', 'includedir'),
+                              'glib-2.0')
+    configdir = os.path.join(pkgconfig_variable('gobject-2.0', 'libdir'),
+                             'glib-2.0', 'include')
+    headers = [filename for filename in
+               sorted(glob.glob(os.path.join(includedir, 'gobject', '*.h')))
+               if not filename.endswith('/glib-types.h')]
+    return (['--namespace=GObject', '--nsversion=2.0', '--pkg=gobject-2.0',
+             '--include=GLib-2.0', '--identifier-prefix=G',
+             '--c-include=glib-object.h', '-DGOBJECT_COMPILATION',
+             '-I' + includedir, '-I' + configdir] +
+            headers + [os.path.join(srcdir, 'gir', 'gobject-2.0.c')])
+
+def gio_args():
+    includedir = os.path.join(pkgconfig_variable('gio-2.0', 'includedir'),
+                              'glib-2.0')
+    configdir = os.path.join(pkgconfig_variable('gio-2.0', 'libdir'),
+                             'glib-2.0', 'include')
+    headers = [filename for filename in
+               sorted(glob.glob(os.path.join(includedir, 'gio', '*.h')))
+               if not filename.endswith('/gsettingsbackend.h')]
+    return (['--namespace=Gio', '--nsversion=2.0', '--pkg=gio-2.0',
+             '--include=GObject-2.0', '--identifier-prefix=G',
+             '--c-include=gio/gio.h', '-DGIO_COMPILATION',
+             '-I' + configdir] +
+            headers + [os.path.join(srcdir, 'gir', 'gio-2.0.c')])
+
+def test_args(namespace, filenames, includes, packages=['gobject-2.0']):
+    testsdir = os.path.join(srcdir, 'tests', 'scanner')
+    return (['--namespace=' + namespace, '--nsversion=1.0',
+             '-I' + srcdir, '-I' + testsdir,
+             '-I' + os.path.join(srcdir, 'girepository'),
+             '--add-include-path=' + testsdir] +
+            ['--include=' + include for include in includes] +
+            ['--pkg=' + package for package in packages] +
+            [os.path.join(testsdir, filename) for filename in filenames])
+
+CORPORA = [
+    ('GLib', glib_args),
+    ('GObject', gobject_args),
+    ('Gio', gio_args),
+    ('Annotation', lambda: test_args('Annotation',
+                                     ['annotation.c', 'annotation.h'],
+                                     ['GObject-2.0', 'Utility-1.0'])),
+    ('Foo', lambda: test_args('Foo', ['foo.h', 'foo.c'],
+                              ['GObject-2.0', 'Gio-2.0', 'Utility-1.0'])),
+    ('Regress', lambda: test_args('Regress', ['regress.c', 'regress.h'],
+                                  ['cairo-1.0', 'Gio-2.0'], packages=[])),
+    ('Utility', lambda: test_args('Utility', ['utility.c', 'utility.h'],
+                                  ['GObject-2.0'])),
+    ]
+
+def get_scanner_args(corpus):
+    """Return the g-ir-scanner arguments to scan corpus with."""
+    args = ['--add-include-path=' + builddir,
+            '--add-include-path=' + os.path.join(builddir, 'gir'),
+            '--add-include-path=' + os.path.join(srcdir, 'gir'),
+            '--program=' + sys.executable,
+            '--program-arg=' + os.path.abspath(__file__),
+            '--program-arg=--stub-dump',
+            '--output=' + os.devnull]
+    return args + dict(CORPORA)[corpus]()
+
+def run_stub_dump(args):
+    """Act as the introspection binary, dumping no types at all."""
+    for arg in args:
+        if arg.startswith('--introspect-dump='):
+            out_path = arg[len('--introspect-dump='):].split(',')[1]
+            fp = open(out_path, 'w')
+            fp.write(STUB_DUMP)
+            fp.close()
+
+def get_maxrss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def run_phases(args):
+    """Scan once with args, returning a list of (phase, seconds, objects,
+peak RSS in kilobytes) for every phase."""
+    from giscanner import message
+    from giscanner import scannermain
+    from giscanner.annotationparser import AnnotationParser
+    from giscanner.girwriter import GIRWriter
+    from giscanner.introspectablepass import IntrospectablePass
+    from giscanner.maintransformer import MainTransformer
+
+    parser = scannermain._get_option_parser()
+    options, filenames = parser.parse_args(['g-ir-scanner'] + args)
+    namespace = scannermain.create_namespace(options)
+    message.MessageLogger.get(namespace=namespace)
+
+    results = []
+
+    # Objects are counted by the garbage collector, so this misses
+    # strings and numbers but not the ast nodes holding them
+    def phase(name, function, *args):
+        gc.collect()
+        objects = len(gc.get_objects())
+        start = time.time()
+        result = function(*args)
+        elapsed = time.time() - start
+        gc.collect()
+        results.append((name, elapsed, len(gc.get_objects()) - objects,
+                        get_maxrss()))
+        return result
+
+    transformer = phase('create_transformer',
+                        scannermain.create_transformer, namespace, options)
+    packages = set(options.packages)
+    packages.update(transformer.get_pkgconfig_packages())
+    exit_code = scannermain.process_packages(options, packages)
+    if exit_code:
+        raise SystemExit(exit_code)
+    ss = phase('create_source_scanner',
+               scannermain.create_source_scanner, options, filenames,
+               namespace)
+    blocks = phase('AnnotationParser.parse',
+                   AnnotationParser().parse, ss.get_comments())
+    transformer.set_annotations(blocks)
+    phase('Transformer.parse', transformer.parse, ss.get_symbols())
+    shlibs = phase('GDumpParser',
+                   scannermain.create_binary, transformer, options, filenames)
+    phase('MainTransformer.transform',
+          MainTransformer(transformer, blocks).transform)
+    phase('IntrospectablePass.validate',
+          IntrospectablePass(transformer, blocks).validate)
+    # The writer does all of its work when it is created
+    phase('GIRWriter', lambda: GIRWriter(transformer.namespace, shlibs,
+                                         transformer.get_includes(),
+                                         options.packages,
+                                         options.c_includes).get_xml())
+    return results
+
+# Every run happens in a fresh process, as the peak RSS is inherited
+# across fork and exec and earlier runs would warm up caches.
+def measure(corpus, use_cache):
+    env = dict(os.environ)
+    if not use_cache:
+        env['GI_SCANNER_DISABLE_CACHE'] = '1'
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__),
+                             '--child', corpus],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            env=env)
+    output, errors = proc.communicate()
+    if proc.returncode != 0:
+        sys.stderr.write(errors)
+        raise SystemExit('Scanning %s failed' % (corpus, ))
+    return json.loads(output)
+
+def compare(results, baseline, threshold):
+    """Return the (corpus, phase, what, old, new) which got worse than
+threshold percent compared to baseline."""
+    regressions = []
+    factor = 1 + threshold / 100.0
+    for corpus, phases in sorted(results.iteritems()):
+        for phase, (elapsed, objects, rss) in phases.iteritems():
+            try:
+                old_elapsed, old_objects, old_rss = baseline[corpus][phase]
+            except KeyError:
+                continue
+            for what, old, new in [('time', old_elapsed, elapsed),
+                                   ('objects', old_objects, objects),
+                                   ('RSS', old_rss, rss)]:
+                if old > 0 and new > old * factor:
+                    regressions.append((corpus, phase, what, old, new))
+    return regressions
+
+def main(args):
+    parser = optparse.OptionParser('%prog [options] [CORPUS...]')
+    parser.add_option('', '--repeat', type='int', default=3,
+                      help='number of runs to take the best time of')
+    parser.add_option('', '--cache', action='store_true', default=False,
+                      help='let the scanner use its cache')
+    parser.add_option('', '--baseline',
+                      help='compare the results with this baseline file')
+    parser.add_option('', '--save-baseline',
+                      help='write the results to this baseline file')
+    parser.add_option('', '--threshold', type='float', default=10.0,
+                      help='percentage a phase may get worse by')
+    parser.add_option('', '--child', help=optparse.SUPPRESS_HELP)
+    # The stub binary gets the options of a real one
+    if args[1:2] == ['--stub-dump']:
+        run_stub_dump(args[2:])
+        return 0
+    options, corpora = parser.parse_args(args[1:])
+
+    if options.child:
+        print json.dumps(run_phases(get_scanner_args(options.child)))
+        return 0
+
+    known = [name for name, args in CORPORA]
+    for corpus in corpora:
+        if corpus not in known:
+            parser.error('unknown corpus %s, pick from: %s' % (
+                corpus, ', '.join(known)))
+    if not corpora:
+        corpora = known
+
+    results = {}
+    print '%-12s %-28s %10s %10s %10s' % ('corpus', 'phase', 'time (ms)',
+                                          'objects', 'RSS (kB)')
+    for corpus in corpora:
+        runs = [measure(corpus, options.cache)
+                for i in range(options.repeat)]
+        phases = results[corpus] = {}
+        for i, (name, elapsed, objects, rss) in enumerate(runs[0]):
+            elapsed = min(run[i][1] for run in runs)
+            phases[name] = (elapsed, objects, rss)
+            print '%-12s %-28s %10.2f %10d %10d' % (corpus, name,
+                                                    elapsed * 1000,
+                                                    objects, rss)
+
+    if options.save_baseline:
+        fp = open(options.save_baseline, 'w')
+        json.dump(results, fp, indent=1, sort_keys=True)
+        fp.close()
+
+    if options.baseline:
+        fp = open(options.baseline)
+        baseline = json.load(fp)
+        fp.close()
+        regressions = compare(results, baseline, options.threshold)
+        print
+        for corpus, phase, what, old, new in regressions:
+            print 'REGRESSION %-12s %-28s %-8s %g -> %g' % (corpus, phase,
+                                                            what, old, new)
+        if regressions:
+            return 1
+        print 'No regressions compared to %s' % (options.baseline, )
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
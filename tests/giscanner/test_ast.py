@@ -0,0 +1,106 @@
+import glob
+import os
+import sys
+import unittest
+import __builtin__
+
+path = os.getenv('UNINSTALLED_INTROSPECTION_SRCDIR', None)
+assert path is not None
+sys.path.insert(0, path)
+
+# Not correct, but enough to get the tests going uninstalled
+__builtin__.__dict__['DATADIR'] = path
+
+from giscanner import ast
+from giscanner import serializer
+from giscanner.girparser import GIRParser
+
+KINDS = [ast.Function, ast.Class, ast.Record, ast.Registered,
+         (ast.Class, ast.Interface),
+         (ast.Function, ast.Class, ast.Interface),
+         (ast.Class, ast.Record, ast.Interface, ast.Alias)]
+
+
+def create_function(name):
+    return ast.Function(name, ast.Return(ast.TYPE_NONE), [], False,
+                        'test_' + name)
+
+
+def create_class(name):
+    return ast.Class(name, None, ctype='Test' + name,
+                     gtype_name='Test' + name,
+                     get_type='test_%s_get_type' % (name.lower(), ))
+
+
+class TestNodesOfKind(unittest.TestCase):
+
+    def assertKinds(self, namespace):
+        for kind in KINDS:
+            expected = [node for node in namespace.itervalues()
+                        if isinstance(node, kind)]
+            self.assertEqual(namespace.get_nodes_of_kind(kind), expected)
+
+    def test_changes(self):
+        namespace = ast.Namespace('Test', '1.0', ['Test'], ['test'])
+        namespace.append(create_function('first'))
+        namespace.append(create_class('Widget'))
+        # Index some kinds before changing the namespace
+        self.assertKinds(namespace)
+        namespace.append(ast.Record('Box', 'TestBox'))
+        namespace.append(create_class('Window'))
+        namespace.append(create_function('second'))
+        self.assertKinds(namespace)
+        namespace.remove(namespace.get('Widget'))
+        self.assertKinds(namespace)
+        namespace.append(create_class('Widget'))
+        self.assertKinds(namespace)
+        # Replacing with another kind of node
+        namespace.append(ast.Record('first', 'TestFirst'), replace=True)
+        self.assertKinds(namespace)
+        namespace.append(create_function('Box'), replace=True)
+        self.assertKinds(namespace)
+        namespace.float(namespace.get('second'))
+        self.assertKinds(namespace)
+        self.assertEqual(namespace.get_nodes_of_kind(ast.Function),
+                         [namespace.get('Box')])
+        self.assertEqual(namespace.get_nodes_of_kind(ast.Interface), [])
+
+    def test_lazy(self):
+        for filename in glob.glob(os.path.join(path, 'tests', 'scanner',
+                                               '*-expected.gir')):
+            parser = GIRParser()
+            parser.parse(filename)
+            expected = parser.get_namespace()
+            parser = GIRParser(lazy=True)
+            parser.parse(filename)
+            namespace = parser.get_namespace()
+            # Materialize a node, so that the namespace is half parsed
+            # when the first kind is indexed
+            names = list(expected)
+            if names:
+                namespace.get(names[-1])
+            for kind in KINDS:
+                self.assertEqual(
+                    [node.name for node in namespace.get_nodes_of_kind(kind)],
+                    [node.name for node in expected.get_nodes_of_kind(kind)],
+                    filename)
+            self.assertKinds(namespace)
+
+    def test_serialized(self):
+        namespace = ast.Namespace('Test', '1.0', ['Test'], ['test'])
+        namespace.append(create_class('Widget'))
+        namespace.append(create_function('new'))
+        self.assertKinds(namespace)
+        namespace = serializer.loads(serializer.dumps(namespace))
+        self.assertKinds(namespace)
+        # The loaded indexes are still kept up to date
+        namespace.append(create_class('Window'))
+        namespace.remove(namespace.get('new'))
+        self.assertKinds(namespace)
+        self.assertEqual(
+            [node.name for node in namespace.get_nodes_of_kind(ast.Class)],
+            ['Widget', 'Window'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,257 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import __builtin__
+
+path = os.getenv('UNINSTALLED_INTROSPECTION_SRCDIR', None)
+assert path is not None
+sys.path.insert(0, path)
+
+# Not correct, but enough to get the tests going uninstalled
+__builtin__.__dict__['DATADIR'] = path
+
+from giscanner import cachestore
+from giscanner.cachestore import CacheStore
+
+
+class Clock(object):
+    """Replaces the time module of the cache store, so that every
+access is later than the previous one."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        self.now += 1
+        return self.now
+
+
+class CacheStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='test-cachestore-')
+        self.cachedir = os.path.join(self.tmpdir, 'cache')
+        os.mkdir(self.cachedir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def create_store(self):
+        store = CacheStore(self.cachedir, system_directories=())
+        store.set_limits(0, 0)
+        return store
+
+    def write_file(self, name, contents):
+        filename = os.path.join(self.tmpdir, name)
+        f = open(filename, 'w')
+        f.write(contents)
+        f.close()
+        return filename
+
+
+class TestCacheStore(CacheStoreTestCase):
+
+    def test_store_load(self):
+        filename = self.write_file('Foo-1.0.gir', 'foo')
+        self.create_store().store(filename, {'foo': ['bar']})
+        self.assertEqual(self.create_store().load(filename), {'foo': ['bar']})
+        missing = os.path.join(self.tmpdir, 'Missing-1.0.gir')
+        self.assertEqual(self.create_store().load(missing), None)
+
+    def test_source_changed(self):
+        filename = self.write_file('Foo-1.0.gir', 'foo')
+        self.create_store().store(filename, 'data')
+        self.write_file('Foo-1.0.gir', 'changed')
+        self.assertEqual(self.create_store().load(filename), None)
+
+    def test_source_touched(self):
+        filename = self.write_file('Foo-1.0.gir', 'foo')
+        self.create_store().store(filename, 'data')
+        # Only the contents count, not the times
+        os.utime(filename, (0, 0))
+        self.write_file('Foo-1.0.gir', 'foo')
+        self.assertEqual(self.create_store().load(filename), 'data')
+
+    def test_dependency_changed(self):
+        filename = self.write_file('Foo-1.0.gir', 'foo')
+        dependency = self.write_file('Bar-1.0.gir', 'bar')
+        self.create_store().store(filename, 'data', [dependency])
+        self.assertEqual(self.create_store().load(filename), 'data')
+        self.write_file('Bar-1.0.gir', 'changed')
+        self.assertEqual(self.create_store().load(filename), None)
+        # The stale entry is gone for good
+        self.write_file('Bar-1.0.gir', 'bar')
+        self.assertEqual(self.create_store().load(filename), None)
+
+    def test_dependency_removed(self):
+        filename = self.write_file('Foo-1.0.gir', 'foo')
+        dependency = self.write_file('Bar-1.0.gir', 'bar')
+        self.create_store().store(filename, 'data', [dependency])
+        os.unlink(dependency)
+        self.assertEqual(self.create_store().load(filename), None)
+
+    def test_scanner_changed(self):
+        filename = self.write_file('Foo-1.0.gir', 'foo')
+        self.create_store().store(filename, 'data')
+        versionhash = cachestore._get_versionhash()
+        cachestore._versionhash = 'changed'
+        try:
+            self.assertEqual(self.create_store().load(filename), None)
+        finally:
+            cachestore._versionhash = versionhash
+
+    def test_keyed(self):
+        dependency = self.write_file('foo.h', 'int foo(void);')
+        self.create_store().store_keyed('key', ['output'], [dependency])
+        self.assertEqual(self.create_store().load_keyed('key'), ['output'])
+        self.assertEqual(self.create_store().load_keyed('other'), None)
+        self.write_file('foo.h', 'int foo(int);')
+        self.assertEqual(self.create_store().load_keyed('key'), None)
+
+    def test_broken_entry(self):
+        filename = self.write_file('Foo-1.0.gir', 'foo')
+        store = self.create_store()
+        store.store(filename, range(1000))
+        entry = store._get_filename(filename)
+        data = open(entry, 'rb').read()
+        f = open(entry, 'wb')
+        f.write(data[:-10])
+        f.close()
+        self.assertEqual(self.create_store().load(filename), None)
+        self.failIf(os.path.exists(entry))
+
+    def test_without_datadir(self):
+        # As when giscanner is used as a library
+        datadir = __builtin__.__dict__.pop('DATADIR')
+        environ = dict(os.environ)
+        try:
+            os.environ.pop('GI_SCANNER_SYSTEM_CACHE_PATH', None)
+            os.environ.pop('GI_SCANNER_DISABLE_CACHE', None)
+            os.environ['HOME'] = self.tmpdir
+            self.assertEqual(cachestore.get_system_cachedir(), None)
+            store = CacheStore()
+            filename = self.write_file('Foo-1.0.gir', 'foo')
+            store.store(filename, 'data')
+            self.assertEqual(CacheStore().load(filename), 'data')
+        finally:
+            __builtin__.__dict__['DATADIR'] = datadir
+            os.environ.clear()
+            os.environ.update(environ)
+
+
+class TestEviction(CacheStoreTestCase):
+
+    def setUp(self):
+        CacheStoreTestCase.setUp(self)
+        self.time = cachestore.time
+        cachestore.time = Clock()
+
+    def tearDown(self):
+        cachestore.time = self.time
+        CacheStoreTestCase.tearDown(self)
+
+    def store_files(self, store, names):
+        filenames = []
+        for name in names:
+            filename = self.write_file(name + '-1.0.gir', name)
+            store.store(filename, name * 100)
+            filenames.append(filename)
+        return filenames
+
+    def get_entries(self):
+        return sorted([name for name in os.listdir(self.cachedir)
+                       if not name.startswith('.')])
+
+    def test_max_entries(self):
+        store = self.create_store()
+        store.set_limits(max_entries=2)
+        foo, bar = self.store_files(store, ['foo', 'bar'])
+        # Used last, so bar is the least recently used one
+        self.assertEqual(store.load(foo), 'foo' * 100)
+        baz, = self.store_files(store, ['baz'])
+        self.assertEqual(len(self.get_entries()), 2)
+        self.assertEqual(store.load(bar), None)
+        self.assertEqual(store.load(foo), 'foo' * 100)
+        self.assertEqual(store.load(baz), 'baz' * 100)
+
+    def test_max_size(self):
+        store = self.create_store()
+        foo, = self.store_files(store, ['foo'])
+        size = os.stat(store._get_filename(foo)).st_size
+        store.set_limits(max_size=size * 2 + size / 2)
+        bar, baz = self.store_files(store, ['bar', 'baz'])
+        self.assertEqual(len(self.get_entries()), 2)
+        self.assertEqual(store.load(foo), None)
+        self.assertEqual(store.load(bar), 'bar' * 100)
+
+    def test_too_large(self):
+        store = self.create_store()
+        foo, = self.store_files(store, ['foo'])
+        size = os.stat(store._get_filename(foo)).st_size
+        store.set_limits(max_size=size * 2)
+        index = store._read_index()
+        # Larger than the whole cache, not even written
+        bar = self.write_file('Bar-1.0.gir', 'bar')
+        store.store(bar, 'bar' * 1000)
+        self.assertEqual(self.get_entries(),
+                         [os.path.basename(store._get_filename(foo))])
+        self.assertEqual(store._read_index(), index)
+        self.assertEqual(store.load(foo), 'foo' * 100)
+        # Nor does it replace a stale entry
+        dependency = self.write_file('Baz-1.0.gir', 'baz')
+        store.set_limits(max_size=0)
+        store.store(bar, 'bar', [dependency])
+        self.assertEqual(len(self.get_entries()), 2)
+        self.write_file('Baz-1.0.gir', 'changed')
+        store = self.create_store()
+        store.set_limits(max_size=size * 2)
+        store.store(bar, 'bar' * 1000, [dependency])
+        self.assertEqual(self.get_entries(),
+                         [os.path.basename(store._get_filename(foo))])
+
+    def test_unlimited(self):
+        store = self.create_store()
+        self.store_files(store, ['foo', 'bar', 'baz'])
+        self.assertEqual(len(self.get_entries()), 3)
+
+    def test_flush(self):
+        store = self.create_store()
+        foo, bar = self.store_files(store, ['foo', 'bar'])
+        index = store._read_index()
+
+        # Hits only update the index once flushed
+        store = self.create_store()
+        self.assertEqual(store.load(foo), 'foo' * 100)
+        self.assertEqual(store._read_index(), index)
+        store.flush()
+        flushed = store._read_index()
+        self.failUnless(flushed[os.path.basename(store._get_filename(foo))] >
+                        index[os.path.basename(store._get_filename(foo))])
+        self.assertEqual(len(flushed), 2)
+
+        # So the access times of other scanners count for the eviction
+        store.set_limits(max_entries=2)
+        baz, = self.store_files(store, ['baz'])
+        self.assertEqual(store.load(bar), None)
+
+    def test_merge(self):
+        foo, bar = self.store_files(self.create_store(), ['foo', 'bar'])
+        first = self.create_store()
+        self.assertEqual(first.load(foo), 'foo' * 100)
+        # Another scanner adds baz and evicts foo meanwhile
+        second = self.create_store()
+        second.set_limits(max_entries=2)
+        self.assertEqual(second.load(bar), 'bar' * 100)
+        baz, = self.store_files(second, ['baz'])
+        self.assertEqual(len(self.get_entries()), 2)
+        # Neither is lost, nor does foo come back
+        first.flush()
+        names = [os.path.basename(first._get_filename(filename))
+                 for filename in (bar, baz)]
+        self.assertEqual(sorted(first._read_index()), sorted(names))
+
+
+if __name__ == '__main__':
+    unittest.main()
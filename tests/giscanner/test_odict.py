@@ -0,0 +1,92 @@
+import os
+import random
+import sys
+import unittest
+import __builtin__
+
+path = os.getenv('UNINSTALLED_INTROSPECTION_SRCDIR', None)
+assert path is not None
+sys.path.insert(0, path)
+
+# Not correct, but enough to get the tests going uninstalled
+__builtin__.__dict__['DATADIR'] = path
+
+from giscanner.odict import odict
+
+
+def create_odict(keys):
+    d = odict()
+    for key in keys:
+        d[key] = key.upper()
+    return d
+
+
+class TestOdict(unittest.TestCase):
+
+    def assertOrder(self, d, keys):
+        self.assertEqual(d.keys(), keys)
+        self.assertEqual(list(d), keys)
+        self.assertEqual(d.values(), [key.upper() for key in keys])
+        self.assertEqual(list(d.itervalues()), [key.upper() for key in keys])
+        self.assertEqual(list(d.iteritems()),
+                         [(key, key.upper()) for key in keys])
+        self.assertEqual(len(d), len(keys))
+
+    def test_insertion_order(self):
+        self.assertOrder(create_odict(['c', 'a', 'b']), ['c', 'a', 'b'])
+
+    def test_delete(self):
+        d = create_odict(['a', 'b', 'c', 'd'])
+        del d['b']
+        self.assertOrder(d, ['a', 'c', 'd'])
+        self.failIf('b' in d)
+        self.assertRaises(KeyError, d.__getitem__, 'b')
+        self.assertRaises(KeyError, d.__delitem__, 'b')
+        self.assertOrder(d, ['a', 'c', 'd'])
+
+    def test_readd(self):
+        d = create_odict(['a', 'b', 'c'])
+        del d['a']
+        d['a'] = 'A'
+        self.assertOrder(d, ['b', 'c', 'a'])
+        del d['a']
+        d['a'] = 'A'
+        self.assertOrder(d, ['b', 'c', 'a'])
+
+    def test_replace(self):
+        d = create_odict(['a', 'b', 'c'])
+        d['b'] = 'B'
+        self.assertOrder(d, ['a', 'b', 'c'])
+        d['a'] = 'new'
+        self.assertEqual(d.items(), [('a', 'new'), ('b', 'B'), ('c', 'C')])
+
+    def test_delete_all(self):
+        keys = [str(i) for i in range(100)]
+        d = create_odict(keys)
+        for key in keys:
+            del d[key]
+        self.assertOrder(d, [])
+        d['x'] = 'X'
+        self.assertOrder(d, ['x'])
+
+    def test_random(self):
+        # Against a list, through many compactions of the holes
+        rand = random.Random(0)
+        d = odict()
+        keys = []
+        for i in range(5000):
+            key = str(rand.randrange(200))
+            if key in keys and rand.random() < 0.6:
+                del d[key]
+                keys.remove(key)
+            else:
+                if key not in keys:
+                    keys.append(key)
+                d[key] = key.upper()
+            if i % 100 == 0:
+                self.assertOrder(d, keys)
+        self.assertOrder(d, keys)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import cPickle
+import glob
+import os
+import sys
+import unittest
+import __builtin__
+
+path = os.getenv('UNINSTALLED_INTROSPECTION_SRCDIR', None)
+assert path is not None
+sys.path.insert(0, path)
+
+# Not correct, but enough to get the tests going uninstalled
+__builtin__.__dict__['DATADIR'] = path
+
+from giscanner import ast
+from giscanner import serializer
+from giscanner.girparser import GIRParser
+from giscanner.girwriter import GIRWriter
+from giscanner.message import Position
+
+top_srcdir = os.environ['UNINSTALLED_INTROSPECTION_SRCDIR']
+top_builddir = os.environ.get('TOP_BUILDDIR', top_srcdir)
+
+
+def get_gir_filenames():
+    filenames = set()
+    for directory in (top_srcdir, top_builddir):
+        filenames.update(glob.glob(os.path.join(directory, 'gir', '*.gir')))
+        filenames.update(glob.glob(os.path.join(directory, 'tests', 'scanner',
+                                                '*-expected.gir')))
+    return sorted(set([os.path.abspath(f) for f in filenames]))
+
+def write_gir(parser, namespace):
+    writer = GIRWriter(namespace, parser.get_shared_libraries(),
+                       parser.get_includes(), parser.get_pkgconfig_packages(),
+                       parser.get_c_includes())
+    return writer.get_xml()
+
+
+class TestSerializer(unittest.TestCase):
+
+    def test_round_trip(self):
+        filenames = get_gir_filenames()
+        self.failUnless(filenames)
+        for filename in filenames:
+            parser = GIRParser()
+            parser.parse(filename)
+            namespace = parser.get_namespace()
+            loaded = serializer.loads(serializer.dumps(namespace))
+            self.assertEqual(write_gir(parser, namespace),
+                             write_gir(parser, loaded), filename)
+
+    def test_singletons(self):
+        singletons = [value for value in vars(ast).itervalues()
+                      if isinstance(value, ast.Type)]
+        self.failUnless(ast.TYPE_ANY in singletons)
+        loaded = serializer.loads(serializer.dumps(singletons))
+        for value, loaded_value in zip(singletons, loaded):
+            self.failUnless(value is loaded_value, value)
+
+    def test_interned_types(self):
+        typeval = ast.Type.interned(target_giname='Foo.Bar', ctype='FooBar*')
+        func = ast.Function('bar', ast.Return(typeval), [], False, 'foo_bar')
+        loaded = serializer.loads(serializer.dumps(func))
+        self.failUnless(loaded.retval.type is typeval)
+        self.failUnless(loaded.retval is not func.retval)
+
+    def test_malformed(self):
+        data = serializer.dumps([ast.TYPE_INT, 'foo', {'bar': (1, 2.0)}])
+        self.assertEqual(serializer.loads(data)[1:],
+                         ['foo', {'bar': (1, 2.0)}])
+        for i in range(len(data)):
+            self.assertRaises(ValueError, serializer.loads, data[:i])
+        for i in range(len(data)):
+            corrupted = data[:i] + chr(ord(data[i]) ^ 0xff) + data[i + 1:]
+            self.assertRaises(ValueError, serializer.loads, corrupted)
+
+
+class TestPickle(unittest.TestCase):
+
+    def test_round_trip(self):
+        for filename in get_gir_filenames():
+            parser = GIRParser()
+            parser.parse(filename)
+            namespace = parser.get_namespace()
+            expected = write_gir(parser, namespace)
+            for protocol in (0, 1, 2):
+                loaded = cPickle.loads(cPickle.dumps(namespace, protocol))
+                self.assertEqual(write_gir(parser, loaded), expected,
+                                 (filename, protocol))
+
+    def test_slots(self):
+        func = ast.Function('bar', ast.Return(ast.TYPE_INT), [], False,
+                            'foo_bar')
+        func.add_file_position(Position('foo.c', 12))
+        for protocol in (0, 1, 2):
+            loaded = cPickle.loads(cPickle.dumps(func, protocol))
+            self.assertEqual(loaded.symbol, 'foo_bar')
+            self.failUnless(loaded.retval.type is ast.TYPE_INT)
+            self.assertEqual(list(loaded.file_positions),
+                             [Position('foo.c', 12)])
+            # Unset slots stay unset
+            self.failIf(hasattr(loaded.retval, 'allow_none'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import __builtin__
+
+path = os.getenv('UNINSTALLED_INTROSPECTION_SRCDIR', None)
+assert path is not None
+sys.path.insert(0, path)
+
+# Not correct, but enough to get the tests going uninstalled
+__builtin__.__dict__['DATADIR'] = path
+
+from giscanner.sourcescanner import SourceScanner
+
+
+class TestSourceScanner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='test-sourcescanner-')
+        self.environ = dict(os.environ)
+        os.environ['GI_SCANNER_DISABLE_CACHE'] = '1'
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.tmpdir)
+
+    def scan(self, contents):
+        filename = os.path.join(self.tmpdir, 'test.h')
+        f = open(filename, 'w')
+        f.write(contents)
+        f.close()
+        ss = SourceScanner()
+        ss.set_cpp_options([], [], [])
+        ss.parse_files([filename])
+        return list(ss.get_symbols())
+
+    def scan_idents(self, contents):
+        return [symbol.ident for symbol in self.scan(contents)]
+
+    def test_parse(self):
+        self.assertEqual(self.scan_idents('int test_foo (void);\n'
+                                          'int test_bar (int i);\n'),
+                         ['test_foo', 'test_bar'])
+
+    def test_wrappers(self):
+        symbol = self.scan('int test_bar (int i);\n')[0]
+        base_type = symbol.base_type
+        self.failUnless(symbol.base_type is base_type)
+        children = list(base_type.child_list)
+        self.assertEqual([child.ident for child in children], ['i'])
+        self.assertEqual(list(base_type.child_list), children)
+        self.failUnless(children[0].base_type is children[0].base_type)
+
+    def test_malformed_header(self):
+        # The parser stops at the syntax error, long before the end of
+        # the preprocessor output, which no longer fits in a pipe
+        contents = 'int test_before (void);\nint test_broken (;\n'
+        contents += ''.join(['int test_after_%d (void);\n' % (i, )
+                             for i in range(20000)])
+        idents = self.scan_idents(contents)
+        self.failUnless('test_before' in idents)
+        self.failIf('test_after_19999' in idents)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,276 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import __builtin__
+
+path = os.getenv('UNINSTALLED_INTROSPECTION_SRCDIR', None)
+assert path is not None
+sys.path.insert(0, path)
+
+# Not correct, but enough to get the tests going uninstalled
+__builtin__.__dict__['DATADIR'] = path
+
+from giscanner import ast
+from giscanner.transformer import Transformer
+
+GIR_TEMPLATE = '''<?xml version="1.0"?>
+<repository version="1.2"
+            xmlns="http://www.gtk.org/introspection/core/1.0"
+            xmlns:c="http://www.gtk.org/introspection/c/1.0"
+            xmlns:glib="http://www.gtk.org/introspection/glib/1.0">
+  <namespace name="%s" version="1.0" shared-library=""
+             c:identifier-prefixes="%s" c:symbol-prefixes="%s">
+%s  </namespace>
+</repository>
+'''
+GIR_CLASS = ('    <class name="%s" c:type="%s" glib:type-name="%s" '
+             'glib:get-type="%s"/>\n')
+
+# Name, identifier prefixes, symbol prefixes and classes as (name, ctype,
+# GType name), some of the prefixes overlapping, and some namespaces
+# registering the same GType names, even twice
+NAMESPACES = [
+    ('GLib', 'G', 'g', []),
+    ('GObject', 'G', 'g_,g', [('Object', 'GObject', 'GObject'),
+                              ('Binding', 'GBinding', 'GBinding')]),
+    ('Gio', 'G', 'g', [('Application', 'GApplication', 'GApplication'),
+                       ('Binding', 'GBinding', 'GBinding')]),
+    ('Gdk', 'Gdk', 'gdk', [('Window', 'GdkWindow', 'GdkWindow'),
+                           ('Surface', 'GdkSurface', 'GdkWindow')]),
+    ('Gtk', 'Gtk,GtkX', 'gtk,gtk_x', [('Window', 'GtkWindow', 'GtkWindow'),
+                                      ('XWindow', 'GtkXWindow',
+                                       'GtkXWindow')]),
+    ('Plain', '', '', [('Thing', 'Thing', 'PlainThing')]),
+    ]
+LATE_NAMESPACE = ('Pango', 'Pango', 'pango', [('Layout', 'PangoLayout',
+                                               'PangoLayout')])
+# Registered by the namespace being scanned
+SCANNED_CLASSES = [('Widget', 'TestWidget', 'TestWidget'),
+                   ('Window', 'TestWindow', 'GtkWindow')]
+
+
+def write_gir(directory, name, identifier_prefixes, symbol_prefixes,
+              classes):
+    nodes = ''
+    for class_name, ctype, gtype_name in classes:
+        nodes += GIR_CLASS % (class_name, ctype, gtype_name,
+                              ctype.lower() + '_get_type')
+    f = open(os.path.join(directory, '%s-1.0.gir' % (name, )), 'w')
+    f.write(GIR_TEMPLATE % (name, identifier_prefixes, symbol_prefixes,
+                            nodes))
+    f.close()
+
+
+class TransformerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='test-transformer-')
+        for args in NAMESPACES + [LATE_NAMESPACE]:
+            write_gir(self.tmpdir, *args)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def create_transformer(self, accept_unprefixed=False):
+        namespace = ast.Namespace('Test', '1.0', ['Test'], ['test'])
+        for name, ctype, gtype_name in SCANNED_CLASSES:
+            namespace.append(ast.Class(name, None, ctype=ctype,
+                                       gtype_name=gtype_name,
+                                       get_type=ctype.lower() + '_get_type'))
+        transformer = Transformer(namespace, accept_unprefixed)
+        transformer.disable_cache()
+        transformer.set_include_paths([self.tmpdir])
+        for args in NAMESPACES:
+            transformer.register_include(ast.Include(args[0], '1.0'))
+        return transformer
+
+    def get_namespaces(self, transformer):
+        return [transformer.namespace] + transformer.get_include_namespaces()
+
+    def register_late_include(self, transformer):
+        transformer.register_include(ast.Include(LATE_NAMESPACE[0], '1.0'))
+
+
+def split_linear(transformer, name, is_identifier):
+    """Split name by testing every prefix of every namespace."""
+    matches = []
+    unprefixed_namespaces = []
+    namespaces = [transformer.namespace] + transformer.get_include_namespaces()
+    for ns in namespaces:
+        if is_identifier:
+            prefixes = ns.identifier_prefixes
+        elif name[0].isupper():
+            prefixes = ns._ucase_symbol_prefixes
+        else:
+            prefixes = ns.symbol_prefixes
+        if prefixes:
+            for prefix in prefixes:
+                if (not is_identifier) and (not prefix.endswith('_')):
+                    prefix = prefix + '_'
+                if name.startswith(prefix):
+                    matches.append((ns, name[len(prefix):], len(prefix)))
+                    break
+        else:
+            unprefixed_namespaces.append(ns)
+    if matches:
+        matches.sort(transformer._sort_matches)
+        return [(match[0], match[1]) for match in matches]
+    elif transformer._accept_unprefixed:
+        return [(transformer.namespace, name)]
+    for ns in unprefixed_namespaces:
+        if name in ns:
+            return [(ns, name)]
+    raise ValueError(name)
+
+
+class TestPrefixes(TransformerTestCase):
+
+    def get_names(self, transformer):
+        names = ['Thing', 'Unknown', 'unknown_function', 'UNKNOWN_VALUE',
+                 'G', 'g', 'g_', 'G_', 'Gtk', 'gtk_', 'GTK_X_']
+        for ns in self.get_namespaces(transformer):
+            for prefix in ns.identifier_prefixes:
+                names.extend([prefix + 'Window', prefix + 'XWindow', prefix])
+            for prefix in ns.symbol_prefixes:
+                for name in [prefix + '_window_new', prefix + 'x_new',
+                             prefix + '_x_window_show']:
+                    names.extend([name, name.upper()])
+        return names
+
+    def check_names(self, transformer):
+        split = transformer._split_c_string_for_namespace_matches
+        for name in self.get_names(transformer):
+            for is_identifier in (True, False):
+                try:
+                    expected = split_linear(transformer, name, is_identifier)
+                except ValueError:
+                    expected = None
+                # Twice, the second time from the memo
+                for i in range(2):
+                    try:
+                        matches = split(name, is_identifier)
+                    except ValueError:
+                        matches = None
+                    self.assertEqual(matches, expected,
+                                     (name, is_identifier))
+
+    def test_matches(self):
+        transformer = self.create_transformer()
+        self.check_names(transformer)
+        self.register_late_include(transformer)
+        self.check_names(transformer)
+
+    def test_accept_unprefixed(self):
+        self.check_names(self.create_transformer(accept_unprefixed=True))
+
+    def test_split_csymbol(self):
+        transformer = self.create_transformer()
+        ns, name = transformer.split_csymbol('gtk_x_window_show')
+        # A namespace matches with the first of its prefixes that does
+        self.assertEqual((ns.name, name), ('Gtk', 'x_window_show'))
+        ns, name = transformer.split_csymbol('test_widget_show')
+        self.assertEqual((ns.name, name), ('Test', 'widget_show'))
+        self.assertRaises(ValueError, transformer.split_csymbol, 'foo_bar')
+
+
+
+def resolve_linear(transformer, gtype_name):
+    """Resolve gtype_name by looking at every node of every namespace."""
+    namespaces = [transformer.namespace] + transformer.get_include_namespaces()
+    for ns in namespaces:
+        for node in ns.itervalues():
+            if not (isinstance(node, (ast.Class, ast.Interface))
+                    or (isinstance(node, ast.Registered)
+                        and node.get_type is not None)):
+                continue
+            if node.gtype_name == gtype_name:
+                return '%s.%s' % (ns.name, node.name)
+    return None
+
+
+class TestGTypeNames(TransformerTestCase):
+
+    def get_gtype_names(self):
+        gtype_names = ['Unknown', 'GtkUnknown']
+        for args in NAMESPACES + [LATE_NAMESPACE]:
+            gtype_names.extend([gtype_name for name, ctype, gtype_name
+                                in args[3]])
+        gtype_names.extend([gtype_name for name, ctype, gtype_name
+                            in SCANNED_CLASSES])
+        return gtype_names
+
+    def check_gtype_names(self, transformer):
+        for gtype_name in self.get_gtype_names():
+            typeval = ast.Type(gtype_name=gtype_name)
+            expected = resolve_linear(transformer, gtype_name)
+            self.assertEqual(transformer.resolve_type(typeval),
+                             expected is not None)
+            self.assertEqual(typeval.target_giname, expected, gtype_name)
+
+    def test_resolve(self):
+        transformer = self.create_transformer()
+        self.check_gtype_names(transformer)
+        # The scanned namespace registers GtkWindow too, and comes first
+        typeval = ast.Type(gtype_name='GtkWindow')
+        transformer.resolve_type(typeval)
+        self.assertEqual(typeval.target_giname, 'Test.Window')
+
+    def test_late_include(self):
+        transformer = self.create_transformer()
+        self.check_gtype_names(transformer)
+        self.register_late_include(transformer)
+        self.check_gtype_names(transformer)
+        typeval = ast.Type(gtype_name='PangoLayout')
+        transformer.resolve_type(typeval)
+        self.assertEqual(typeval.target_giname, 'Pango.Layout')
+
+    def test_scanned_namespace_changes(self):
+        transformer = self.create_transformer()
+        self.check_gtype_names(transformer)
+        transformer.namespace.append(ast.Class('Box', None, ctype='TestBox',
+                                               gtype_name='TestBox',
+                                               get_type='test_box_get_type'))
+        transformer.namespace.remove(transformer.namespace.get('Window'))
+        self.check_gtype_names(transformer)
+        typeval = ast.Type(gtype_name='TestBox')
+        transformer.resolve_type(typeval)
+        self.assertEqual(typeval.target_giname, 'Test.Box')
+
+    def test_duplicates(self):
+        transformer = self.create_transformer()
+        namespace = transformer.namespace
+        for name in ('First', 'Second', 'Third'):
+            namespace.append(ast.Class(name, None, ctype='Test' + name,
+                                       gtype_name='TestDuplicate',
+                                       get_type='test_duplicate_get_type'))
+        record = ast.Record('Fourth', 'TestFourth')
+        namespace.append(record)
+        record.add_gtype('TestDuplicate', 'test_duplicate_get_type')
+
+        def resolve():
+            typeval = ast.Type(gtype_name='TestDuplicate')
+            transformer.resolve_type(typeval)
+            self.assertEqual(typeval.target_giname,
+                             resolve_linear(transformer, 'TestDuplicate'))
+            return typeval.target_giname
+
+        self.assertEqual(resolve(), 'Test.First')
+        namespace.remove(namespace.get('Second'))
+        self.assertEqual(resolve(), 'Test.First')
+        namespace.remove(namespace.get('First'))
+        self.assertEqual(resolve(), 'Test.Third')
+        namespace.remove(namespace.get('Third'))
+        self.assertEqual(resolve(), 'Test.Fourth')
+        namespace.remove(record)
+        self.assertEqual(resolve(), None)
+        # Included namespaces keep the first one too
+        typeval = ast.Type(gtype_name='GdkWindow')
+        transformer.resolve_type(typeval)
+        self.assertEqual(typeval.target_giname, 'Gdk.Window')
+        self.check_gtype_names(transformer)
+
+
+if __name__ == '__main__':
+    unittest.main()
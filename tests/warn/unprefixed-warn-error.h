@@ -0,0 +1,11 @@
+// OPTIONS: --warn-error
+#include "common.h"
+
+/* Not dropped by the scanner without --warn-all, so that --warn-error
+ * still fails on it */
+void other_function (void);
+
+// EXPECT:6: Warning: Test: symbol='other_function': Unknown namespace for symbol 'other_function'
+
+/* Stub function here so namespace isn't empty */
+void test_foo (void);
@@ -17,9 +17,8 @@ from giscanner.ast import Include, Namespace
 from giscanner.introspectablepass import IntrospectablePass
 from giscanner.maintransformer import MainTransformer
 from giscanner.message import MessageLogger
-from giscanner.sourcescanner import SourceScanner
 from giscanner.transformer import Transformer
-from giscanner.scannermain import process_packages
+from giscanner.scannermain import create_source_scanner, process_packages
 
 currentdir = os.path.dirname(os.path.abspath(sys.argv[0]))
 current_name = os.path.basename(currentdir)
@@ -33,6 +32,13 @@ class Options:
         self.cpp_defines = []
         self.cpp_undefines = []
         self.library_paths = []
+        self.cache_max_size = None
+        self.cache_max_entries = None
+        self.incremental = False
+        self.lex_jobs = None
+        self.accept_unprefixed = False
+        self.warn_all = True
+        self.warn_fatal = False
 
 def _diff(orig, new, short):
     def _tolines(s):
@@ -71,6 +77,19 @@ def _extract_expected(filename):
             retval.append((sort_key, line[10:]))
     return retval
 
+def _extract_options(filename, options):
+    # Like g-ir-scanner --warn-all by default, which keeps the symbols
+    # without the prefixes of the namespace to warn about them
+    fd = open(filename)
+    data = fd.read()
+    fd.close()
+
+    for line in data.split('\n'):
+        if line.startswith('// OPTIONS:'):
+            flags = line[11:].split()
+            options.warn_all = '--warn-all' in flags
+            options.warn_fatal = '--warn-error' in flags
+
 def check(args):
     filename = args[0]
 
@@ -83,17 +102,12 @@ def check(args):
     transformer.set_include_paths([os.path.join(top_srcdir, 'gir'), top_builddir])
     transformer.register_include(Include.from_string("GObject-2.0"))
 
-    ss = SourceScanner()
-
     options = Options()
+    _extract_options(filename, options)
     exit_code = process_packages(options, ['gobject-2.0'])
     if exit_code:
         sys.exit(exit_code)
-    ss.set_cpp_options(options.cpp_includes,
-                       options.cpp_defines,
-                       options.cpp_undefines)
-    ss.parse_files([filename])
-    ss.parse_macros([filename])
+    ss = create_source_scanner(options, [filename], namespace)
     transformer.parse(ss.get_symbols())
 
     ap = AnnotationParser()